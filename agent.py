@@ -2,25 +2,42 @@
 Agente MCP - Model Context Protocol
 Soporta SQLite y MySQL
 """
-from typing import List, Dict, Any, Optional
+import asyncio
+import time
+import uuid
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from models.gemini import GeminiModel
+from models.recording import RecordReplayModel
 from tools.database import DatabaseTool
 from tools.mysql_tool import MySQLTool
+from sessions import SessionStore, DEFAULT_SESSION
+from sql_cache import SQLCache, is_follow_up, normalize_question
+from schema_selector import SchemaSelector
+from response_formatter import ResponseFormatter
+from intent_router import IntentMatch, IntentRouter
+from product_index import ProductIndex
+from metrics import Metrics
+from context_compactor import ContextCompactor
+from sql_candidates import SQLCandidates
+from serializer import dumps, records
+from tools.bounded import QueryResult
+from tools.write_batch import split_statements
 import json
-from decimal import Decimal
-from datetime import date, datetime # <-- 1. IMPORTAR DATE/DATETIME
 
-# 2. CLASE DE CODIFICADOR MEJORADA
-class CustomDecimalEncoder(json.JSONEncoder):
-    """
-    Codificador de JSON personalizado para manejar objetos Decimal y Date/Datetime.
-    """
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        if isinstance(obj, (date, datetime)):
-            return obj.isoformat() # Convierte la fecha a un string estándar
-        return super().default(obj)
+# Vistas/tablas que nombran las reglas expertas del prompt: siempre van en el esquema
+EXPERT_RULE_TABLES = ("v_stock_productos", "v_semaforo_vencimientos", "productos")
+
+# Filas que se serializan para el prompt de respuesta (luego se recorta a 3000 caracteres)
+PROMPT_SAMPLE_ROWS = 200
+
+
+def _strip_sql_markdown(sql: str) -> str:
+    """Quita el ```sql ... ``` con el que Gemini a veces envuelve el SQL"""
+    if sql.startswith("```sql"):
+        sql = sql.replace("```sql", "").replace("```", "").strip()
+    elif sql.startswith("```"):
+        sql = sql.replace("```", "").strip()
+    return sql
 
 class MCPAgent:
     """
@@ -34,11 +51,36 @@ class MCPAgent:
         model_name: str,
         db_type: str = 'sqlite',
         db_path: Optional[str] = None,
-        mysql_config: Optional[Dict] = None
+        mysql_config: Optional[Dict] = None,
+        session_config: Optional[Dict] = None,
+        sql_cache_config: Optional[Dict] = None,
+        schema_selector_config: Optional[Dict] = None,
+        local_formatter: bool = True,
+        concurrency_config: Optional[Dict] = None,
+        intent_router_config: Optional[Dict] = None,
+        product_index_config: Optional[Dict] = None,
+        metrics_config: Optional[Dict] = None,
+        model_replay_config: Optional[Dict] = None,
+        context_config: Optional[Dict] = None,
+        candidates_config: Optional[Dict] = None
     ):
         # ... (El resto de __init__ está bien, no hay cambios) ...
+        # Latencias por etapa, tamaños de prompt y filas (expuestas en /metrics)
+        self.metrics = Metrics(**(metrics_config or {}))
+        
+        # Historial con presupuesto de tokens: tablas/gráficos resumidos, turnos viejos recortados
+        self.compactor = ContextCompactor(
+            on_prompt=lambda prompt: self.metrics.prompt("full", prompt), **(context_config or {})
+        )
+        
         # Modelo de IA
-        self.model = GeminiModel(api_key, model_name)
+        self.model = GeminiModel(api_key, model_name, compactor=self.compactor)
+        
+        # Grabar o reproducir las llamadas a Gemini (perfilar sin la API)
+        model_replay_config = model_replay_config or {}
+        if model_replay_config.get('mode', 'off') != 'off':
+            self.model = RecordReplayModel(self.model, **model_replay_config)
+            print(f"🎞️  Llamadas a Gemini en modo {self.model.mode} ({self.model.store_dir})")
         
         # Herramientas disponibles
         self.tools = {}
@@ -60,67 +102,360 @@ class MCPAgent:
         else:
             raise ValueError(f"Tipo de BD no soportado: {db_type}")
         
-        # Contexto de la conversación
-        self.context: List[Dict[str, str]] = []
-        self.max_context = 10
+        # Contexto de la conversación: un historial acotado por sesión
+        self.sessions = SessionStore(**(session_config or {}))
+        
+        # Caché pregunta → SQL validado (se salta la llamada a Gemini)
+        self.sql_cache = SQLCache(**(sql_cache_config or {}))
+        
+        # Poda del esquema: solo las tablas relevantes van al prompt de SQL
+        self.schema_selector = SchemaSelector(
+            always_include=EXPERT_RULE_TABLES, **(schema_selector_config or {})
+        )
+        
+        # Varios candidatos de SQL en paralelo (con fan_out > 1): gana el primero válido
+        self.candidates = SQLCandidates(**(candidates_config or {}))
+        
+        # Formateador local: evita la segunda llamada a Gemini en la mayoría de respuestas
+        self.formatter = ResponseFormatter() if local_formatter else None
+        
+        # Índice de nombres de productos: menciones (incluso mal escritas) -> id_producto
+        self.products: Optional[ProductIndex] = None
+        product_index_config = dict(product_index_config or {})
+        if product_index_config.pop('enabled', True):
+            self.products = ProductIndex(self.tools["database"], **product_index_config)
+            self.tools["database"].add_write_listener(self.products.on_write)
+        
+        # Ruta rápida: preguntas frecuentes con SQL verificado y formato local
+        self.router = IntentRouter(
+            product_lookup=self.products.find if self.products else None,
+            **(intent_router_config or {})
+        )
+        self._fast_formatter = self.formatter or ResponseFormatter()
+        
+        # Topes de llamadas simultáneas a Gemini y a la BD en el camino asíncrono
+        concurrency = concurrency_config or {}
+        self.llm_concurrency = concurrency.get('llm_concurrency', 8)
+        self.db_concurrency = concurrency.get(
+            'db_concurrency', (mysql_config or {}).get('pool_size', 5) if db_type == 'mysql' else 4
+        )
+        self._slots_loop = None
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+    
+    @property
+    def context(self) -> List[Dict[str, str]]:
+        """Historial de la sesión por defecto (la que usa el modo consola)"""
+        return self.sessions.history(DEFAULT_SESSION)
     
     # --- 3. FUNCIÓN ASK() REESTRUCTURADA Y CORREGIDA ---
-    def ask(self, question: str) -> str:
+    def ask(self, question: str, session_id: str = DEFAULT_SESSION) -> str:
         """
         Pregunta principal del agente (con auto-corrección y manejo de errores)
+
+        Args:
+            question: Pregunta del usuario
+            session_id: Sesión cuyo historial se usa como contexto
         """
         print(f"\n🤔 Pregunta: {question}")
-        self._add_to_context("user", question)
+        start = time.perf_counter()
+        self._add_to_context(session_id, "user", question)
+        context = self.sessions.history(session_id)
         
         response_text = "" # Inicializar la variable de respuesta
+        answer_sql = None  # SQL que produjo la respuesta (se guarda en el historial)
+        path = "llm"
 
         try:
-            # --- 2. Generar SQL (Intento 1) ---
-            print("⚙️  Generando consulta SQL (Intento 1)...")
-            sql = self._generate_sql(question)
+            follow_up = is_follow_up(question, context[:-1])
+            
+            # --- 0. Ruta rápida: intención frecuente con SQL verificado ---
+            routed = self._route(question, follow_up)
+            routed_text = None
+            if routed:
+                routed_text = self._routed_answer(
+                    question, routed, self._execute(routed.sql, "routed")
+                )
             
-            if sql == "NO_QUERY":
-                response_text = "No puedo responder esa pregunta con los datos disponibles."
+            if routed_text is not None:
+                response_text = routed_text
+                answer_sql = routed.sql
+                path = "routed"
             else:
-                print(f"📊 SQL (Intento 1): {sql}")
-                results = self.tools["database"].execute(sql)
+                # --- 1. Buscar SQL ya validado para esta pregunta ---
+                cache_key, sql = self._lookup_sql_cache(question, follow_up)
+            
+                # --- 2. Generar SQL (Intento 1) ---
+                if sql:
+                    print(f"⚡ SQL desde caché: {sql}")
+                    path = "cached"
+                else:
+                    print("⚙️  Generando consulta SQL (Intento 1)...")
+                    sql = self._generate_sql(question, context)
+            
+                if sql == "NO_QUERY":
+                    response_text = "No puedo responder esa pregunta con los datos disponibles."
+                    path = "no_query"
+                elif self._confirmation_payload(sql):
+                    # Las escrituras no se ejecutan aquí: se piden confirmar (/confirm)
+                    print(f"📝 Escritura pendiente de confirmación: {sql}")
+                    response_text = self._confirmation_payload(sql)
+                    path = "write"
+                else:
+                    print(f"📊 SQL (Intento 1): {sql}")
+                    results = self._execute(sql, "1")
                 
-                # --- 4. Lógica de Auto-Corrección ---
-                if results and "error" in results[0]:
-                    original_error = results[0]['error']
-                    print(f"⚠️ Error en SQL (Intento 1): {original_error}")
-                    print("⚙️  Generando consulta SQL (Intento 2: Corrección)...")
-
-                    correction_prompt = self._generate_sql_correction_prompt(question, sql, original_error)
-                    corrected_sql = self.model.ask(correction_prompt, self.context)
-                    
-                    if corrected_sql.startswith("```sql"):
-                        corrected_sql = corrected_sql.replace("```sql", "").replace("```", "").strip()
-                    elif corrected_sql.startswith("```"):
-                        corrected_sql = corrected_sql.replace("```", "").strip()
-
-                    if corrected_sql == "NO_QUERY":
-                        response_text = f"Intenté corregir un error, pero no pude encontrar una respuesta ({original_error})."
-                    else:
-                        print(f"📊 SQL (Intento 2): {corrected_sql}")
-                        results = self.tools["database"].execute(corrected_sql)
-                        sql = corrected_sql
-
-                        if results and "error" in results[0]:
-                            final_error = results[0]['error']
-                            print(f"❌ Error en SQL (Intento 2): {final_error}")
-                            response_text = f"Error al ejecutar la consulta corregida: {final_error}"
+                    # --- 4. Lógica de Auto-Corrección ---
+                    if results and "error" in results[0]:
+                        original_error = results[0]['error']
+                        print(f"⚠️ Error en SQL (Intento 1): {original_error}")
+                        print("⚙️  Generando consulta SQL (Intento 2: Corrección)...")
+                        self.sql_cache.discard(cache_key)
+
+                        correction_prompt = self._generate_sql_correction_prompt(question, sql, original_error)
+                        with self.metrics.stage("correction"):
+                            corrected_sql = _strip_sql_markdown(self.model.ask(correction_prompt, context))
+
+                        if corrected_sql == "NO_QUERY":
+                            response_text = f"Intenté corregir un error, pero no pude encontrar una respuesta ({original_error})."
+                        else:
+                            print(f"📊 SQL (Intento 2): {corrected_sql}")
+                            results = self._execute(corrected_sql, "2")
+                            sql = corrected_sql
+
+                            if results and "error" in results[0]:
+                                final_error = results[0]['error']
+                                print(f"❌ Error en SQL (Intento 2): {final_error}")
+                                response_text = f"Error al ejecutar la consulta corregida: {final_error}"
                 
-                # --- 6. Generar Respuesta Natural (si no hubo error) ---
-                if not response_text: # Si no hemos asignado un error
-                    print(f"✅ Resultados: {len(results)} filas")
-                    response_text = self._generate_response(question, sql, results)
+                    # --- 6. Generar Respuesta Natural (si no hubo error) ---
+                    if not response_text: # Si no hemos asignado un error
+                        print(f"✅ Resultados: {len(results)} filas")
+                        self._store_sql_cache(question, sql, follow_up)
+                        answer_sql = sql
+                        response_text = self._generate_response(question, sql, results, context)
 
         except Exception as e:
             # Captura cualquier error inesperado (como los de JSON)
             print(f"❌ Ocurrió una excepción inesperada en 'ask': {e}")
             response_text = "Lo siento, ocurrió un error interno al procesar tu solicitud."
+            path = "error"
+
+        self._record_question(path, start)
+        return self._finish(session_id, response_text, answer_sql)
+    
+    async def ask_async(self, question: str, session_id: str = DEFAULT_SESSION) -> str:
+        """
+        Versión asíncrona de `ask` (misma lógica de auto-corrección).
+
+        Las llamadas a Gemini usan `generate_content_async` y las llamadas
+        a la BD se ejecutan en un hilo aparte, así el event loop de la API
+        sigue atendiendo otras peticiones mientras esta espera.
+        """
+        answer = ""
+        async for event in self._ask_events(question, session_id, stream=False):
+            if event["event"] == "done":
+                answer = event["data"]["answer"]
+        return answer
+    
+    async def ask_many(self, questions: List[str], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Responde varias preguntas independientes de forma concurrente.
+
+        Cada pregunta usa una sesión propia (sin historial compartido) y
+        el paralelismo real lo limitan `llm_concurrency` y `db_concurrency`.
+
+        Args:
+            questions: Preguntas a responder
+            timeout: Segundos máximos por pregunta (None = sin límite)
+
+        Returns:
+            Un resultado por pregunta, en el mismo orden:
+            {"index", "question", "answer", "sql", "error", "elapsed_ms"}
+        """
+        batch_id = uuid.uuid4().hex[:8]
+        start = time.perf_counter()
+
+        async def one(index: int, question: str) -> Dict[str, Any]:
+            session_id = f"batch-{batch_id}-{index}"
+            item = {"index": index, "question": question, "answer": None, "sql": None, "error": None}
+            item_start = time.perf_counter()
+
+            async def run():
+                async for event in self._ask_events(question, session_id, stream=False):
+                    if event["event"] == "sql":
+                        item["sql"] = event["data"]["sql"]
+                    elif event["event"] == "done":
+                        item["answer"] = event["data"]["answer"]
+                        item["error"] = event["data"].get("error")
+
+            try:
+                await asyncio.wait_for(run(), timeout)
+            except asyncio.TimeoutError:
+                item["error"] = f"Tiempo agotado ({timeout} s)"
+            except Exception as e:
+                item["error"] = str(e)
+            finally:
+                item["elapsed_ms"] = round((time.perf_counter() - item_start) * 1000, 1)
+                self.sessions.clear(session_id)
+            return item
+
+        items = await asyncio.gather(*(one(i, q) for i, q in enumerate(questions)))
+        print(f"📦 Lote de {len(questions)} preguntas en {time.perf_counter() - start:.2f} s")
+        return list(items)
+    
+    def _slot(self, kind: str) -> asyncio.Semaphore:
+        """Semáforo 'llm' o 'db' del event loop actual"""
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._slots_loop = loop
+            self._slots = {
+                "llm": asyncio.Semaphore(self.llm_concurrency),
+                "db": asyncio.Semaphore(self.db_concurrency),
+            }
+        return self._slots[kind]
+    
+    async def _db_call(self, fn, *args):
+        """Ejecuta una llamada bloqueante a la BD en un hilo, respetando `db_concurrency`"""
+        async with self._slot("db"):
+            return await asyncio.to_thread(fn, *args)
+    
+    async def _llm_call(self, prompt: str, context: List[Dict[str, str]]) -> str:
+        """Llamada a Gemini respetando `llm_concurrency`"""
+        async with self._slot("llm"):
+            return await self.model.ask_async(prompt, context)
+    
+    def ask_stream(self, question: str, session_id: str = DEFAULT_SESSION) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Igual que `ask_async` pero emite un evento por cada etapa:
+
+            sql      -> {"sql", "attempt", "cached"} (+ "intent" si fue la ruta rápida)
+            executed -> {"rows", "attempt"} o {"error", "attempt"}
+            token    -> {"text"}  (la respuesta final, trozo a trozo)
+            done     -> {"answer"} (+ "error" si la pregunta no se pudo responder)
+        """
+        return self._ask_events(question, session_id, stream=True)
+    
+    async def _ask_events(
+        self, question: str, session_id: str, stream: bool
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Pipeline asíncrono completo, expresado como una secuencia de eventos"""
+        print(f"\n🤔 Pregunta: {question}")
+        start = time.perf_counter()
+        self._add_to_context(session_id, "user", question)
+        context = self.sessions.history(session_id)
+        db = self.tools["database"]
+        
+        response_text = ""
+        answer_sql = None
+        error = None
+        path = "llm"
+
+        try:
+            follow_up = is_follow_up(question, context[:-1])
+            # El router puede recargar los nombres de productos: va en un hilo
+            routed = await self._db_call(self._route, question, follow_up)
+            routed_text = None
+            if routed:
+                yield {"event": "sql", "data": {"sql": routed.sql, "attempt": 1, "cached": False, "intent": routed.intent}}
+                results = await self._db_call(self._execute, routed.sql, "routed")
+                routed_text = self._routed_answer(question, routed, results)
+                if routed_text is not None:
+                    yield {"event": "executed", "data": {"rows": len(results), "attempt": 1}}
+            
+            if routed_text is not None:
+                response_text = routed_text
+                answer_sql = routed.sql
+                path = "routed"
+            else:
+                cache_key, sql = await self._db_call(self._lookup_sql_cache, question, follow_up)
+                cached = bool(sql)
+            
+                if sql:
+                    print(f"⚡ SQL desde caché: {sql}")
+                    path = "cached"
+                else:
+                    print("⚙️  Generando consulta SQL (Intento 1)...")
+                    sql = await self._generate_sql_async(question, context)
+            
+                if sql == "NO_QUERY":
+                    response_text = "No puedo responder esa pregunta con los datos disponibles."
+                    path = "no_query"
+                elif self._confirmation_payload(sql):
+                    # Las escrituras no se ejecutan aquí: se piden confirmar (/confirm)
+                    print(f"📝 Escritura pendiente de confirmación: {sql}")
+                    yield {"event": "sql", "data": {"sql": sql, "attempt": 1, "cached": cached}}
+                    response_text = self._confirmation_payload(sql)
+                    path = "write"
+                else:
+                    print(f"📊 SQL (Intento 1): {sql}")
+                    yield {"event": "sql", "data": {"sql": sql, "attempt": 1, "cached": cached}}
+                    results = await self._db_call(self._execute, sql, "1")
+                    attempt = 1
+                
+                    if results and "error" in results[0]:
+                        original_error = results[0]['error']
+                        print(f"⚠️ Error en SQL (Intento 1): {original_error}")
+                        print("⚙️  Generando consulta SQL (Intento 2: Corrección)...")
+                        yield {"event": "executed", "data": {"error": original_error, "attempt": 1}}
+                        self.sql_cache.discard(cache_key)
+
+                        with self.metrics.stage("schema"):
+                            schema = await self._db_call(db.get_schema)
+                        correction_prompt = self._generate_sql_correction_prompt(question, sql, original_error, schema)
+                        with self.metrics.stage("correction"):
+                            corrected_sql = _strip_sql_markdown(await self._llm_call(correction_prompt, context))
+
+                        if corrected_sql == "NO_QUERY":
+                            error = original_error
+                            response_text = f"Intenté corregir un error, pero no pude encontrar una respuesta ({original_error})."
+                        else:
+                            print(f"📊 SQL (Intento 2): {corrected_sql}")
+                            yield {"event": "sql", "data": {"sql": corrected_sql, "attempt": 2, "cached": False}}
+                            results = await self._db_call(self._execute, corrected_sql, "2")
+                            sql = corrected_sql
+                            attempt = 2
+
+                            if results and "error" in results[0]:
+                                final_error = results[0]['error']
+                                print(f"❌ Error en SQL (Intento 2): {final_error}")
+                                yield {"event": "executed", "data": {"error": final_error, "attempt": 2}}
+                                error = final_error
+                                response_text = f"Error al ejecutar la consulta corregida: {final_error}"
+                
+                    if not response_text:
+                        print(f"✅ Resultados: {len(results)} filas")
+                        yield {"event": "executed", "data": {"rows": len(results), "attempt": attempt}}
+                        self._store_sql_cache(question, sql, follow_up)
+                        answer_sql = sql
+                    
+                        local = self._local_response(question, sql, results)
+                        if local is not None:
+                            response_text = local
+                        elif stream:
+                            prompt = self._response_prompt(question, sql, results)
+                            parts = []
+                            with self.metrics.stage("response_generation"):
+                                async with self._slot("llm"):
+                                    async for chunk in self.model.ask_stream_async(prompt, context):
+                                        parts.append(chunk)
+                                        yield {"event": "token", "data": {"text": chunk}}
+                            response_text = "".join(parts).strip()
+                        else:
+                            response_text = await self._generate_response_async(question, sql, results, context)
+
+        except Exception as e:
+            print(f"❌ Ocurrió una excepción inesperada en 'ask_async': {e}")
+            error = str(e)
+            response_text = "Lo siento, ocurrió un error interno al procesar tu solicitud."
+            path = "error"
 
+        self._record_question(path, start)
+        done = {"answer": self._finish(session_id, response_text, answer_sql)}
+        if error:
+            done["error"] = error
+        yield {"event": "done", "data": done}
+    
+    def _finish(self, session_id: str, response_text: str, sql: Optional[str] = None) -> str:
         # --- 7. Limpieza y Contexto (Ahora en un lugar seguro) ---
         
         # Limpiar el ````json````
@@ -128,14 +463,150 @@ class MCPAgent:
             print("Limpiando JSON envuelto en markdown...")
             response_text = response_text.strip().replace("```json", "").replace("```", "").strip()
         
-        self._add_to_context("assistant", response_text)
+        # En el historial va el resumen (tipo, título, columnas, filas, SQL), no el JSON completo
+        self._add_to_context(session_id, "assistant", self.compactor.digest(response_text, sql))
         return response_text
     
-    def _generate_sql(self, question: str) -> str:
+    def _record_question(self, path: str, start: float):
+        """Camino de respuesta y latencia total de una pregunta"""
+        self.metrics.question(path)
+        self.metrics.observe_stage("total", time.perf_counter() - start)
+    
+    def _execute(self, sql: str, attempt: str):
+        """Ejecuta un SELECT midiendo la etapa y las filas (attempt: "routed", "1" o "2")"""
+        with self.metrics.stage("sql_execution"):
+            results = self.tools["database"].execute(sql)
+        self.metrics.execution(attempt, results)
+        return results
+    
+    def _route(self, question: str, follow_up: bool) -> Optional[IntentMatch]:
+        """Intención reconocida para la pregunta (las de seguimiento van al LLM)"""
+        if follow_up:
+            return None
+        with self.metrics.stage("routing"):
+            routed = self.router.route(question)
+        if routed:
+            print(f"🧭 Intención '{routed.intent}' (confianza {routed.confidence:.2f}): {routed.sql}")
+        return routed
+    
+    def _routed_answer(self, question: str, routed: IntentMatch, results: List[Dict]) -> Optional[str]:
+        """Respuesta local de la ruta rápida; None si el SQL falló y hay que usar el LLM"""
+        if results and "error" in results[0]:
+            print(f"⚠️ Ruta rápida '{routed.intent}' falló ({results[0]['error']}); se usa el LLM")
+            self.router.record_failure(routed.intent)
+            return None
+        print(f"✅ Resultados: {len(results)} filas (sin LLM)")
+        with self.metrics.stage("formatting"):
+            return self._fast_formatter.format(question, results, force=True)
+    
+    def _lookup_sql_cache(self, question: str, follow_up: bool) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Devuelve (llave, sql) de la caché pregunta → SQL.
+
+        Las preguntas de seguimiento dependen del historial, así que no
+        se buscan ni se guardan. La huella del esquema se recalcula aquí
+        (una consulta barata): en un acierto nadie llama a get_schema, y
+        sin esto un cambio de DDL no invalidaría el SQL cacheado.
+        """
+        if follow_up:
+            self.sql_cache.record_bypass()
+            return None, None
+        
+        self.tools["database"].schema_fingerprint()
+        fingerprint = getattr(self.tools["database"], "structure_fingerprint", None)
+        key = SQLCache.key(question, fingerprint)
+        return key, self.sql_cache.get(key)
+    
+    def _store_sql_cache(self, question: str, sql: str, follow_up: bool):
+        """Guarda el SQL que se ejecutó sin error (solo SELECT)"""
+        if follow_up or not sql.strip().upper().startswith("SELECT"):
+            return
+        fingerprint = getattr(self.tools["database"], "structure_fingerprint", None)
+        self.sql_cache.put(SQLCache.key(question, fingerprint), sql)
+    
+    def _generate_sql(self, question: str, context: List[Dict[str, str]]) -> str:
         # Obtener el esquema actual de la BD
-        schema = self.tools["database"].get_schema()
+        with self.metrics.stage("schema"):
+            schema = self.tools["database"].get_schema()
+        products = self._resolve_products(question)
+        prompt = self._sql_prompt(question, schema, products)
+        start = time.perf_counter()
+        if self.candidates.enabled:
+            sql = self.candidates.race(
+                lambda: _strip_sql_markdown(self.model.ask(prompt, context)),
+                lambda bad_sql, error: _strip_sql_markdown(self.model.ask(
+                    self._generate_sql_correction_prompt(question, bad_sql, error, schema), context
+                )),
+                self._dry_run
+            )
+        else:
+            sql = self.model.ask(prompt, context)
+        elapsed = time.perf_counter() - start
+        self.sql_cache.record_llm_latency(elapsed)
+        self.metrics.observe_stage("sql_generation", elapsed)
         
+        # Limpieza de markdown (por si acaso Gemini lo pone)
+        return _strip_sql_markdown(sql)
+    
+    async def _generate_sql_async(self, question: str, context: List[Dict[str, str]]) -> str:
+        with self.metrics.stage("schema"):
+            schema = await self._db_call(self.tools["database"].get_schema)
+        products = await self._db_call(self._resolve_products, question)
+        prompt = self._sql_prompt(question, schema, products)
+        start = time.perf_counter()
+        if self.candidates.enabled:
+            async def generate() -> str:
+                return _strip_sql_markdown(await self._llm_call(prompt, context))
+            
+            async def correct(bad_sql: str, error: str) -> str:
+                correction_prompt = self._generate_sql_correction_prompt(question, bad_sql, error, schema)
+                return _strip_sql_markdown(await self._llm_call(correction_prompt, context))
+            
+            async def validate(candidate: str) -> Optional[str]:
+                return await self._db_call(self._dry_run, candidate)
+            
+            sql = await self.candidates.race_async(generate, correct, validate)
+        else:
+            sql = await self._llm_call(prompt, context)
+        elapsed = time.perf_counter() - start
+        self.sql_cache.record_llm_latency(elapsed)
+        self.metrics.observe_stage("sql_generation", elapsed)
+        return _strip_sql_markdown(sql)
+    
+    def _dry_run(self, sql: str) -> Optional[str]:
+        """Validación barata de un candidato (EXPLAIN): None si es válido, o el error"""
+        if sql == "NO_QUERY" or not sql.strip().upper().startswith("SELECT"):
+            return None
+        return self.tools["database"].validate(sql)
+    
+    def _resolve_products(self, question: str) -> List[Tuple[int, str]]:
+        """(id_producto, nombre) de los productos mencionados en la pregunta"""
+        if not self.products:
+            return []
+        products, _ = self.products.find(set(normalize_question(question).split()))
+        return products
+    
+    def _sql_prompt(self, question: str, schema: str, products: Optional[List[Tuple[int, str]]] = None) -> str:
+        """
+        Construye el prompt experto para generar el SQL.
+
+        Usa solo las tablas relevantes del esquema; el reintento de
+        corrección sigue recibiendo el esquema completo. Los productos
+        ya identificados se pasan por `id_producto`, para que Gemini
+        filtre por clave primaria en lugar de `LIKE '%...%'`.
+        """
+        full_schema = schema
+        schema = self.schema_selector.select(question, full_schema)
         db_hint = "MySQL" if self.db_type == 'mysql' else "SQLite"
+        products_hint = ""
+        if products:
+            listed = "\n".join(f"   - id_producto {product_id}: {name}" for product_id, name in products)
+            ids = ", ".join(str(product_id) for product_id, _ in products)
+            products_hint = f"""
+PRODUCTOS IDENTIFICADOS EN LA PREGUNTA (ya resueltos, aunque estén mal escritos):
+{listed}
+   - Filtra con `id_producto IN ({ids})`; NO uses `LIKE` sobre el nombre.
+"""
         
         # --- INICIO DEL PROMPT EXPERTO LEGACY PHARMACY ---
         system_instruction = f"""
@@ -159,8 +630,9 @@ REGLAS EXPERTAS (PRIORIDAD ALTA):
 
 4. **MODIFICACIONES:**
    - Puedes generar `INSERT` o `UPDATE` si el usuario lo pide explícitamente.
+   - Si son varios cambios, genera varias sentencias separadas por `;` (se ejecutan juntas en una transacción).
    - NO uses `DELETE`, `DROP` o `ALTER`.
-
+{products_hint}
 Pregunta del usuario: {question}
 
 Genera SOLO la consulta SQL (sin explicaciones ni formato markdown).
@@ -168,22 +640,20 @@ Si no se puede responder, devuelve: NO_QUERY
 """
         # --- FIN DEL PROMPT ---
         
-        sql = self.model.ask(system_instruction, self.context)
-        
-        # Limpieza de markdown (por si acaso Gemini lo pone)
-        if sql.startswith("```sql"):
-            sql = sql.replace("```sql", "").replace("```", "").strip()
-        elif sql.startswith("```"):
-            sql = sql.replace("```", "").strip()
-        
-        return sql
+        saved = len(full_schema) - len(schema)
+        print(f"✂️  Prompt SQL: {len(system_instruction) + saved} → {len(system_instruction)} caracteres")
+        self.metrics.prompt("sql", system_instruction)
+        return system_instruction
     
-    def _generate_sql_correction_prompt(self, question: str, bad_sql: str, error: str) -> str:
-        # ... (Esta función está bien, no hay cambios) ...
-        schema = self.tools["database"].get_schema()
+    def _generate_sql_correction_prompt(
+        self, question: str, bad_sql: str, error: str, schema: Optional[str] = None
+    ) -> str:
+        if schema is None:
+            with self.metrics.stage("schema"):
+                schema = self.tools["database"].get_schema()
         db_hint = "MySQL" if self.db_type == 'mysql' else "SQLite"
 
-        return f"""Eres un experto en SQL para {db_hint}.
+        prompt = f"""Eres un experto en SQL para {db_hint}.
 {schema}
 
 El usuario preguntó: {question}
@@ -197,14 +667,50 @@ Pero falló con este error:
 Por favor, corrige la consulta SQL. Genera SOLO la consulta SQL corregida (sin explicaciones).
 Si no se puede responder, devuelve: NO_QUERY
 """
+        self.metrics.prompt("correction", prompt)
+        return prompt
 
     # --- 4. FUNCIÓN _generate_response() CORREGIDA ---
-    def _generate_response(self, question: str, sql: str, results: List[Dict]) -> str:
+    def _generate_response(
+        self, question: str, sql: str, results: List[Dict], context: List[Dict[str, str]]
+    ) -> str:
         """
         Genera respuesta. Intercepta INSERT/UPDATE para pedir confirmación.
         Decide si la respuesta es texto, tabla o gráfico.
         """
-        
+        local = self._local_response(question, sql, results)
+        if local is not None:
+            return local
+        prompt = self._response_prompt(question, sql, results)
+        with self.metrics.stage("response_generation"):
+            return self.model.ask(prompt, context)
+    
+    async def _generate_response_async(
+        self, question: str, sql: str, results: List[Dict], context: List[Dict[str, str]]
+    ) -> str:
+        local = self._local_response(question, sql, results)
+        if local is not None:
+            return local
+        prompt = self._response_prompt(question, sql, results)
+        with self.metrics.stage("response_generation"):
+            return await self._llm_call(prompt, context)
+    
+    def _local_response(self, question: str, sql: str, results: List[Dict]) -> Optional[str]:
+        """
+        Respuesta que no necesita al LLM: la confirmación de escrituras o,
+        para SELECT, el formato local (texto/tabla/gráfico) con todas las filas.
+        None si hace falta que Gemini redacte la respuesta.
+        """
+        confirm = self._confirmation_payload(sql)
+        if confirm:
+            return confirm
+        if self.formatter:
+            with self.metrics.stage("formatting"):
+                return self.formatter.format(question, results)
+        return None
+    
+    def _confirmation_payload(self, sql: str) -> Optional[str]:
+        """Si el SQL es INSERT/UPDATE devuelve el JSON de confirmación, si no None"""
         # --- ¡NUEVA LÓGICA DE INTERCEPCIÓN! ---
         sql_upper = sql.strip().upper()
         if sql_upper.startswith("INSERT") or sql_upper.startswith("UPDATE"):
@@ -219,22 +725,36 @@ Si no se puede responder, devuelve: NO_QUERY
                 "message": "Estoy a punto de realizar la siguiente operación en la base de datos:",
                 "sql_query": sql 
             }
+            # Varias sentencias: /confirm las ejecuta en una sola transacción
+            statements = split_statements(sql)
+            if len(statements) > 1:
+                confirm_data["statements"] = [{"sql": s} for s in statements]
             # Devolvemos el JSON de confirmación como un string
             return json.dumps(confirm_data)
 
         # --- FIN DE LA LÓGICA DE INTERCEPCIÓN ---
-        
+        return None
+    
+    def _response_prompt(self, question: str, sql: str, results: List[Dict]) -> str:
+        """Construye el prompt que decide entre texto, tabla o gráfico"""
         # (El resto de la función es la misma lógica de siempre
         # para texto, tablas y gráficos, que solo se ejecutará
         # si el SQL fue un SELECT)
         
-        results_str = json.dumps(results, cls=CustomDecimalEncoder)
+        # Solo se serializan las filas que pueden entrar en el prompt
+        results_str = dumps(records(QueryResult.from_dicts(results).head(PROMPT_SAMPLE_ROWS)))
         
         if len(results_str) > 3000:
             results_str = results_str[:3000] + "... (resultados truncados)"
         
+        total = getattr(results, "total_estimate", None)
+        capped = (
+            f"\n(La consulta devolvió más filas de las mostradas: se leyeron {len(results)}"
+            + (f" de ~{total}" if total else "") + ")"
+        ) if getattr(results, "truncated", False) else ""
+        
         prompt_header = f"""El usuario preguntó: {question}
-Se ejecutó: {sql}
+Se ejecutó: {sql}{capped}
 Resultados: """
         
         prompt_body = """
@@ -260,36 +780,49 @@ INSTRUCCIÓN FINAL: Responde SOLAMENTE con el formato JSON (para 'chart' o 'tabl
 """
         
         prompt = prompt_header + results_str + prompt_body
-        
-        return self.model.ask(prompt, self.context)
+        self.metrics.prompt("response", prompt)
+        return prompt
     
-    def _add_to_context(self, role: str, content: str):
-        # ... (Esta función está bien, no hay cambios) ...
-        self.context.append({"role": role, "content": content})
-        
-        if len(self.context) > self.max_context:
-            self.context = self.context[-self.max_context:]
+    def _add_to_context(self, session_id: str, role: str, content: str):
+        # El SessionStore recorta el historial y aplica los topes de memoria
+        self.sessions.append(session_id, role, content)
     
     def add_tool(self, name: str, tool: Any):
         # ... (Esta función está bien, no hay cambios) ...
         self.tools[name] = tool
         print(f"✅ Herramienta '{name}' agregada")
     
-    def get_context_summary(self) -> Dict:
-        # ... (Esta función está bien, no hay cambios) ...
+    def get_context_summary(self, session_id: str = DEFAULT_SESSION) -> Dict:
         return {
-            "messages": len(self.context),
+            "messages": len(self.sessions.history(session_id)),
             "database_type": self.db_type,
             "tools": list(self.tools.keys())
         }
     
-    def clear_context(self):
-        # ... (Esta función está bien, no hay cambios) ...
-        self.context = []
+    def get_stats(self) -> Dict:
+        """Estadísticas de las sesiones y de la herramienta de base de datos"""
+        db = self.tools.get("database")
+        return {
+            "sessions": self.sessions.stats(),
+            "sql_cache": self.sql_cache.stats(),
+            "schema_selector": self.schema_selector.stats(),
+            "formatter": self.formatter.stats() if self.formatter else None,
+            "intent_router": self.router.stats(),
+            "product_index": self.products.stats() if self.products else None,
+            "model_replay": self.model.stats() if isinstance(self.model, RecordReplayModel) else None,
+            "context": self.compactor.stats(),
+            "sql_candidates": self.candidates.stats() if self.candidates.enabled else None,
+            "concurrency": {"llm": self.llm_concurrency, "db": self.db_concurrency},
+            "database": db.stats() if hasattr(db, "stats") else None,
+        }
+    
+    def clear_context(self, session_id: str = DEFAULT_SESSION):
+        self.sessions.clear(session_id)
         print("🧹 Contexto limpiado")
     
     def close(self):
         # ... (Esta función está bien, no hay cambios) ...
+        self.candidates.close()
         for tool in self.tools.values():
             if hasattr(tool, 'close'):
                 tool.close()
\ No newline at end of file
@@ -2,31 +2,67 @@
 API para el Agente de Base de Datos de la Droguería
 Basado en FastAPI
 """
+import csv
+import io
+import time
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import Any, List, Optional
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 import json
 
 # Importar la lógica de tu agente
 from agent import MCPAgent
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from serializer import dumps, native_rows
+from tools.bounded import QueryResult
 from config import (
     GEMINI_API_KEY, 
     GEMINI_MODEL, 
     MYSQL_CONFIG,
-    DATABASE_TYPE
+    DATABASE_TYPE,
+    SESSION_CONFIG,
+    SQL_CACHE_CONFIG,
+    SCHEMA_SELECTOR_CONFIG,
+    LOCAL_FORMATTER,
+    CONCURRENCY_CONFIG,
+    BATCH_CONFIG,
+    INTENT_ROUTER_CONFIG,
+    PRODUCT_INDEX_CONFIG,
+    METRICS_CONFIG,
+    MODEL_REPLAY_CONFIG,
+    CONTEXT_CONFIG,
+    CANDIDATES_CONFIG
 )
+from sessions import DEFAULT_SESSION
 
 # --- Modelos de Datos (Pydantic) ---
 
 # 1. Para hacer preguntas normales
 class QuestionRequest(BaseModel):
     question: str
+    # Identificador de la conversación (lo genera index.html por pestaña)
+    session_id: Optional[str] = None
+
+# 1b. Para varias preguntas independientes en una sola petición
+class BatchRequest(BaseModel):
+    questions: List[str]
 
 # 2. (NUEVO) Para confirmar una operación de escritura (INSERT/UPDATE)
+class WriteStatement(BaseModel):
+    sql: str
+    # Filas de parámetros: la sentencia se ejecuta con executemany
+    params: Optional[List[List[Any]]] = None
+
 class ConfirmRequest(BaseModel):
-    sql_query: str
+    # Una sentencia (o varias separadas por ';')...
+    sql_query: Optional[str] = None
+    params: Optional[List[List[Any]]] = None
+    # ...o un lote explícito. Todo se ejecuta en una sola transacción
+    statements: Optional[List[WriteStatement]] = None
 
 # 3. Lo que devolvemos al frontend
 class AnswerResponse(BaseModel):
@@ -47,7 +83,18 @@ async def lifespan(app: FastAPI):
             api_key=GEMINI_API_KEY,
             model_name=GEMINI_MODEL,
             db_type=DATABASE_TYPE, 
-            mysql_config=MYSQL_CONFIG
+            mysql_config=MYSQL_CONFIG,
+            session_config=SESSION_CONFIG,
+            sql_cache_config=SQL_CACHE_CONFIG,
+            schema_selector_config=SCHEMA_SELECTOR_CONFIG,
+            local_formatter=LOCAL_FORMATTER,
+            concurrency_config=CONCURRENCY_CONFIG,
+            intent_router_config=INTENT_ROUTER_CONFIG,
+            product_index_config=PRODUCT_INDEX_CONFIG,
+            metrics_config=METRICS_CONFIG,
+            model_replay_config=MODEL_REPLAY_CONFIG,
+            context_config=CONTEXT_CONFIG,
+            candidates_config=CANDIDATES_CONFIG
         )
         print("✅ AGENTE CONECTADO Y LISTO")
         print("=" * 80)
@@ -85,7 +132,7 @@ app.add_middleware(
 
 @app.get("/", summary="Endpoint de saludo")
 def read_root():
-    return {"message": "API del Agente activa. Usa /ask para preguntar o /confirm para ejecutar cambios."}
+    return {"message": "API del Agente activa. Usa /ask para preguntar, /confirm para ejecutar cambios o /export para descargar resultados."}
 
 @app.post("/ask", response_model=AnswerResponse, summary="Hacer una pregunta")
 async def ask_agent(request: QuestionRequest):
@@ -98,7 +145,11 @@ async def ask_agent(request: QuestionRequest):
     
     try:
         print(f"\n🤔 Pregunta recibida: {request.question}")
-        respuesta_agente = agente_global.ask(request.question)
+        # ask_async no bloquea el event loop: Gemini se espera de forma
+        # asíncrona y la BD corre en hilos del pool de conexiones
+        respuesta_agente = await agente_global.ask_async(
+            request.question, request.session_id or DEFAULT_SESSION
+        )
         print(f"🤖 Respuesta enviada (puede ser texto o JSON): {respuesta_agente[:100]}...") 
         return AnswerResponse(answer=respuesta_agente)
     
@@ -106,19 +157,149 @@ async def ask_agent(request: QuestionRequest):
         print(f"❌ Error en /ask: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/ask/stream", summary="Hacer una pregunta y recibir el progreso por SSE")
+async def ask_agent_stream(request: QuestionRequest):
+    """
+    Igual que /ask, pero responde con server-sent events a medida que
+    avanza el pipeline: `sql` (consulta generada), `executed` (filas o error),
+    `token` (trozos de la respuesta final) y `done` (respuesta completa,
+    con el mismo formato que /ask).
+    """
+    if agente_global is None:
+        raise HTTPException(status_code=503, detail="El agente no está disponible.")
+
+    print(f"\n🤔 Pregunta recibida (stream): {request.question}")
+
+    async def eventos():
+        async for evento in agente_global.ask_stream(
+            request.question, request.session_id or DEFAULT_SESSION
+        ):
+            datos = dumps(evento["data"])
+            yield f"event: {evento['event']}\ndata: {datos}\n\n"
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/ask/batch", summary="Hacer varias preguntas en paralelo")
+async def ask_agent_batch(request: BatchRequest):
+    """
+    Responde una lista de preguntas independientes de forma concurrente
+    (limitada por LLM_CONCURRENCY y DB_CONCURRENCY). Los resultados vuelven
+    en el mismo orden, cada uno con su tiempo y su error si lo hubo.
+    """
+    if agente_global is None:
+        raise HTTPException(status_code=503, detail="El agente no está disponible.")
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="La lista de preguntas está vacía.")
+    if len(request.questions) > BATCH_CONFIG['max_questions']:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {BATCH_CONFIG['max_questions']} preguntas por lote."
+        )
+
+    print(f"\n📦 Lote recibido: {len(request.questions)} preguntas")
+    inicio = time.perf_counter()
+    resultados = await agente_global.ask_many(
+        request.questions, timeout=BATCH_CONFIG['item_timeout'] or None
+    )
+    return {
+        "results": resultados,
+        "elapsed_ms": round((time.perf_counter() - inicio) * 1000, 1),
+        "errors": sum(1 for r in resultados if r["error"]),
+    }
+
+# --- EXPORTACIÓN DE RESULTADOS COMPLETOS ---
+
+def _csv_chunks(columns, lotes):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM para que Excel abra bien las tildes
+    buffer.write("\ufeff")
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for lote in lotes:
+        buffer.seek(0)
+        buffer.truncate(0)
+        writer.writerows(lote)
+        yield buffer.getvalue()
+
+def _ndjson_chunks(columns, lotes):
+    for lote in lotes:
+        # Conversión de Decimal/fechas por columna para todo el lote
+        yield "".join(
+            dumps(dict(zip(columns, fila))) + "\n"
+            for fila in native_rows(QueryResult(columns, lote))
+        )
+
+EXPORT_FORMATS = {
+    "csv": (_csv_chunks, "text/csv; charset=utf-8"),
+    "ndjson": (_ndjson_chunks, "application/x-ndjson"),
+}
+
+# Es `def`: StreamingResponse consume el generador en el pool de hilos,
+# así que la lectura del cursor no bloquea el event loop.
+@app.get("/export", summary="Descargar el resultado completo de un SELECT (CSV o NDJSON)")
+def export_results(
+    sql: str,
+    formato: str = Query("csv", alias="format", pattern="^(csv|ndjson)$")
+):
+    """
+    Ejecuta un SELECT (generado o confirmado) y envía las filas a medida
+    que llegan del servidor, sin el tope de filas de /ask y sin
+    acumularlas en memoria.
+    """
+    if agente_global is None:
+        raise HTTPException(status_code=503, detail="El agente no está disponible.")
+
+    db_tool = agente_global.tools.get("database")
+    if not db_tool:
+        raise HTTPException(status_code=500, detail="Herramienta de base de datos no encontrada.")
+
+    print(f"\n📤 Exportando ({formato}): {sql}")
+    lotes = db_tool.iter_rows(sql)
+    try:
+        # El primer paso ejecuta la consulta: los errores se reportan como 400
+        columns = next(lotes)
+    except Exception as e:
+        lotes.close()
+        raise HTTPException(status_code=400, detail=f"No se pudo exportar: {str(e)}")
+
+    chunks, media_type = EXPORT_FORMATS[formato]
+    return StreamingResponse(
+        chunks(columns, lotes),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="export.{formato}"'}
+    )
+
 # --- (NUEVO) ENDPOINT DE CONFIRMACIÓN ---
+# Es `def` (no `async def`): FastAPI lo corre en su pool de hilos y, como
+# MySQLTool usa un pool de conexiones, varias confirmaciones avanzan en paralelo.
 @app.post("/confirm", summary="Ejecutar SQL confirmado por usuario")
-async def confirm_action(request: ConfirmRequest):
+def confirm_action(request: ConfirmRequest):
     """
     Recibe un SQL de escritura (INSERT/UPDATE) que el usuario ya aprobó
     en el frontend y lo ejecuta directamente en la base de datos.
+
+    También acepta un lote (`statements`, o `sql_query` con `params`
+    para una sentencia parametrizada con muchas filas): se ejecuta en
+    una sola transacción, todo o nada, con un único commit.
     """
     if agente_global is None:
         raise HTTPException(status_code=503, detail="El agente no está disponible.")
+    if not request.sql_query and not request.statements:
+        raise HTTPException(status_code=400, detail="Falta `sql_query` o `statements`.")
 
     try:
-        sql_to_run = request.sql_query
-        print(f"\n⚠️ EJECUTANDO SQL CONFIRMADO: {sql_to_run}")
+        if request.statements:
+            sql_to_run = [{"sql": s.sql, "params": s.params} for s in request.statements]
+            print(f"\n⚠️ EJECUTANDO LOTE CONFIRMADO: {len(sql_to_run)} sentencia(s)")
+        else:
+            sql_to_run = request.sql_query
+            filas = f" ({len(request.params)} filas de parámetros)" if request.params else ""
+            print(f"\n⚠️ EJECUTANDO SQL CONFIRMADO{filas}: {sql_to_run}")
 
         # 1. Accedemos directamente a la herramienta de base de datos del agente
         #    Asumimos que la key se llama "database" (como pusimos en agent.py)
@@ -129,7 +310,7 @@ async def confirm_action(request: ConfirmRequest):
 
         # 2. Llamamos a la función execute_write que creamos en mysql_tool.py
         #    Nota: execute_write devuelve un diccionario, ej: {"success": True, "message": "..."}
-        resultado = db_tool.execute_write(sql_to_run)
+        resultado = db_tool.execute_write(sql_to_run, request.params if not request.statements else None)
         
         # 3. Convertimos el diccionario a JSON string para devolverlo
         return {"answer": json.dumps(resultado)}
@@ -138,6 +319,25 @@ async def confirm_action(request: ConfirmRequest):
         print(f"❌ Error en /confirm: {e}")
         raise HTTPException(status_code=500, detail=f"Error ejecutando SQL: {str(e)}")
 
+@app.get("/stats", summary="Estadísticas de sesiones, pool de conexiones y cachés")
+def get_stats():
+    if agente_global is None:
+        raise HTTPException(status_code=503, detail="El agente no está disponible.")
+
+    return agente_global.get_stats()
+
+@app.get("/metrics", summary="Métricas por etapa en formato Prometheus", response_class=PlainTextResponse)
+def get_metrics():
+    if agente_global is None:
+        raise HTTPException(status_code=503, detail="El agente no está disponible.")
+    if not agente_global.metrics.enabled:
+        raise HTTPException(status_code=404, detail="Las métricas están desactivadas (METRICS=false).")
+
+    return PlainTextResponse(
+        agente_global.metrics.render(agente_global.get_stats()),
+        media_type=METRICS_CONTENT_TYPE
+    )
+
 if __name__ == "__main__":
     print("Iniciando servidor API en http://127.0.0.1:8000")
     uvicorn.run("api:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""
+Prueba de carga simple para /ask
+
+Lanza la misma pregunta con distintos niveles de concurrencia contra una
+API ya levantada (python api.py) y muestra el throughput de cada nivel.
+Con el pipeline asíncrono el throughput debe crecer con los clientes en
+vez de quedarse plano.
+
+Uso:
+    python -m benchmarks.ask_concurrency --url http://127.0.0.1:8000 --levels 1,4,16
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def preguntar(url: str, question: str) -> float:
+    """Hace un POST a /ask y devuelve la latencia en segundos"""
+    body = json.dumps({"question": question}).encode("utf-8")
+    req = urllib.request.Request(
+        f"{url}/ask", data=body, headers={"Content-Type": "application/json"}
+    )
+    inicio = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=120) as resp:
+        resp.read()
+    return time.perf_counter() - inicio
+
+
+def correr_nivel(url: str, question: str, clientes: int, por_cliente: int) -> dict:
+    total = clientes * por_cliente
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clientes) as pool:
+        latencias = list(pool.map(lambda _: preguntar(url, question), range(total)))
+    duracion = time.perf_counter() - inicio
+    return {
+        "clientes": clientes,
+        "peticiones": total,
+        "throughput_rps": round(total / duracion, 2),
+        "latencia_mediana_ms": round(statistics.median(latencias) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--question", default="¿Qué productos están en rojo?")
+    parser.add_argument("--levels", default="1,2,4,8,16")
+    parser.add_argument("--per-client", type=int, default=3)
+    args = parser.parse_args()
+
+    for clientes in [int(x) for x in args.levels.split(",")]:
+        r = correr_nivel(args.url, args.question, clientes, args.per_client)
+        print(
+            f"{r['clientes']:>3} clientes | {r['throughput_rps']:>7} req/s | "
+            f"mediana {r['latencia_mediana_ms']} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Tiempo al primer byte: /ask vs /ask/stream
+
+/ask no envía nada hasta tener la respuesta completa; /ask/stream envía
+el primer evento (SQL generado) apenas lo tiene. Este script mide, para
+cada endpoint, el tiempo al primer byte del cuerpo y el tiempo total.
+
+Uso:
+    python -m benchmarks.ask_ttfb --url http://127.0.0.1:8000 --repeat 5
+"""
+import argparse
+import http.client
+import json
+import statistics
+import time
+from urllib.parse import urlparse
+
+
+def medir(url: str, path: str, question: str) -> tuple:
+    """Devuelve (ttfb, total) en segundos para un POST"""
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=120)
+    body = json.dumps({"question": question, "session_id": f"ttfb-{time.time_ns()}"})
+
+    inicio = time.perf_counter()
+    conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+    resp = conn.getresponse()
+    resp.read(1)
+    ttfb = time.perf_counter() - inicio
+    resp.read()
+    total = time.perf_counter() - inicio
+    conn.close()
+    return ttfb, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--question", default="Dame un reporte de ventas por día")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for path in ("/ask", "/ask/stream"):
+        muestras = [medir(args.url, path, args.question) for _ in range(args.repeat)]
+        ttfb = statistics.median(m[0] for m in muestras) * 1000
+        total = statistics.median(m[1] for m in muestras) * 1000
+        print(f"{path:<12} TTFB mediana {ttfb:8.1f} ms | total mediana {total:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Generador de carga HTTP para la API: /ask y /confirm
+
+Reproduce un corpus de peticiones contra una instancia ya levantada y
+reporta, por nivel de carga, latencia p50/p95/p99, throughput, tasa de
+error y el punto de saturación, en JSON (para comparar versiones o
+ajustes de despliegue).
+
+Dos modos:
+    --concurrency 1,4,16   lazo cerrado: N clientes, cada uno espera su respuesta
+    --rates 5,10,20        lazo abierto: N peticiones por segundo, lleguen o no las
+                           respuestas (la latencia se mide desde el instante en que
+                           la petición debía salir, así la cola también cuenta)
+
+Una petición es error si falla la conexión, vence el timeout, el status es
+>= 400 o la respuesta trae el error interno del agente / de execute_write.
+
+Uso:
+    python -m benchmarks.offline.server --port 8001 --llm-latency-ms 300   # en otra terminal
+    python -m benchmarks.http_load --url http://127.0.0.1:8001 --concurrency 1,4,16,64 --duration 15
+    python -m benchmarks.http_load --rates 5,10,20,40 --confirm-ratio 0.1 --output carga.json
+"""
+import argparse
+import http.client
+import itertools
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+# Texto con el que el agente responde a una excepción interna
+AGENT_ERROR = "ocurrió un error interno"
+
+
+def cargar_corpus(path: Optional[str], confirm_ratio: Optional[float], seed: int) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Lista de (endpoint, cuerpo). Por defecto, el corpus del benchmark
+    offline; con `path`, un JSONL con {"question"} o {"sql_query"}
+    (o {"endpoint", "body"}) por línea.
+
+    `confirm_ratio` reparte las escrituras del corpus como peticiones a
+    /confirm hasta llegar a esa fracción del total (0 = ninguna; None =
+    el corpus tal cual).
+    """
+    peticiones: List[Tuple[str, Dict[str, Any]]] = []
+    escrituras: List[str] = []
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for linea in f:
+                if not linea.strip():
+                    continue
+                item = json.loads(linea)
+                if "endpoint" in item:
+                    peticiones.append((item["endpoint"], item["body"]))
+                elif "sql_query" in item:
+                    peticiones.append(("/confirm", {"sql_query": item["sql_query"]}))
+                else:
+                    peticiones.append(("/ask", {"question": item["question"]}))
+    else:
+        from benchmarks.offline.workload import WORKLOAD
+        for entry in WORKLOAD:
+            peticiones.append(("/ask", {"question": entry["question"]}))
+            if entry["kind"] == "write":
+                escrituras.append(entry["sql"])
+
+    if confirm_ratio is not None:
+        escrituras += [body["sql_query"] for endpoint, body in peticiones if endpoint == "/confirm"]
+        peticiones = [p for p in peticiones if p[0] != "/confirm"]
+        if escrituras and 0 < confirm_ratio < 1:
+            # n / (preguntas + n) = confirm_ratio
+            n = max(1, round(confirm_ratio * len(peticiones) / (1 - confirm_ratio)))
+            peticiones += [("/confirm", {"sql_query": escrituras[i % len(escrituras)]}) for i in range(n)]
+
+    random.Random(seed).shuffle(peticiones)
+    return peticiones
+
+
+class Cliente:
+    """Una conexión HTTP keep-alive (una por hilo)"""
+
+    def __init__(self, url: str, timeout: float):
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.timeout = timeout
+        self.conn: Optional[http.client.HTTPConnection] = None
+
+    def enviar(self, endpoint: str, body: Dict[str, Any]) -> Optional[str]:
+        """Hace el POST; devuelve None si salió bien o el motivo del error"""
+        if endpoint == "/ask":
+            body = {**body, "session_id": f"load-{uuid.uuid4().hex[:12]}"}
+        data = json.dumps(body)
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.conn.request("POST", endpoint, body=data, headers={"Content-Type": "application/json"})
+            resp = self.conn.getresponse()
+            contenido = resp.read()
+        except Exception as e:
+            self.cerrar()
+            return type(e).__name__
+        if resp.status >= 400:
+            return f"http_{resp.status}"
+        return _error_de_aplicacion(endpoint, contenido)
+
+    def cerrar(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def _error_de_aplicacion(endpoint: str, contenido: bytes) -> Optional[str]:
+    try:
+        answer = json.loads(contenido).get("answer", "")
+    except ValueError:
+        return "respuesta_invalida"
+    if endpoint == "/ask" and AGENT_ERROR in answer:
+        return "error_agente"
+    if endpoint == "/confirm":
+        try:
+            if "error" in json.loads(answer):
+                return "error_escritura"
+        except ValueError:
+            return "respuesta_invalida"
+    return None
+
+
+# Muestra: (endpoint, latencia en s, error o None)
+Muestra = Tuple[str, float, Optional[str]]
+
+
+def correr_cerrado(url: str, corpus, clientes: int, duracion: float, timeout: float) -> Tuple[List[Muestra], float]:
+    """`clientes` hilos que envían una petición tras otra durante `duracion` s"""
+    muestras: List[Muestra] = []
+    lock = threading.Lock()
+    siguiente = itertools.count()
+    fin = time.perf_counter() + duracion
+
+    def cliente():
+        http_cliente = Cliente(url, timeout)
+        try:
+            while time.perf_counter() < fin:
+                endpoint, body = corpus[next(siguiente) % len(corpus)]
+                t = time.perf_counter()
+                error = http_cliente.enviar(endpoint, body)
+                with lock:
+                    muestras.append((endpoint, time.perf_counter() - t, error))
+        finally:
+            http_cliente.cerrar()
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=cliente, daemon=True) for _ in range(clientes)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return muestras, time.perf_counter() - inicio
+
+
+def correr_abierto(
+    url: str, corpus, tasa: float, duracion: float, timeout: float, max_en_vuelo: int
+) -> Tuple[List[Muestra], float]:
+    """Programa `tasa` peticiones por segundo durante `duracion` s, sin esperar respuestas"""
+    muestras: List[Muestra] = []
+    lock = threading.Lock()
+    local = threading.local()
+    clientes: List[Cliente] = []
+
+    def enviar(endpoint: str, body: Dict[str, Any], programada: float):
+        if not hasattr(local, "cliente"):
+            local.cliente = Cliente(url, timeout)
+            with lock:
+                clientes.append(local.cliente)
+        error = local.cliente.enviar(endpoint, body)
+        with lock:
+            muestras.append((endpoint, time.perf_counter() - programada, error))
+
+    total = max(1, int(tasa * duracion))
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_en_vuelo) as pool:
+        for i in range(total):
+            programada = inicio + i / tasa
+            espera = programada - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            endpoint, body = corpus[i % len(corpus)]
+            pool.submit(enviar, endpoint, body, programada)
+    for cliente in clientes:
+        cliente.cerrar()
+    return muestras, time.perf_counter() - inicio
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil por rango más cercano"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+def _latencias(muestras: List[Muestra]) -> Dict[str, float]:
+    ok = [m[1] for m in muestras if m[2] is None]
+    return {
+        "p50_ms": round(percentil(ok, 50) * 1000, 1),
+        "p95_ms": round(percentil(ok, 95) * 1000, 1),
+        "p99_ms": round(percentil(ok, 99) * 1000, 1),
+        "mean_ms": round(statistics.fmean(ok) * 1000, 1) if ok else 0.0,
+    }
+
+
+def resumir(modo: str, nivel: float, muestras: List[Muestra], duracion: float) -> Dict[str, Any]:
+    errores: Dict[str, int] = {}
+    for _, _, error in muestras:
+        if error:
+            errores[error] = errores.get(error, 0) + 1
+    ok = len(muestras) - sum(errores.values())
+    resultado = {
+        "mode": modo,
+        "level": nivel,
+        "requests": len(muestras),
+        "ok": ok,
+        "errors": errores,
+        "error_rate": round(1 - ok / len(muestras), 4) if muestras else 0.0,
+        "seconds": round(duracion, 2),
+        "throughput_rps": round(ok / duracion, 2) if duracion else 0.0,
+        **_latencias(muestras),
+        "by_endpoint": {},
+    }
+    for endpoint in sorted({m[0] for m in muestras}):
+        propias = [m for m in muestras if m[0] == endpoint]
+        resultado["by_endpoint"][endpoint] = {"requests": len(propias), **_latencias(propias)}
+    return resultado
+
+
+def punto_de_saturacion(
+    niveles: List[Dict[str, Any]], slo_ms: Optional[float], max_error_rate: float, min_gain: float
+) -> Dict[str, Any]:
+    """
+    Primer nivel saturado: demasiados errores, p95 sobre el SLO, o el
+    throughput deja de crecer (lazo cerrado: menos de `min_gain` respecto
+    al nivel anterior; lazo abierto: por debajo del 90 % de lo ofrecido).
+    """
+    anterior = None
+    for nivel in niveles:
+        motivo = None
+        if nivel["error_rate"] > max_error_rate:
+            motivo = f"error_rate {nivel['error_rate']:.1%} > {max_error_rate:.1%}"
+        elif slo_ms and nivel["p95_ms"] > slo_ms:
+            motivo = f"p95 {nivel['p95_ms']} ms > SLO {slo_ms} ms"
+        elif nivel["mode"] == "open" and nivel["throughput_rps"] < 0.9 * nivel["level"]:
+            motivo = f"throughput {nivel['throughput_rps']} req/s < 90% de {nivel['level']} req/s ofrecidas"
+        elif (
+            nivel["mode"] == "closed" and anterior is not None
+            and nivel["throughput_rps"] < anterior["throughput_rps"] * (1 + min_gain)
+        ):
+            motivo = f"throughput {nivel['throughput_rps']} req/s no crece {min_gain:.0%} sobre {anterior['throughput_rps']}"
+        if motivo:
+            return {
+                "saturated": True,
+                "level": nivel["level"],
+                "reason": motivo,
+                "max_sustainable_level": anterior["level"] if anterior else None,
+                "max_throughput_rps": max(n["throughput_rps"] for n in niveles),
+            }
+        anterior = nivel
+    return {
+        "saturated": False,
+        "level": None,
+        "reason": None,
+        "max_sustainable_level": anterior["level"] if anterior else None,
+        "max_throughput_rps": max((n["throughput_rps"] for n in niveles), default=0.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8001")
+    modo = parser.add_mutually_exclusive_group()
+    modo.add_argument("--concurrency", default=None, help="Niveles de clientes (lazo cerrado), ej. 1,4,16")
+    modo.add_argument("--rates", default=None, help="Niveles de peticiones/s (lazo abierto), ej. 5,10,20")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos por nivel")
+    parser.add_argument("--warmup", type=int, default=0, help="Peticiones previas que no se miden")
+    parser.add_argument("--corpus", help="JSONL con {question} / {sql_query} por línea")
+    parser.add_argument("--confirm-ratio", type=float, help="Fracción de peticiones a /confirm (por defecto, el corpus tal cual)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Hilos máximos en lazo abierto")
+    parser.add_argument("--slo-ms", type=float, help="p95 máximo aceptable")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--min-gain", type=float, default=0.1, help="Crecimiento mínimo de throughput por nivel")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Guarda el reporte JSON en este archivo (además de stdout)")
+    args = parser.parse_args()
+
+    corpus = cargar_corpus(args.corpus, args.confirm_ratio, args.seed)
+    if args.rates:
+        modo_carga, niveles = "open", [float(x) for x in args.rates.split(",") if x.strip()]
+    else:
+        modo_carga, niveles = "closed", [int(x) for x in (args.concurrency or "1,4,16").split(",") if x.strip()]
+
+    if args.warmup:
+        cliente = Cliente(args.url, args.timeout)
+        for i in range(args.warmup):
+            cliente.enviar(*corpus[i % len(corpus)])
+        cliente.cerrar()
+
+    resultados = []
+    for nivel in niveles:
+        if modo_carga == "open":
+            muestras, duracion = correr_abierto(
+                args.url, corpus, nivel, args.duration, args.timeout, args.max_in_flight
+            )
+        else:
+            muestras, duracion = correr_cerrado(args.url, corpus, nivel, args.duration, args.timeout)
+        r = resumir(modo_carga, nivel, muestras, duracion)
+        resultados.append(r)
+        unidad = "req/s ofrecidas" if modo_carga == "open" else "clientes"
+        print(
+            f"{nivel:>6} {unidad} | {r['throughput_rps']:>8} req/s | p50 {r['p50_ms']} ms | "
+            f"p95 {r['p95_ms']} ms | p99 {r['p99_ms']} ms | errores {r['error_rate']:.1%}",
+            file=sys.stderr
+        )
+
+    reporte = {
+        "url": args.url,
+        "mode": modo_carga,
+        "duration_per_level": args.duration,
+        "corpus": {
+            "requests": len(corpus),
+            "confirm": sum(1 for endpoint, _ in corpus if endpoint == "/confirm"),
+        },
+        "levels": resultados,
+        "saturation": punto_de_saturacion(resultados, args.slo_ms, args.max_error_rate, args.min_gain),
+    }
+    salida = json.dumps(reporte, indent=2, ensure_ascii=False)
+    print(salida)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(salida)
+
+
+if __name__ == "__main__":
+    main()
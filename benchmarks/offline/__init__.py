@@ -0,0 +1,16 @@
+"""
+Benchmark offline de MCPAgent: sin Gemini y sin MySQL
+
+- fixture.py: droguería sintética en SQLite (productos, lotes, ventas y
+  las vistas v_stock_productos / v_semaforo_vencimientos) a varias escalas
+- fake_model.py: GeminiModel falso con respuestas guionadas y latencia
+- workload.py: corpus de preguntas que recorre todos los caminos del agente
+- __main__.py: tiempos por etapa, throughput por concurrencia, memoria y
+  comparación contra una línea base en JSON
+- replay_check.py: graba con un modelo y reproduce con el falso (server.py --replay)
+
+Uso:
+    python -m benchmarks.offline --scale small --save benchmarks/baseline.json
+    python -m benchmarks.offline --scale small --compare benchmarks/baseline.json
+    python -m benchmarks.offline.replay_check
+"""
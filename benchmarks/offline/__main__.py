@@ -0,0 +1,325 @@
+"""
+Benchmark offline de MCPAgent (ver benchmarks/offline/__init__.py)
+
+Fases:
+    1. Construye la base sintética con DatabaseTool (SQLite)
+    2. Secuencial: MCPAgent.ask sobre el corpus, `--repeat` veces
+       (latencias por pregunta y por etapa, tomadas de agent.metrics)
+    3. Concurrencia: MCPAgent.ask_async con N clientes por nivel
+    4. Memoria: pico de tracemalloc en una pasada y RSS máximo del proceso
+
+El resultado es un JSON (`--output`/`--save`) que se puede comparar contra
+una corrida anterior con `--compare`.
+
+Uso:
+    python -m benchmarks.offline --scale small --llm-latency-ms 300 --levels 1,4,16
+    python -m benchmarks.offline --save benchmarks/baseline.json
+    python -m benchmarks.offline --compare benchmarks/baseline.json --fail-on-regression
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from typing import Any, Dict, List
+
+from agent import MCPAgent
+from metrics import Metrics
+from benchmarks.offline.fake_model import FakeGeminiModel
+from benchmarks.offline.fixture import SCALES, build_pharmacy_db
+from benchmarks.offline.workload import WORKLOAD
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Métricas donde más es mejor (en las demás, menos es mejor)
+HIGHER_IS_BETTER = ("throughput_qps",)
+# Diferencias absolutas menores a esto no cuentan como regresión (ruido)
+MIN_DELTA = {"_ms": 1.0, "_mb": 1.0, "throughput_qps": 0.1}
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil por rango más cercano"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+def resumen_latencias(latencias: List[float]) -> Dict[str, float]:
+    return {
+        "questions": len(latencias),
+        "mean_ms": round(statistics.fmean(latencias) * 1000, 2) if latencias else 0.0,
+        "p50_ms": round(percentil(latencias, 50) * 1000, 2),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 2),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 2),
+    }
+
+
+def crear_agente(db_path: str, args) -> MCPAgent:
+    agente = MCPAgent(
+        api_key="offline",
+        model_name="fake",
+        db_type="sqlite",
+        db_path=db_path,
+        sql_cache_config={"max_entries": 0 if args.no_sql_cache else 500},
+        concurrency_config={"llm_concurrency": args.llm_concurrency, "db_concurrency": args.db_concurrency},
+        intent_router_config={"enabled": not args.no_router},
+        candidates_config={
+            "fan_out": args.fan_out, "hedge_ms": args.hedge_ms, "hedge_percentile": args.hedge_percentile
+        },
+    )
+    agente.model = FakeGeminiModel(
+        WORKLOAD, latency_ms=args.llm_latency_ms, jitter=args.jitter, compactor=agente.compactor
+    )
+    return agente
+
+
+def fase_secuencial(agente: MCPAgent, repeat: int) -> Dict[str, Any]:
+    """MCPAgent.ask pregunta por pregunta; cada una en una sesión nueva"""
+    agente.metrics = Metrics()
+    latencias: List[float] = []
+    por_tipo: Dict[str, List[float]] = {}
+    inicio = time.perf_counter()
+    for r in range(repeat):
+        for i, entry in enumerate(WORKLOAD):
+            session_id = f"bench-seq-{r}-{i}"
+            t = time.perf_counter()
+            agente.ask(entry["question"], session_id)
+            elapsed = time.perf_counter() - t
+            agente.sessions.clear(session_id)
+            latencias.append(elapsed)
+            por_tipo.setdefault(entry["kind"], []).append(elapsed)
+    duracion = time.perf_counter() - inicio
+
+    resultado = resumen_latencias(latencias)
+    resultado["seconds"] = round(duracion, 3)
+    resultado["by_kind_p50_ms"] = {k: round(percentil(v, 50) * 1000, 2) for k, v in sorted(por_tipo.items())}
+    resultado["stages"] = {
+        stage: {"count": s["count"], "mean_ms": round(s["mean"] * 1000, 3), "total_ms": round(s["sum"] * 1000, 1)}
+        for stage, s in sorted(agente.metrics.stage_seconds.summary().items())
+    }
+    resultado["prompt_chars_mean"] = {
+        kind: round(s["mean"]) for kind, s in sorted(agente.metrics.prompt_chars.summary().items())
+    }
+    return resultado
+
+
+async def correr_nivel(agente: MCPAgent, clientes: int, por_cliente: int) -> Dict[str, Any]:
+    """`clientes` tareas concurrentes, cada una recorre el corpus `por_cliente` veces"""
+    latencias: List[float] = []
+
+    async def cliente(c: int):
+        n = len(WORKLOAD)
+        for r in range(por_cliente):
+            for i in range(n):
+                # Cada cliente empieza en un punto distinto del corpus
+                entry = WORKLOAD[(i + c) % n]
+                session_id = f"bench-c{clientes}-{c}-{r}-{i}"
+                t = time.perf_counter()
+                await agente.ask_async(entry["question"], session_id)
+                latencias.append(time.perf_counter() - t)
+                agente.sessions.clear(session_id)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente(c) for c in range(clientes)))
+    duracion = time.perf_counter() - inicio
+
+    resultado = resumen_latencias(latencias)
+    resultado["seconds"] = round(duracion, 3)
+    resultado["throughput_qps"] = round(len(latencias) / duracion, 2) if duracion else 0.0
+    return resultado
+
+
+def fase_memoria(agente: MCPAgent) -> Dict[str, float]:
+    """Pico de memoria de Python durante una pasada del corpus"""
+    tracemalloc.start()
+    try:
+        for i, entry in enumerate(WORKLOAD):
+            agente.ask(entry["question"], f"bench-mem-{i}")
+            agente.sessions.clear(f"bench-mem-{i}")
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    memoria = {"tracemalloc_peak_mb": round(pico / 1024 / 1024, 2)}
+    if resource is not None:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reporta KB; macOS, bytes
+        memoria["max_rss_mb"] = round(maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    return memoria
+
+
+def aplanar(resultado: Dict[str, Any]) -> Dict[str, float]:
+    """Métricas comparables entre corridas: {"sequential.p95_ms": ..., ...}"""
+    plano: Dict[str, float] = {}
+    seq = resultado.get("sequential", {})
+    for key in ("mean_ms", "p50_ms", "p95_ms", "p99_ms"):
+        if key in seq:
+            plano[f"sequential.{key}"] = seq[key]
+    for stage, s in seq.get("stages", {}).items():
+        plano[f"stages.{stage}.mean_ms"] = s["mean_ms"]
+    for nivel, r in resultado.get("concurrency", {}).items():
+        plano[f"concurrency.{nivel}.throughput_qps"] = r["throughput_qps"]
+        plano[f"concurrency.{nivel}.p95_ms"] = r["p95_ms"]
+    for key, value in resultado.get("memory", {}).items():
+        plano[f"memory.{key}"] = value
+    return plano
+
+
+def comparar(actual: Dict[str, Any], base: Dict[str, Any], tolerancia: float) -> List[str]:
+    """Imprime la comparación y devuelve las métricas que empeoraron más de `tolerancia`"""
+    if actual.get("config") != base.get("config"):
+        print("⚠️  La configuración difiere de la línea base; la comparación es orientativa")
+
+    nuevo, viejo = aplanar(actual), aplanar(base)
+    regresiones = []
+    print(f"\n{'métrica':<40} {'base':>12} {'actual':>12} {'cambio':>9}")
+    for key in sorted(set(nuevo) & set(viejo)):
+        antes, ahora = viejo[key], nuevo[key]
+        cambio = (ahora - antes) / antes if antes else 0.0
+        mas_es_mejor = key.endswith(HIGHER_IS_BETTER)
+        peor = -cambio if mas_es_mejor else cambio
+        minimo = next((v for sufijo, v in MIN_DELTA.items() if key.endswith(sufijo)), 0.0)
+        marca = ""
+        if peor > tolerancia and abs(ahora - antes) >= minimo:
+            marca = "  ❌ peor"
+            regresiones.append(key)
+        elif -peor > tolerancia and abs(ahora - antes) >= minimo:
+            marca = "  ✅ mejor"
+        print(f"{key:<40} {antes:>12} {ahora:>12} {cambio:>+8.1%}{marca}")
+    return regresiones
+
+
+def imprimir(resultado: Dict[str, Any]):
+    seq = resultado["sequential"]
+    print(f"\n📦 Fixture: {resultado['fixture']}")
+    print(
+        f"\n⏱️  Secuencial: {seq['questions']} preguntas en {seq['seconds']} s | "
+        f"p50 {seq['p50_ms']} ms | p95 {seq['p95_ms']} ms | p99 {seq['p99_ms']} ms"
+    )
+    for kind, p50 in seq["by_kind_p50_ms"].items():
+        print(f"   {kind:<12} p50 {p50:>10} ms")
+    print("\n🧩 Etapas (media por llamada):")
+    for stage, s in seq["stages"].items():
+        print(f"   {stage:<20} {s['mean_ms']:>10} ms  x{s['count']:<5} total {s['total_ms']} ms")
+    print(f"   prompts (caracteres medios): {seq['prompt_chars_mean']}")
+    print("\n🚀 Concurrencia:")
+    for nivel, r in resultado["concurrency"].items():
+        print(f"   {nivel:>3} clientes | {r['throughput_qps']:>8} preg/s | p50 {r['p50_ms']} ms | p95 {r['p95_ms']} ms")
+    print(f"\n💾 Memoria: {resultado['memory']}")
+    print(f"🤖 Llamadas al modelo falso: {resultado['model_calls']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", default="small", choices=sorted(SCALES))
+    parser.add_argument("--products", type=int, help="Reemplaza la cantidad de productos de la escala")
+    parser.add_argument("--lots-per-product", type=int)
+    parser.add_argument("--sales", type=int)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--db", help="Archivo SQLite a usar (por defecto, uno temporal)")
+    parser.add_argument("--reuse-db", action="store_true", help="No reconstruir --db si ya existe")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=3, help="Pasadas del corpus en la fase secuencial")
+    parser.add_argument("--levels", default="1,4,16", help="Clientes concurrentes por nivel")
+    parser.add_argument("--per-client", type=int, default=1, help="Pasadas del corpus por cliente")
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--db-concurrency", type=int, default=4)
+    parser.add_argument("--no-router", action="store_true", help="Desactiva la ruta rápida por intención")
+    parser.add_argument("--no-sql-cache", action="store_true", help="Desactiva la caché pregunta → SQL")
+    parser.add_argument("--fan-out", type=int, default=1, help="Candidatos de SQL en paralelo (1 = en serie)")
+    parser.add_argument("--hedge-ms", type=float, default=8000.0, help="Espera antes de pedir otro candidato (sin mediciones)")
+    parser.add_argument("--hedge-percentile", type=float, default=90.0, help="Percentil de latencia medido para el respaldo")
+    parser.add_argument("--output", help="Guarda el resultado en JSON")
+    parser.add_argument("--save", help="Guarda el resultado como línea base")
+    parser.add_argument("--compare", help="Línea base JSON contra la cual comparar")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Empeoramiento relativo tolerado")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="Muestra los logs del agente")
+    args = parser.parse_args()
+
+    escala = dict(SCALES[args.scale])
+    for key, value in (("products", args.products), ("lots_per_product", args.lots_per_product), ("sales", args.sales)):
+        if value is not None:
+            escala[key] = value
+    levels = [int(x) for x in args.levels.split(",") if x.strip()]
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="mcp-bench-"), "farmacia.db")
+    if args.reuse_db and os.path.exists(db_path):
+        fixture = {"reused": db_path, "size_mb": round(os.path.getsize(db_path) / 1024 / 1024, 2)}
+    else:
+        print(f"🏗️  Construyendo base sintética ({args.scale}: {escala}) en {db_path}...")
+        fixture = build_pharmacy_db(db_path, escala, seed=args.seed)
+
+    resultado: Dict[str, Any] = {
+        "config": {
+            "scale": escala,
+            "llm_latency_ms": args.llm_latency_ms,
+            "jitter": args.jitter,
+            "repeat": args.repeat,
+            "levels": levels,
+            "per_client": args.per_client,
+            "llm_concurrency": args.llm_concurrency,
+            "db_concurrency": args.db_concurrency,
+            "router": not args.no_router,
+            "sql_cache": not args.no_sql_cache,
+        },
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "fixture": fixture,
+    }
+
+    logs = sys.stdout if args.verbose else open(os.devnull, "w")
+    try:
+        with redirect_stdout(logs):
+            agente = crear_agente(db_path, args)
+            resultado["sequential"] = fase_secuencial(agente, args.repeat)
+            resultado["concurrency"] = {}
+            for clientes in levels:
+                resultado["concurrency"][str(clientes)] = asyncio.run(
+                    correr_nivel(agente, clientes, args.per_client)
+                )
+            resultado["memory"] = fase_memoria(agente)
+            resultado["model_calls"] = agente.model.stats()
+            stats = agente.get_stats()
+            resultado["agent_stats"] = {
+                "sql_cache_hit_rate": stats["sql_cache"]["hit_rate"],
+                "intent_route_rate": stats["intent_router"]["route_rate"],
+                "formatter_local_rate": (stats["formatter"] or {}).get("local_rate"),
+            }
+            agente.close()
+    finally:
+        if logs is not sys.stdout:
+            logs.close()
+
+    imprimir(resultado)
+
+    for path in filter(None, (args.output, args.save)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultado guardado en {path}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            base = json.load(f)
+        regresiones = comparar(resultado, base, args.tolerance)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} métrica(s) empeoraron más de {args.tolerance:.0%}: {', '.join(regresiones)}")
+            if args.fail_on_regression:
+                sys.exit(1)
+        else:
+            print(f"\n✅ Sin regresiones mayores a {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+GeminiModel falso: respuestas guionadas con latencia configurable
+
+Reconoce los tres prompts del agente (generar SQL, corregir SQL y redactar
+la respuesta), busca la pregunta en el guion y responde después de
+"esperar" la latencia indicada, como lo haría la API de Gemini.
+"""
+import asyncio
+import random
+import re
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+from models.gemini import GeminiModel
+
+_SQL_QUESTION = re.compile(r"Pregunta del usuario: (.+)")
+_ASKED = re.compile(r"El usuario preguntó: (.+)")
+
+
+class FakeGeminiModel(GeminiModel):
+    """
+    Mismo contrato que GeminiModel (ask, ask_async, ask_stream_async) sin
+    llamar a la API. Reutiliza `_build_with_context`, así el costo de
+    armar el prompt con el historial sigue dentro de lo medido.
+
+    Args:
+        script: Entradas de WORKLOAD ({"question", "sql", "correction"?})
+        latency_ms: Latencia media de cada llamada
+        jitter: Variación relativa de la latencia (0.2 = ±20 %)
+        stream_chunks: Trozos en que se entrega la respuesta en streaming
+    """
+
+    def __init__(
+        self,
+        script: Iterable[Dict[str, str]],
+        latency_ms: float = 800.0,
+        jitter: float = 0.2,
+        stream_chunks: int = 8,
+        seed: int = 7,
+        compactor=None
+    ):
+        # No se llama a GeminiModel.__init__: no hay cliente que configurar
+        self.script = {entry["question"]: entry for entry in script}
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.stream_chunks = max(1, stream_chunks)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        # El mismo compactador del agente: el historial se recorta igual que con Gemini
+        self.compactor = compactor
+
+        self.calls: Dict[str, int] = {"sql": 0, "correction": 0, "response": 0, "unknown": 0}
+        self.prompt_chars = 0
+
+    def _latency(self) -> float:
+        with self._lock:
+            factor = 1 + self._rng.uniform(-self.jitter, self.jitter)
+        return max(0.0, self.latency_ms * factor / 1000)
+
+    def _answer(self, prompt: str, context: Optional[List[Dict]]) -> str:
+        full_prompt = self._prepare_prompt(prompt, context)
+        with self._lock:
+            self.prompt_chars += len(full_prompt)
+
+        if "corrige la consulta" in prompt:
+            kind, match = "correction", _ASKED.findall(prompt)
+        elif "Se ejecutó:" in prompt:
+            kind, match = "response", _ASKED.findall(prompt)
+        else:
+            kind, match = "sql", _SQL_QUESTION.findall(prompt)
+        entry = self.script.get(match[-1].strip()) if match else None
+        with self._lock:
+            self.calls[kind if entry else "unknown"] += 1
+
+        if entry is None:
+            return "NO_QUERY"
+        if kind == "sql":
+            return entry["sql"]
+        if kind == "correction":
+            return entry.get("correction", "NO_QUERY")
+        return f"Respuesta simulada para: {entry['question']}"
+
+    def ask(self, prompt: str, context: List[Dict] = None) -> str:
+        answer = self._answer(prompt, context)
+        time.sleep(self._latency())
+        return answer
+
+    async def ask_async(self, prompt: str, context: List[Dict] = None) -> str:
+        answer = self._answer(prompt, context)
+        await asyncio.sleep(self._latency())
+        return answer
+
+    async def ask_stream_async(self, prompt: str, context: List[Dict] = None) -> AsyncIterator[str]:
+        answer = self._answer(prompt, context)
+        step = max(1, -(-len(answer) // self.stream_chunks))
+        pause = self._latency() / self.stream_chunks
+        for start in range(0, len(answer), step):
+            await asyncio.sleep(pause)
+            yield answer[start:start + step]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.calls, "prompt_chars": self.prompt_chars}
@@ -0,0 +1,216 @@
+"""
+Base de datos sintética de droguería (SQLite), construida con DatabaseTool
+
+Tablas `productos`, `lotes` y `ventas`, más las vistas `v_stock_productos`
+y `v_semaforo_vencimientos` con las mismas columnas que usan las reglas
+expertas del agente. Los datos son deterministas para una misma semilla.
+"""
+import os
+import random
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, Union
+
+from tools.database import DatabaseTool
+
+# productos, lotes por producto, ventas
+SCALES: Dict[str, Dict[str, int]] = {
+    "tiny": {"products": 50, "lots_per_product": 2, "sales": 1_000},
+    "small": {"products": 500, "lots_per_product": 3, "sales": 20_000},
+    "medium": {"products": 5_000, "lots_per_product": 4, "sales": 250_000},
+    "large": {"products": 20_000, "lots_per_product": 5, "sales": 1_000_000},
+}
+
+# Marcas fijas: las preguntas del corpus (workload.py) las mencionan
+BRANDS = [
+    "Dolex", "Advil", "Noxpirin", "Buscapina", "Acetaminofen", "Loratadina",
+    "Ibuprofeno", "Amoxicilina", "Omeprazol", "Losartan", "Metformina", "Aspirina",
+]
+_SYLLABLES = ["ra", "to", "mex", "lin", "cor", "vi", "zol", "pan", "dex", "fen", "tri", "nor", "ba", "quil"]
+PRESENTATIONS = [
+    "500mg", "Forte", "Niños", "Jarabe 120ml", "Tabletas x 10", "Cápsulas x 20", "Gotas", "Crema 30g", "Max",
+]
+ACTIVE_INGREDIENTS = [
+    "acetaminofen", "ibuprofeno", "naproxeno", "loratadina", "amoxicilina", "omeprazol",
+    "losartan", "metformina", "acido acetilsalicilico", "butilbromuro de hioscina",
+]
+LABS = ["Genfar", "MK", "La Santé", "Bayer", "Pfizer", "GSK", "Sanofi", "Procaps", "Abbott", "Tecnoquímicas"]
+
+DDL = """
+CREATE TABLE productos (
+    id_producto INTEGER PRIMARY KEY,
+    nombre_comercial TEXT NOT NULL,
+    principio_activo TEXT,
+    laboratorio TEXT,
+    precio_venta REAL NOT NULL,
+    stock_minimo INTEGER NOT NULL
+);
+CREATE TABLE lotes (
+    id_lote INTEGER PRIMARY KEY,
+    id_producto INTEGER NOT NULL REFERENCES productos(id_producto),
+    numero_lote TEXT NOT NULL,
+    fecha_vencimiento TEXT NOT NULL,
+    cantidad_actual INTEGER NOT NULL
+);
+CREATE TABLE ventas (
+    id_venta INTEGER PRIMARY KEY,
+    id_producto INTEGER NOT NULL REFERENCES productos(id_producto),
+    id_lote INTEGER NOT NULL REFERENCES lotes(id_lote),
+    fecha TEXT NOT NULL,
+    cantidad INTEGER NOT NULL,
+    precio_unitario REAL NOT NULL
+);
+"""
+
+# Índices y vistas se crean después de cargar los datos (carga más rápida)
+VIEWS = """
+CREATE INDEX idx_lotes_producto ON lotes(id_producto);
+CREATE INDEX idx_lotes_vencimiento ON lotes(fecha_vencimiento);
+CREATE INDEX idx_ventas_fecha ON ventas(fecha);
+CREATE INDEX idx_ventas_producto ON ventas(id_producto);
+
+CREATE VIEW v_stock_productos AS
+SELECT
+    p.id_producto,
+    p.nombre_comercial,
+    p.principio_activo,
+    p.laboratorio,
+    p.precio_venta,
+    COALESCE(SUM(l.cantidad_actual), 0) AS stock_total,
+    p.stock_minimo,
+    CASE
+        WHEN COALESCE(SUM(l.cantidad_actual), 0) = 0 THEN 'SIN_STOCK'
+        WHEN COALESCE(SUM(l.cantidad_actual), 0) < p.stock_minimo THEN 'BAJO'
+        ELSE 'OK'
+    END AS nivel_stock
+FROM productos p
+LEFT JOIN lotes l ON l.id_producto = p.id_producto
+GROUP BY p.id_producto;
+
+CREATE VIEW v_semaforo_vencimientos AS
+SELECT
+    l.id_lote,
+    p.id_producto,
+    p.nombre_comercial,
+    l.numero_lote,
+    l.fecha_vencimiento,
+    l.cantidad_actual,
+    CAST(julianday(l.fecha_vencimiento) - julianday(date('now')) AS INTEGER) AS dias_restantes,
+    CASE
+        WHEN julianday(l.fecha_vencimiento) - julianday(date('now')) <= 30 THEN 'ROJO'
+        WHEN julianday(l.fecha_vencimiento) - julianday(date('now')) <= 90 THEN 'AMARILLO'
+        ELSE 'VERDE'
+    END AS color_alerta,
+    CASE
+        WHEN julianday(l.fecha_vencimiento) < julianday(date('now')) THEN 'Retirar y destruir'
+        WHEN julianday(l.fecha_vencimiento) - julianday(date('now')) <= 30 THEN 'Retirar de la venta'
+        WHEN julianday(l.fecha_vencimiento) - julianday(date('now')) <= 90 THEN 'Promocionar'
+        ELSE 'Sin acción'
+    END AS accion_sugerida
+FROM lotes l
+JOIN productos p ON p.id_producto = l.id_producto
+WHERE l.cantidad_actual > 0;
+"""
+
+# Filas por llamada a execute_write (cada una es una transacción con executemany)
+CHUNK = 50_000
+
+
+def _brand_names(count: int, rng: random.Random):
+    """Las marcas fijas y luego marcas inventadas únicas"""
+    names = list(BRANDS)
+    seen = {b.lower() for b in names}
+    while len(names) < count:
+        name = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+        if name.lower() not in seen:
+            seen.add(name.lower())
+            names.append(name)
+    return names[:count]
+
+
+def _insert(db: DatabaseTool, sql: str, rows):
+    for start in range(0, len(rows), CHUNK):
+        result = db.execute_write(sql, rows[start:start + CHUNK])
+        if "error" in result:
+            raise RuntimeError(f"No se pudo cargar el fixture: {result['error']}")
+
+
+def build_pharmacy_db(path: str, scale: Union[str, Dict[str, int]] = "small", seed: int = 7) -> Dict[str, Any]:
+    """
+    Crea (o reemplaza) la base sintética en `path`
+
+    Args:
+        path: Archivo SQLite a crear
+        scale: Nombre de SCALES o {"products", "lots_per_product", "sales"}
+        seed: Semilla de los datos
+
+    Returns:
+        Filas por tabla, tamaño del archivo y segundos de construcción
+    """
+    params = SCALES[scale] if isinstance(scale, str) else scale
+    rng = random.Random(seed)
+    today = date.today()
+    start = time.perf_counter()
+
+    if os.path.exists(path):
+        os.remove(path)
+    db = DatabaseTool(path)
+    try:
+        with db._lock:
+            db.conn.executescript(DDL)
+
+        # ~4 presentaciones por marca: "Dolex Forte", "Dolex Niños", ...
+        brands = _brand_names(max(1, params["products"] // 4), rng)
+        productos = []
+        for product_id in range(1, params["products"] + 1):
+            brand = brands[(product_id - 1) % len(brands)]
+            presentation = PRESENTATIONS[(product_id - 1) // len(brands) % len(PRESENTATIONS)]
+            productos.append((
+                product_id,
+                f"{brand} {presentation}",
+                rng.choice(ACTIVE_INGREDIENTS),
+                rng.choice(LABS),
+                round(rng.uniform(1_500, 95_000), -2),
+                rng.choice((5, 10, 20, 50)),
+            ))
+        _insert(db, "INSERT INTO productos VALUES (?, ?, ?, ?, ?, ?)", productos)
+
+        lotes = []
+        for product_id in range(1, params["products"] + 1):
+            for n in range(params["lots_per_product"]):
+                # Algunos vencidos, varios en rojo/amarillo y la mayoría en verde
+                expires = today + timedelta(days=rng.choice((
+                    rng.randint(-60, -1), rng.randint(0, 30), rng.randint(31, 90),
+                    rng.randint(91, 720), rng.randint(91, 720),
+                )))
+                quantity = 0 if rng.random() < 0.08 else rng.randint(1, 120)
+                lotes.append((len(lotes) + 1, product_id, f"L{product_id:05d}-{n + 1}", expires.isoformat(), quantity))
+        _insert(db, "INSERT INTO lotes VALUES (?, ?, ?, ?, ?)", lotes)
+
+        ventas = []
+        for sale_id in range(1, params["sales"] + 1):
+            lot_id, product_id = rng.choice(lotes)[:2]
+            ventas.append((
+                sale_id,
+                product_id,
+                lot_id,
+                (today - timedelta(days=rng.randint(0, 365))).isoformat(),
+                rng.randint(1, 6),
+                productos[product_id - 1][4],
+            ))
+        _insert(db, "INSERT INTO ventas VALUES (?, ?, ?, ?, ?, ?)", ventas)
+
+        with db._lock:
+            db.conn.executescript(VIEWS)
+            db.conn.execute("ANALYZE")
+            db.conn.commit()
+    finally:
+        db.close()
+
+    return {
+        "productos": len(productos),
+        "lotes": len(lotes),
+        "ventas": len(ventas),
+        "size_mb": round(os.path.getsize(path) / 1024 / 1024, 2),
+        "build_seconds": round(time.perf_counter() - start, 2),
+    }
@@ -0,0 +1,72 @@
+"""
+Verificación de record/replay con modelos distintos (ver models/recording.py)
+
+Graba unas llamadas con un modelo que se presenta como Gemini y las
+reproduce con el GeminiModel falso, como hace `server.py --replay`: todas
+deben salir de la grabación (sin llamar al modelo falso). Sale con código
+1 si alguna no coincide.
+
+Uso:
+    python -m benchmarks.offline.replay_check
+"""
+import asyncio
+import sys
+import tempfile
+from typing import Dict, List
+
+from config import GEMINI_MODEL
+from context_compactor import ContextCompactor
+from models.recording import RecordReplayModel
+from benchmarks.offline.fake_model import FakeGeminiModel
+from benchmarks.offline.workload import WORKLOAD
+
+CONTEXT = [
+    {"role": "user", "content": "¿Cuánto stock hay de acetaminofén?"},
+    {"role": "assistant", "content": "Hay 120 unidades de acetaminofén.", "sql": "SELECT 120"},
+]
+CALLS = [
+    ("Pregunta del usuario: ¿y de ibuprofeno?", CONTEXT),
+    ("Pregunta del usuario: ¿qué productos vencen este mes?", None),
+]
+
+
+class RecordingInner(FakeGeminiModel):
+    """Modelo "real" de la grabación: otro nombre y otras respuestas que el falso"""
+
+    model_name = GEMINI_MODEL
+
+    def _answer(self, prompt: str, context: List[Dict] = None) -> str:
+        return f"GRABADO {len(prompt)}"
+
+
+def main():
+    store_dir = tempfile.mkdtemp(prefix="llm-recordings-")
+    compactor = ContextCompactor()
+
+    recorder = RecordReplayModel(
+        RecordingInner([], latency_ms=0, compactor=compactor), store_dir=store_dir, mode="record"
+    )
+    expected = [recorder.ask(prompt, context) for prompt, context in CALLS]
+
+    # Como server.py --replay: el modelo falso, con el nombre del modelo que grabó
+    replayer = RecordReplayModel(
+        FakeGeminiModel(WORKLOAD, latency_ms=0, compactor=compactor),
+        store_dir=store_dir, mode="replay", latency="zero", strict=True, model_name=GEMINI_MODEL
+    )
+    answers = [replayer.ask(prompt, context) for prompt, context in CALLS]
+    answers_async = asyncio.run(_ask_all_async(replayer))
+
+    stats = replayer.stats()
+    print(f"Grabadas: {recorder.stats()['recorded']} | replay: {stats}")
+    ok = answers == expected and answers_async == expected and stats["live_calls"] == 0
+    print("✅ El replay con otro modelo responde desde la grabación" if ok else "❌ El replay no coincide con lo grabado")
+    if not ok:
+        sys.exit(1)
+
+
+async def _ask_all_async(model: RecordReplayModel) -> List[str]:
+    return [await model.ask_async(prompt, context) for prompt, context in CALLS]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Instancia local de la API (api.py) con el GeminiModel falso
+
+Levanta la misma app FastAPI de producción, pero el agente usa el modelo
+falso (fake_model.py) y la base sintética de SQLite (o el MySQL local de
+config.py con --db-type mysql). El resto de la configuración (sesiones,
+cachés, concurrencia, router) sale de config.py / variables de entorno,
+así que se pueden comparar ajustes de despliegue con benchmarks/http_load.py.
+
+Con --replay se responde desde llamadas reales grabadas (LLM_RECORD_MODE=record)
+y el modelo falso solo atiende los prompts que no están grabados. Las
+grabaciones se buscan con el nombre del modelo con que se hicieron
+(--replay-model, por defecto GEMINI_MODEL de config.py).
+
+Uso:
+    python -m benchmarks.offline.server --scale small --port 8001 --llm-latency-ms 300
+    python -m benchmarks.offline.server --db-type mysql --port 8001
+    python -m benchmarks.offline.server --db-type mysql --replay data/llm_recordings --replay-latency zero
+"""
+import argparse
+import os
+import sys
+import tempfile
+from contextlib import asynccontextmanager, redirect_stdout
+
+import uvicorn
+
+import api
+from agent import MCPAgent
+from config import (
+    MYSQL_CONFIG,
+    SESSION_CONFIG,
+    SQL_CACHE_CONFIG,
+    SCHEMA_SELECTOR_CONFIG,
+    LOCAL_FORMATTER,
+    CONCURRENCY_CONFIG,
+    INTENT_ROUTER_CONFIG,
+    PRODUCT_INDEX_CONFIG,
+    METRICS_CONFIG,
+    CONTEXT_CONFIG,
+    CANDIDATES_CONFIG,
+    GEMINI_MODEL
+)
+from models.recording import LATENCIES, RecordReplayModel
+from benchmarks.offline.fake_model import FakeGeminiModel
+from benchmarks.offline.fixture import SCALES, build_pharmacy_db
+from benchmarks.offline.workload import WORKLOAD
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--db-type", default="sqlite", choices=("sqlite", "mysql"))
+    parser.add_argument("--scale", default="small", choices=sorted(SCALES))
+    parser.add_argument("--db", help="Archivo SQLite (por defecto, uno temporal)")
+    parser.add_argument("--reuse-db", action="store_true", help="No reconstruir --db si ya existe")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--replay", help="Directorio con llamadas grabadas a Gemini")
+    parser.add_argument("--replay-latency", default="recorded", choices=LATENCIES)
+    parser.add_argument(
+        "--replay-model", default=GEMINI_MODEL, help="Modelo con el que se grabaron las llamadas (clave de la grabación)"
+    )
+    parser.add_argument("--verbose", action="store_true", help="Muestra los logs del agente por petición")
+    args = parser.parse_args()
+
+    db_path = None
+    if args.db_type == "sqlite":
+        db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="mcp-server-"), "farmacia.db")
+        if not (args.reuse_db and os.path.exists(db_path)):
+            print(f"🏗️  Construyendo base sintética ({args.scale}) en {db_path}...")
+            print(f"   {build_pharmacy_db(db_path, args.scale)}")
+
+    @asynccontextmanager
+    async def lifespan(app):
+        api.agente_global = MCPAgent(
+            api_key="offline",
+            model_name="fake",
+            db_type=args.db_type,
+            db_path=db_path,
+            mysql_config=MYSQL_CONFIG if args.db_type == "mysql" else None,
+            session_config=SESSION_CONFIG,
+            sql_cache_config=SQL_CACHE_CONFIG,
+            schema_selector_config=SCHEMA_SELECTOR_CONFIG,
+            local_formatter=LOCAL_FORMATTER,
+            concurrency_config=CONCURRENCY_CONFIG,
+            intent_router_config=INTENT_ROUTER_CONFIG,
+            product_index_config=PRODUCT_INDEX_CONFIG,
+            metrics_config=METRICS_CONFIG,
+            context_config=CONTEXT_CONFIG,
+            candidates_config=CANDIDATES_CONFIG
+        )
+        api.agente_global.model = FakeGeminiModel(
+            WORKLOAD, latency_ms=args.llm_latency_ms, jitter=args.jitter,
+            compactor=api.agente_global.compactor
+        )
+        if args.replay:
+            api.agente_global.model = RecordReplayModel(
+                api.agente_global.model, store_dir=args.replay, mode="replay",
+                latency=args.replay_latency, model_name=args.replay_model
+            )
+        print(
+            f"✅ Agente con modelo falso ({args.llm_latency_ms} ms) en http://{args.host}:{args.port}",
+            file=sys.__stdout__, flush=True
+        )
+        yield
+        api.agente_global.close()
+        api.agente_global = None
+
+    # Mismo app y endpoints; solo cambia cómo se crea el agente
+    api.app.router.lifespan_context = lifespan
+
+    logs = sys.stdout if args.verbose else open(os.devnull, "w")
+    with redirect_stdout(logs):
+        uvicorn.run(api.app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
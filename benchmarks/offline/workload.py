@@ -0,0 +1,89 @@
+"""
+Corpus de preguntas del benchmark, con el SQL que "respondería" Gemini
+
+Cubre los caminos del agente: ruta rápida por intención, SQL generado por
+el LLM (tablas, gráficos y texto), una corrección (el primer SQL falla) y
+una escritura que queda pendiente de confirmación.
+
+`kind` indica el camino esperado; `sql` es lo que devuelve el modelo falso
+al generar (y `correction`, si existe, al corregir).
+"""
+from typing import Dict, List
+
+WORKLOAD: List[Dict[str, str]] = [
+    {
+        "kind": "routed",
+        "question": "¿Cuánto stock hay de Dolex?",
+        "sql": "SELECT * FROM v_stock_productos WHERE nombre_comercial LIKE '%Dolex%'",
+    },
+    {
+        "kind": "routed",
+        "question": "¿Qué productos tienen stock bajo?",
+        "sql": "SELECT * FROM v_stock_productos WHERE nivel_stock = 'BAJO'",
+    },
+    {
+        "kind": "routed",
+        "question": "¿Qué lotes están en rojo?",
+        "sql": "SELECT * FROM v_semaforo_vencimientos WHERE color_alerta = 'ROJO'",
+    },
+    {
+        "kind": "routed",
+        "question": "Productos que vencen en los próximos 30 días",
+        "sql": "SELECT * FROM v_semaforo_vencimientos WHERE dias_restantes BETWEEN 0 AND 30",
+    },
+    {
+        "kind": "table",
+        "question": "Lista todos los productos con su laboratorio y precio",
+        "sql": "SELECT nombre_comercial, laboratorio, precio_venta FROM productos ORDER BY nombre_comercial",
+    },
+    {
+        "kind": "chart",
+        "question": "Dame un reporte de cuántos productos hay por laboratorio",
+        "sql": "SELECT laboratorio, COUNT(*) AS productos FROM productos GROUP BY laboratorio ORDER BY productos DESC",
+    },
+    {
+        "kind": "chart",
+        "question": "Top 10 productos más vendidos del último mes",
+        "sql": (
+            "SELECT p.nombre_comercial, SUM(v.cantidad) AS unidades FROM ventas v "
+            "JOIN productos p ON p.id_producto = v.id_producto "
+            "WHERE v.fecha >= date('now', '-30 day') "
+            "GROUP BY p.id_producto ORDER BY unidades DESC LIMIT 10"
+        ),
+    },
+    {
+        "kind": "chart",
+        "question": "Dame un reporte de ventas por día de la última semana",
+        "sql": (
+            "SELECT fecha, SUM(cantidad * precio_unitario) AS total FROM ventas "
+            "WHERE fecha >= date('now', '-7 day') GROUP BY fecha ORDER BY fecha"
+        ),
+    },
+    {
+        "kind": "text",
+        "question": "¿Cuánto vendimos en total este año?",
+        "sql": (
+            "SELECT SUM(cantidad * precio_unitario) AS total_vendido FROM ventas "
+            "WHERE fecha >= date('now', 'start of year')"
+        ),
+    },
+    {
+        "kind": "text",
+        "question": "¿Cuál es el precio del Advil Forte?",
+        "sql": "SELECT nombre_comercial, precio_venta FROM productos WHERE nombre_comercial LIKE '%Advil Forte%'",
+    },
+    {
+        "kind": "correction",
+        "question": "¿Cuánto vendió cada laboratorio?",
+        "sql": "SELECT laboratorio, SUM(cantidad * precio) AS total FROM ventas GROUP BY laboratorio",
+        "correction": (
+            "SELECT p.laboratorio, SUM(v.cantidad * v.precio_unitario) AS total FROM ventas v "
+            "JOIN productos p ON p.id_producto = v.id_producto GROUP BY p.laboratorio ORDER BY total DESC"
+        ),
+    },
+    {
+        "kind": "write",
+        "question": "Sube el precio del Dolex Forte a 5000",
+        "sql": "UPDATE productos SET precio_venta = 5000 WHERE nombre_comercial = 'Dolex Forte'",
+    },
+]
@@ -0,0 +1,87 @@
+"""
+Serialización de resultados: lista de dicts + CustomDecimalEncoder vs forma columnar
+
+Genera un resultado sintético con la forma típica del inventario (ids,
+nombres, Decimal de precios, fechas de vencimiento) y compara el tamaño
+del payload y el tiempo de codificación de:
+
+- antes: `json.dumps(lista_de_dicts, cls=CustomDecimalEncoder)`
+- ahora: `serializer.dumps(serializer.columnar(resultado))`
+  (con orjson si está instalado; se indica el backend usado)
+
+Uso:
+    python -m benchmarks.result_serialization --rows 10000 --repeat 5
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import serializer
+from tools.bounded import QueryResult
+
+
+class CustomDecimalEncoder(json.JSONEncoder):
+    """Encoder que se usaba antes en agent.py (copiado para comparar)"""
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        if isinstance(obj, (date, datetime)):
+            return obj.isoformat()
+        return super().default(obj)
+
+
+def generar(rows: int) -> QueryResult:
+    rnd = random.Random(42)
+    hoy = date(2025, 1, 1)
+    columns = ["id_producto", "nombre_comercial", "laboratorio", "stock_actual",
+               "precio_venta", "costo_unitario", "fecha_vencimiento"]
+    filas = [
+        (
+            i,
+            f"Producto {i} {rnd.choice(['500mg', '250mg', 'Jarabe', 'Crema'])}",
+            rnd.choice(["Genfar", "MK", "Bayer", "Pfizer", "Tecnoquímicas"]),
+            rnd.randint(0, 500),
+            Decimal(rnd.randint(1000, 90000)) / 100,
+            Decimal(rnd.randint(500, 50000)) / 100,
+            hoy + timedelta(days=rnd.randint(-30, 720)),
+        )
+        for i in range(1, rows + 1)
+    ]
+    return QueryResult(columns, filas)
+
+
+def medir(fn, repeat: int) -> tuple:
+    tiempos = []
+    salida = ""
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        salida = fn()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000, len(salida.encode("utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    resultado = generar(args.rows)
+    como_dicts = list(resultado)
+
+    antes_ms, antes_bytes = medir(lambda: json.dumps(como_dicts, cls=CustomDecimalEncoder), args.repeat)
+    ahora_ms, ahora_bytes = medir(lambda: serializer.dumps(serializer.columnar(resultado)), args.repeat)
+
+    print(f"Filas: {args.rows:,} | backend: {serializer.BACKEND}")
+    print(f"{'':<28}{'ms (mediana)':>14}{'bytes':>14}")
+    print(f"{'dicts + CustomDecimalEncoder':<28}{antes_ms:>14.1f}{antes_bytes:>14,}")
+    print(f"{'columnar + serializer':<28}{ahora_ms:>14.1f}{ahora_bytes:>14,}")
+    print(f"Reducción: tiempo {1 - ahora_ms / antes_ms:.0%} | tamaño {1 - ahora_bytes / antes_bytes:.0%}")
+
+
+if __name__ == "__main__":
+    main()
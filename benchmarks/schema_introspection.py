@@ -0,0 +1,110 @@
+"""
+Benchmark: introspección del esquema 'describe' vs 'bulk'
+
+Crea una base de datos desechable con muchas tablas (más dos vistas
+al estilo de v_stock_productos / v_semaforo_vencimientos) y mide cuánto
+tarda MySQLTool._build_schema en cada modo.
+
+Uso:
+    python -m benchmarks.schema_introspection --tables 120 --rows 2000
+"""
+import argparse
+import statistics
+import time
+
+import mysql.connector
+
+from config import MYSQL_CONFIG
+from tools.mysql_tool import MySQLTool
+
+
+def crear_esquema(database: str, n_tables: int, rows: int):
+    """Crea (o recrea) la BD de prueba con n_tables tablas y dos vistas"""
+    params = {k: MYSQL_CONFIG[k] for k in ('host', 'user', 'password', 'port')}
+    conn = mysql.connector.connect(**params)
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+    cursor.execute(f"CREATE DATABASE `{database}`")
+    cursor.execute(f"USE `{database}`")
+
+    cursor.execute("""
+        CREATE TABLE productos (
+            id_producto INT AUTO_INCREMENT PRIMARY KEY,
+            nombre_comercial VARCHAR(120) NOT NULL,
+            precio_venta DECIMAL(10,2) NOT NULL
+        )""")
+    cursor.execute("""
+        CREATE TABLE lotes (
+            id_lote INT AUTO_INCREMENT PRIMARY KEY,
+            id_producto INT NOT NULL,
+            cantidad INT NOT NULL,
+            fecha_vencimiento DATE NOT NULL,
+            FOREIGN KEY (id_producto) REFERENCES productos(id_producto)
+        )""")
+    cursor.execute("""
+        CREATE VIEW v_stock_productos AS
+        SELECT p.id_producto, p.nombre_comercial, COALESCE(SUM(l.cantidad), 0) AS stock_total
+          FROM productos p LEFT JOIN lotes l ON l.id_producto = p.id_producto
+         GROUP BY p.id_producto, p.nombre_comercial""")
+    cursor.execute("""
+        CREATE VIEW v_semaforo_vencimientos AS
+        SELECT l.id_lote, l.id_producto, DATEDIFF(l.fecha_vencimiento, CURDATE()) AS dias_restantes
+          FROM lotes l""")
+
+    for i in range(n_tables - 2):
+        cursor.execute(f"""
+            CREATE TABLE tabla_{i:03d} (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                id_producto INT NULL,
+                descripcion VARCHAR(100) NOT NULL COMMENT 'texto libre',
+                valor DECIMAL(12,2) NULL,
+                creado DATETIME NOT NULL,
+                FOREIGN KEY (id_producto) REFERENCES productos(id_producto)
+            )""")
+        if rows:
+            cursor.executemany(
+                f"INSERT INTO tabla_{i:03d} (descripcion, valor, creado) VALUES (%s, %s, NOW())",
+                [(f"fila {j}", j) for j in range(rows)]
+            )
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def medir(tool: MySQLTool, repeticiones: int) -> list:
+    """Mide el tiempo de reconstrucción del esquema (sin caché)"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        with tool._cursor() as cursor:
+            tool._build_schema(cursor)
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default="bench_schema_agente")
+    parser.add_argument("--tables", type=int, default=120)
+    parser.add_argument("--rows", type=int, default=2000, help="filas por tabla")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-setup", action="store_true")
+    args = parser.parse_args()
+
+    if not args.skip_setup:
+        print(f"🏗️  Creando {args.tables} tablas con {args.rows} filas en '{args.database}'...")
+        crear_esquema(args.database, args.tables, args.rows)
+
+    config = {**MYSQL_CONFIG, 'database': args.database}
+    for modo in ('describe', 'bulk'):
+        tool = MySQLTool(**{**config, 'schema_mode': modo, 'exact_counts': False})
+        tiempos = medir(tool, args.repeat)
+        print(
+            f"{modo:>9}: mediana {statistics.median(tiempos) * 1000:8.1f} ms | "
+            f"mín {min(tiempos) * 1000:8.1f} ms | máx {max(tiempos) * 1000:8.1f} ms"
+        )
+        tool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -19,8 +19,141 @@ MYSQL_CONFIG = {
     'user': os.getenv('MYSQL_USER', 'root'),
     'password': os.getenv('MYSQL_PASSWORD', 'fabian'), 
     'database': os.getenv('MYSQL_DATABASE', 'legacy03'),
-    'port': int(os.getenv('MYSQL_PORT', '3307'))
+    'port': int(os.getenv('MYSQL_PORT', '3307')),
+    # Segundos que se reutiliza el esquema cacheado aunque no cambie su huella
+    'schema_cache_ttl': float(os.getenv('SCHEMA_CACHE_TTL', '300')),
+    # 'bulk' lee todo de information_schema (filas estimadas); 'describe' es el modo original
+    'schema_mode': os.getenv('SCHEMA_MODE', 'bulk'),
+    # Conteos exactos (COUNT(*)) calculados en segundo plano, solo en modo 'bulk'
+    'exact_counts': os.getenv('SCHEMA_EXACT_COUNTS', 'false').lower() == 'true',
+    # Pool de conexiones compartido por las peticiones concurrentes de la API
+    'pool_size': int(os.getenv('MYSQL_POOL_SIZE', '5')),
+    'pool_timeout': float(os.getenv('MYSQL_POOL_TIMEOUT', '10')),
+    # Caché de resultados de SELECT (0 la desactiva); se invalida al escribir en las tablas
+    'result_cache_ttl': float(os.getenv('RESULT_CACHE_TTL', '30')),
+    # TTL por tabla/vista, formato "ventas=5,v_stock_productos=15"
+    'result_cache_table_ttls': {
+        nombre.strip(): float(ttl)
+        for nombre, ttl in (
+            par.split('=') for par in os.getenv('RESULT_CACHE_TABLE_TTLS', '').split(',') if '=' in par
+        )
+    },
+    'result_cache_max_bytes': int(os.getenv('RESULT_CACHE_MAX_BYTES', str(32 * 1024 * 1024))),
+    # Topes de lectura para los SELECT generados (se inyecta LIMIT si no lo tienen)
+    'max_result_rows': int(os.getenv('MAX_RESULT_ROWS', '1000')),
+    'max_result_bytes': int(os.getenv('MAX_RESULT_BYTES', str(2 * 1024 * 1024))),
+    # SELECT como sentencias preparadas: los literales pasan a parámetros y el
+    # handle se reutiliza por conexión (LRU de prepared_cache_size plantillas)
+    'prepared_statements': os.getenv('PREPARED_STATEMENTS', 'true').lower() == 'true',
+    'prepared_cache_size': int(os.getenv('PREPARED_CACHE_SIZE', '64')),
+    # Control de costo: EXPLAIN FORMAT=JSON antes de cada SELECT; se rechaza si
+    # supera las filas o el costo estimados (el agente pide una consulta más barata)
+    'cost_guard': os.getenv('SQL_COST_GUARD', 'true').lower() == 'true',
+    'max_query_rows': int(os.getenv('SQL_MAX_QUERY_ROWS', '5000000')),
+    'max_query_cost': float(os.getenv('SQL_MAX_QUERY_COST', '1000000')),
+    # MAX_EXECUTION_TIME de la sesión: MySQL cancela los SELECT más lentos (0 = sin límite)
+    'max_execution_ms': int(os.getenv('SQL_MAX_EXECUTION_MS', '30000')),
+    # Límite propio de /export, que lee el resultado completo (0 = sin límite)
+    'export_max_execution_ms': int(os.getenv('SQL_EXPORT_MAX_EXECUTION_MS', '600000'))
 }
 
 # Tipo de base de datos a usar: 'sqlite' o 'mysql'
-DATABASE_TYPE = os.getenv('DATABASE_TYPE', 'mysql')
\ No newline at end of file
+DATABASE_TYPE = os.getenv('DATABASE_TYPE', 'mysql')
+
+# ========== SESIONES DE CONVERSACIÓN ==========
+SESSION_CONFIG = {
+    # Mensajes de historial que se guardan por sesión
+    'max_messages': int(os.getenv('SESSION_MAX_MESSAGES', '10')),
+    # Sesiones simultáneas antes de expulsar la menos usada (LRU)
+    'max_sessions': int(os.getenv('SESSION_MAX_SESSIONS', '1000')),
+    # Segundos de inactividad tras los cuales se descarta una sesión
+    'idle_ttl': float(os.getenv('SESSION_IDLE_TTL', '1800')),
+    # Tope global de memoria (caracteres de historial sumando todas las sesiones)
+    'max_total_chars': int(os.getenv('SESSION_MAX_TOTAL_CHARS', '5000000'))
+}
+
+# ========== HISTORIAL EN EL PROMPT ==========
+CONTEXT_CONFIG = {
+    # Tokens máximos del historial que se envía a Gemini (estimados como caracteres / 4)
+    'max_tokens': int(os.getenv('CONTEXT_MAX_TOKENS', '1000')),
+    # Mensajes más recientes que siempre se envían completos (resumidos si son tablas)
+    'keep_recent': int(os.getenv('CONTEXT_KEEP_RECENT', '2'))
+}
+
+# ========== CANDIDATOS DE SQL EN PARALELO ==========
+CANDIDATES_CONFIG = {
+    # Candidatos de SQL simultáneos como máximo (1 = generar y corregir en serie)
+    'fan_out': int(os.getenv('SQL_FAN_OUT', '1')),
+    # Percentil de la latencia medida de Gemini que se espera antes de pedir otro candidato
+    'hedge_percentile': float(os.getenv('SQL_HEDGE_PERCENTILE', '90')),
+    # Espera (ms) mientras no hay suficientes mediciones (0 = todos a la vez)
+    'hedge_ms': float(os.getenv('SQL_HEDGE_MS', '8000'))
+}
+
+# ========== CACHÉ PREGUNTA → SQL ==========
+SQL_CACHE_CONFIG = {
+    # Consultas validadas que se recuerdan (LRU)
+    'max_entries': int(os.getenv('SQL_CACHE_MAX_ENTRIES', '500'))
+}
+
+# ========== PODA DEL ESQUEMA EN EL PROMPT ==========
+SCHEMA_SELECTOR_CONFIG = {
+    'enabled': os.getenv('SCHEMA_PRUNING', 'true').lower() == 'true',
+    # Tablas relevantes que se envían además de las de las reglas expertas
+    'top_k': int(os.getenv('SCHEMA_PRUNING_TOP_K', '6'))
+}
+
+# Formatear tablas/gráficos localmente (sin la segunda llamada a Gemini)
+LOCAL_FORMATTER = os.getenv('LOCAL_FORMATTER', 'true').lower() == 'true'
+
+# ========== RUTA RÁPIDA POR INTENCIÓN ==========
+INTENT_ROUTER_CONFIG = {
+    # Responder preguntas frecuentes con SQL verificado, sin llamar a Gemini
+    'enabled': os.getenv('INTENT_ROUTER', 'true').lower() == 'true',
+    # Confianza mínima para usar la ruta rápida (si no, se usa el LLM)
+    'min_confidence': float(os.getenv('INTENT_MIN_CONFIDENCE', '0.75'))
+}
+
+# ========== ÍNDICE DE NOMBRES DE PRODUCTOS ==========
+PRODUCT_INDEX_CONFIG = {
+    # Resolver los productos mencionados a id_producto antes de generar el SQL
+    'enabled': os.getenv('PRODUCT_INDEX', 'true').lower() == 'true',
+    # Similitud mínima (trigramas) para aceptar un nombre mal escrito ("dolez" -> Dolex)
+    'min_similarity': float(os.getenv('PRODUCT_MIN_SIMILARITY', '0.45')),
+    # Segundos entre recargas completas (las escrituras lo actualizan al momento)
+    'ttl': float(os.getenv('PRODUCT_INDEX_TTL', '600'))
+}
+
+# ========== GRABACIÓN / REPLAY DE LLAMADAS A GEMINI ==========
+MODEL_REPLAY_CONFIG = {
+    # off: siempre Gemini | record: Gemini + grabar | replay: responder desde lo grabado
+    'mode': os.getenv('LLM_RECORD_MODE', 'off'),
+    'store_dir': os.getenv('LLM_RECORD_DIR', 'data/llm_recordings'),
+    # recorded: esperar la latencia grabada | zero: responder de inmediato
+    'latency': os.getenv('LLM_REPLAY_LATENCY', 'recorded'),
+    # En replay, un prompt sin grabar es un error (en vez de llamar a Gemini)
+    'strict': os.getenv('LLM_REPLAY_STRICT', 'false').lower() == 'true',
+    # Modelo con el que se grabó (vacío = el modelo configurado en GEMINI_MODEL)
+    'model_name': os.getenv('LLM_REPLAY_MODEL') or None
+}
+
+# ========== MÉTRICAS (/metrics en formato Prometheus) ==========
+METRICS_CONFIG = {
+    # Latencias por etapa, tamaños de prompt, filas y reintentos
+    'enabled': os.getenv('METRICS', 'true').lower() == 'true'
+}
+
+# ========== CONCURRENCIA (API asíncrona y lotes) ==========
+CONCURRENCY_CONFIG = {
+    # Llamadas simultáneas a Gemini (entre todas las peticiones)
+    'llm_concurrency': int(os.getenv('LLM_CONCURRENCY', '8')),
+    # Llamadas simultáneas a la BD; por defecto, el tamaño del pool de conexiones
+    'db_concurrency': int(os.getenv('DB_CONCURRENCY', str(MYSQL_CONFIG['pool_size'])))
+}
+
+BATCH_CONFIG = {
+    # Preguntas máximas por petición a /ask/batch
+    'max_questions': int(os.getenv('BATCH_MAX_QUESTIONS', '50')),
+    # Segundos máximos por pregunta (0 = sin límite)
+    'item_timeout': float(os.getenv('BATCH_ITEM_TIMEOUT', '120'))
+}
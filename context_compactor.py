@@ -0,0 +1,177 @@
+"""
+Compactación del historial de conversación que se envía a Gemini
+"""
+import json
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from serializer import dumps
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+class ContextCompactor:
+    """
+    Mantiene el historial dentro de un presupuesto de tokens.
+
+    - `digest`: las respuestas tabla/gráfico (JSON con todas las filas) se
+      guardan en el historial como un resumen: tipo, título, columnas,
+      número de filas, una fila de ejemplo y el SQL que las produjo. Con
+      eso el modelo puede responder "¿y solo los de Genfar?" sin recibir
+      las filas de nuevo.
+    - `render`: arma el texto del historial empezando por los turnos más
+      recientes; los más viejos que no caben se resumen en una línea (las
+      preguntas que se hicieron) o se descartan.
+
+    Los tokens se estiman como caracteres / `chars_per_token` (sin
+    tokenizador). Cada prompt enviado se registra con `record_prompt`.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 1000,
+        keep_recent: int = 2,
+        chars_per_token: float = 4.0,
+        max_text_chars: int = 600,
+        on_prompt: Optional[Callable[[str], None]] = None
+    ):
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.chars_per_token = chars_per_token
+        self.max_text_chars = max_text_chars
+        self.on_prompt = on_prompt
+        self._lock = threading.Lock()
+
+        self.digested = 0
+        self.digest_chars_saved = 0
+        self.renders = 0
+        self.summarized_turns = 0
+        self.dropped_turns = 0
+        self.prompts = 0
+        self.prompt_chars = 0
+        self.max_prompt_chars = 0
+
+    @property
+    def budget_chars(self) -> int:
+        return int(self.max_tokens * self.chars_per_token)
+
+    # --- Resumen de respuestas ---
+
+    def digest(self, content: str, sql: Optional[str] = None) -> str:
+        """Versión compacta de una respuesta del asistente (igual si ya es corta)"""
+        payload = None
+        if content.lstrip().startswith("{"):
+            try:
+                payload = json.loads(content)
+            except ValueError:
+                payload = None
+
+        if not isinstance(payload, dict) or payload.get("type") not in ("table", "chart", "confirm"):
+            text = _shorten(content, self.max_text_chars)
+            if sql:
+                text += f" [SQL: {_shorten(sql, 300)}]"
+            return text
+
+        if payload["type"] == "confirm":
+            digest = f"[Escritura pendiente de confirmación] SQL: {_shorten(payload.get('sql_query', ''), 300)}"
+        else:
+            # Columnar (columns/rows) o el formato anterior (content: lista de dicts)
+            rows = payload.get("rows")
+            columns = payload.get("columns")
+            if rows is None:
+                content_rows = payload.get("content") or []
+                columns = columns or (list(content_rows[0]) if content_rows else [])
+                rows = [list(r.values()) if isinstance(r, dict) else r for r in content_rows]
+            kind = "Tabla" if payload["type"] == "table" else f"Gráfico {payload.get('chart_type', '')}".strip()
+            parts = [
+                f"[{kind}] \"{_shorten(payload.get('title', ''), 80)}\"",
+                f"columnas: {', '.join(map(str, columns or []))}",
+                f"{len(rows)} fila(s)" + (" (truncado)" if payload.get("truncated") else ""),
+            ]
+            if payload["type"] == "chart":
+                parts.append(f"etiquetas: {payload.get('label_key')}, valores: {payload.get('data_key')}")
+            if rows:
+                parts.append(f"ejemplo: {_shorten(dumps(rows[0]), 120)}")
+            if sql:
+                parts.append(f"SQL: {_shorten(sql, 300)}")
+            digest = " | ".join(parts)
+
+        with self._lock:
+            self.digested += 1
+            self.digest_chars_saved += max(0, len(content) - len(digest))
+        return digest
+
+    # --- Historial con presupuesto ---
+
+    def render(self, context: List[Dict[str, Any]]) -> str:
+        """Texto del historial dentro del presupuesto (los turnos recientes primero)"""
+        lines = [
+            f"{'Usuario' if m['role'] == 'user' else 'Asistente'}: "
+            + (_shorten(m["content"], self.max_text_chars) if m["role"] == "user"
+               else self.digest(m["content"], m.get("sql")))
+            for m in context
+        ]
+
+        budget = self.budget_chars
+        kept: List[str] = []
+        used = 0
+        cut = 0
+        # Los últimos `keep_recent` mensajes van siempre; los demás, mientras quepan
+        for index in range(len(lines) - 1, -1, -1):
+            cost = len(lines[index]) + 1
+            if len(kept) >= self.keep_recent and used + cost > budget:
+                cut = index + 1
+                break
+            kept.append(lines[index])
+            used += cost
+        kept.reverse()
+
+        summarized = dropped = 0
+        if cut:
+            older = [m for m in context[:cut] if m["role"] == "user"]
+            summary = "Preguntas anteriores (resumidas): "
+            room = budget - used - len(summary)
+            questions = []
+            for m in reversed(older):
+                question = _shorten(m["content"], 80)
+                if room - len(question) - 3 < 0:
+                    break
+                questions.append(question)
+                room -= len(question) + 3
+            if questions:
+                kept.insert(0, summary + " | ".join(reversed(questions)))
+            summarized = len(questions)
+            dropped = cut - summarized
+
+        with self._lock:
+            self.renders += 1
+            self.summarized_turns += summarized
+            self.dropped_turns += dropped
+        return "\n".join(kept)
+
+    def record_prompt(self, prompt: str):
+        """Registra el tamaño del prompt completo que se envía al modelo"""
+        size = len(prompt)
+        with self._lock:
+            self.prompts += 1
+            self.prompt_chars += size
+            self.max_prompt_chars = max(self.max_prompt_chars, size)
+        if self.on_prompt:
+            self.on_prompt(prompt)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_tokens": self.max_tokens,
+                "digested": self.digested,
+                "digest_chars_saved": self.digest_chars_saved,
+                "renders": self.renders,
+                "summarized_turns": self.summarized_turns,
+                "dropped_turns": self.dropped_turns,
+                "prompts": self.prompts,
+                "avg_prompt_chars": round(self.prompt_chars / self.prompts) if self.prompts else 0,
+                "max_prompt_chars": self.max_prompt_chars,
+            }
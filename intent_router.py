@@ -0,0 +1,232 @@
+"""
+Ruta rápida por intención: reconoce localmente las preguntas frecuentes y
+las responde con SQL verificado, sin llamar a Gemini
+"""
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sql_cache import normalize_question
+
+# Palabras que no cambian el sentido de la pregunta (no restan confianza)
+FILLER_WORDS = {
+    "el", "la", "los", "las", "un", "una", "unos", "unas", "de", "del", "al", "a",
+    "en", "que", "cual", "cuales", "cuanto", "cuanta", "cuantos", "cuantas", "como",
+    "me", "mi", "nos", "se", "su", "sus", "es", "son", "esta", "estan", "hay", "tiene",
+    "tienen", "tenemos", "dame", "dime", "muestra", "muestrame", "mostrar", "lista",
+    "listar", "listame", "ver", "quiero", "saber", "consultar", "y", "o", "con", "por",
+    "para", "favor", "todo", "todos", "todas", "producto", "productos", "medicamento",
+    "medicamentos", "actual", "actualmente", "ahora", "hoy", "tengo", "queda", "quedan",
+    "mas", "muy", "estado",
+}
+
+STOCK_WORDS = {
+    "stock", "existencia", "existencias", "unidades", "inventario", "cantidad",
+    "disponible", "disponibles", "quedan", "queda",
+}
+
+# Palabras que descartan la ruta rápida aunque una intención encaje: pedidos
+# de escritura (van a confirmación) y preguntas de otro dominio (ventas, compras...)
+VETO_WORDS = {
+    "aumenta", "aumentar", "aumentale", "agrega", "agregar", "agregale", "anade", "anadir",
+    "suma", "sumar", "sumale", "resta", "restar", "restale", "descuenta", "descontar",
+    "quita", "quitar", "quitale", "registra", "registrar", "registrame", "inserta", "insertar",
+    "borra", "borrar", "elimina", "eliminar", "actualiza", "actualizar", "cambia", "cambiar",
+    "modifica", "modificar", "ajusta", "ajustar", "pon", "poner", "ponle", "crea", "crear",
+    "ventas", "venta", "vendido", "vendidos", "vendio", "vendimos", "vender",
+    "compras", "compra", "comprado", "comprados", "clientes", "cliente",
+    "proveedores", "proveedor", "facturas", "factura", "ingresos", "ganancias",
+    "precio", "precios",
+}
+_LOW_STOCK = re.compile(r"\b(?:stock bajo|bajo stock|bajos de stock|poco stock|pocas unidades|por agotarse|nivel bajo)\b")
+_NO_STOCK = re.compile(r"\b(?:sin stock|sin existencias|agotados?|agotadas?)\b")
+
+_EXPIRY = re.compile(r"\b(?:vencimientos?|vencen|vence|vencer|vencidos?|vencidas?|caducan|caducados?|semaforo)\b")
+_EXPIRED = re.compile(r"\b(?:vencidos?|vencidas?|caducados?)\b")
+_DAYS = re.compile(r"\b(\d{1,4}) dias?\b")
+_COLORS = {
+    "rojo": "ROJO", "rojos": "ROJO", "roja": "ROJO", "rojas": "ROJO",
+    "amarillo": "AMARILLO", "amarillos": "AMARILLO", "amarilla": "AMARILLO", "amarillas": "AMARILLO",
+    "verde": "VERDE", "verdes": "VERDE",
+}
+EXPIRY_WORDS = {
+    "proximos", "proximas", "siguientes", "alerta", "alertas", "color", "lotes", "lote",
+    "dias", "dia", "semaforo", "vencimiento", "vencimientos", "vencen", "vence", "vencer",
+    "vencidos", "vencidas", "vencido", "vencida", "caducan", "caducados", "caducado",
+} | set(_COLORS)
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _phrase_words(match: Optional["re.Match"]) -> Set[str]:
+    return set(match.group(0).split()) if match else set()
+
+
+class IntentMatch:
+    """Intención reconocida: nombre, SQL verificado y confianza (0 a 1)"""
+
+    def __init__(self, intent: str, sql: str, confidence: float):
+        self.intent = intent
+        self.sql = sql
+        self.confidence = confidence
+
+    def __repr__(self) -> str:
+        return f"IntentMatch({self.intent!r}, confidence={self.confidence:.2f})"
+
+
+class RoutedQuestion:
+    """Pregunta ya normalizada que reciben las intenciones"""
+
+    def __init__(self, question: str, products: List[Tuple[int, str]], product_words: Set[str]):
+        self.question = question
+        self.text = normalize_question(question)
+        self.words = set(self.text.split())
+        # (id_producto, nombre) mencionados y las palabras de la pregunta que los nombran
+        self.products = products
+        self.product_words = product_words
+
+
+# Una intención recibe la pregunta y devuelve (sql, confianza base, palabras usadas) o None
+IntentFn = Callable[[RoutedQuestion], Optional[Tuple[str, float, Set[str]]]]
+
+
+def stock_producto(q: RoutedQuestion):
+    """Stock de uno o varios productos, por clave primaria (regla experta 1)"""
+    used = q.words & STOCK_WORDS
+    if not q.products or not used:
+        return None
+    ids = ", ".join(str(product_id) for product_id, _ in q.products)
+    return f"SELECT * FROM v_stock_productos WHERE id_producto IN ({ids})", 0.95, used | q.product_words
+
+
+def nivel_stock(q: RoutedQuestion):
+    """Productos con stock BAJO o SIN_STOCK (regla experta 1)"""
+    low, none = _LOW_STOCK.search(q.text), _NO_STOCK.search(q.text)
+    if bool(low) == bool(none):
+        return None
+    level = "BAJO" if low else "SIN_STOCK"
+    used = _phrase_words(low or none) | {"nivel", "stock"}
+    return f"SELECT * FROM v_stock_productos WHERE nivel_stock = '{level}'", 0.9, used
+
+
+def semaforo_vencimientos(q: RoutedQuestion):
+    """Semáforo de vencimientos por color, ventana de días o vencidos (regla experta 2)"""
+    if not _EXPIRY.search(q.text):
+        return None
+
+    conditions = []
+    colors = sorted({_COLORS[w] for w in q.words if w in _COLORS})
+    if colors:
+        conditions.append("color_alerta IN (" + ", ".join(_quote(c) for c in colors) + ")")
+    days = _DAYS.search(q.text)
+    if days:
+        conditions.append(f"dias_restantes BETWEEN 0 AND {int(days.group(1))}")
+    if _EXPIRED.search(q.text) and not days and "vencer" not in q.words:
+        conditions.append("dias_restantes < 0")
+
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    used = (q.words & EXPIRY_WORDS) | ({days.group(1)} if days else set())
+    confidence = 0.9 if conditions else 0.8
+    return f"SELECT * FROM v_semaforo_vencimientos{where} ORDER BY dias_restantes", confidence, used
+
+
+DEFAULT_INTENTS: List[Tuple[str, IntentFn]] = [
+    ("stock_producto", stock_producto),
+    ("nivel_stock", nivel_stock),
+    ("semaforo_vencimientos", semaforo_vencimientos),
+]
+
+
+class IntentRouter:
+    """
+    Enrutador de intenciones con SQL verificado.
+
+    Cada intención propone un SQL, una confianza base y las palabras de la
+    pregunta que explica. Cada palabra con contenido que nadie explica
+    (ej. "por laboratorio") resta confianza: si la mejor intención queda
+    por debajo de `min_confidence` (o justo en el tope), la pregunta sigue
+    al LLM. Las palabras de `VETO_WORDS` (escrituras, otros dominios)
+    descartan la ruta rápida sin importar la confianza.
+
+    Se pueden agregar intenciones con `register(nombre, funcion)`.
+    """
+
+    # Una sola palabra sin explicar ya deja la mejor intención (0.95) bajo 0.75
+    UNEXPLAINED_PENALTY = 0.25
+
+    def __init__(
+        self,
+        product_lookup: Optional[Callable[[Set[str]], Tuple[List[Tuple[int, str]], Set[str]]]] = None,
+        min_confidence: float = 0.75,
+        enabled: bool = True,
+        intents: Optional[Iterable[Tuple[str, IntentFn]]] = None
+    ):
+        self.product_lookup = product_lookup
+        self.min_confidence = min_confidence
+        self.enabled = enabled
+        self.intents: List[Tuple[str, IntentFn]] = list(DEFAULT_INTENTS if intents is None else intents)
+        self._lock = threading.Lock()
+
+        self.routed: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+        self.low_confidence = 0
+        self.no_match = 0
+        self.vetoed = 0
+
+    def register(self, name: str, intent: IntentFn):
+        self.intents.append((name, intent))
+
+    def route(self, question: str) -> Optional[IntentMatch]:
+        """La intención más confiable para la pregunta, o None para usar el LLM"""
+        if not self.enabled:
+            return None
+
+        words = set(normalize_question(question).split())
+        if words & VETO_WORDS:
+            with self._lock:
+                self.vetoed += 1
+            return None
+        products, product_words = self.product_lookup(words) if self.product_lookup else ([], set())
+        q = RoutedQuestion(question, products, product_words)
+
+        best: Optional[IntentMatch] = None
+        for name, intent in self.intents:
+            proposal = intent(q)
+            if proposal is None:
+                continue
+            sql, confidence, used = proposal
+            unexplained = q.words - used - FILLER_WORDS
+            confidence -= self.UNEXPLAINED_PENALTY * len(unexplained)
+            if best is None or confidence > best.confidence:
+                best = IntentMatch(name, sql, round(confidence, 3))
+
+        with self._lock:
+            if best is None:
+                self.no_match += 1
+                return None
+            if best.confidence <= self.min_confidence:
+                self.low_confidence += 1
+                return None
+            self.routed[best.intent] = self.routed.get(best.intent, 0) + 1
+        return best
+
+    def record_failure(self, intent: str):
+        """El SQL de la intención falló al ejecutarse (la pregunta siguió al LLM)"""
+        with self._lock:
+            self.failures[intent] = self.failures.get(intent, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            routed = sum(self.routed.values())
+            total = routed + self.low_confidence + self.no_match + self.vetoed
+            return {
+                "enabled": self.enabled,
+                "routed": dict(self.routed),
+                "failures": dict(self.failures),
+                "low_confidence": self.low_confidence,
+                "no_match": self.no_match,
+                "vetoed": self.vetoed,
+                "route_rate": round(routed / total, 3) if total else 0.0,
+            }
@@ -0,0 +1,213 @@
+"""
+Métricas por etapa del pipeline del agente, en formato de texto de Prometheus
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Segundos: de una consulta cacheada (ms) a una llamada lenta a Gemini
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Caracteres de un prompt
+PROMPT_BUCKETS = (500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+# Filas de un resultado
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Histograma con una etiqueta (ej. stage="sql_generation")"""
+
+    def __init__(self, name: str, help: str, label: str, buckets: Tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        # valor de la etiqueta -> [conteos por bucket (+Inf al final), suma]
+        self._series: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """{valor de la etiqueta: {"count", "sum", "mean"}}"""
+        with self._lock:
+            return {
+                key: {"count": sum(counts), "sum": total, "mean": total / sum(counts) if sum(counts) else 0.0}
+                for key, (counts, total) in self._series.items()
+            }
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(key, list(counts), total) for key, (counts, total) in sorted(self._series.items())]
+        for key, counts, total in snapshot:
+            label = f'{self.label}="{_escape(key)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{_format(bound)}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {_format(total)}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Contador con una etiqueta"""
+
+    def __init__(self, name: str, help: str, label: str):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._values: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value: str, amount: float = 1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def get(self, label_value: str) -> float:
+        with self._lock:
+            return self._values.get(label_value, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{{{self.label}="{_escape(key)}"}} {_format(value)}')
+        return lines
+
+
+def _numeric_stats(stats: Dict[str, Any], prefix: str = "") -> Iterator[Tuple[str, str, float]]:
+    """(componente, clave, valor) de cada número de `get_stats()` (anidado con '.')"""
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            yield from _numeric_stats(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and prefix:
+            yield prefix[:-1], key, value
+
+
+class Metrics:
+    """
+    Instrumentación del pipeline de `MCPAgent`.
+
+    - agent_stage_seconds{stage}: latencia de cada etapa (esquema,
+      generación de SQL, ejecución, corrección, formato de la respuesta)
+    - agent_prompt_chars{prompt}: tamaño de los prompts enviados a Gemini
+    - agent_result_rows{attempt}: filas devueltas por consulta
+    - agent_questions_total{path}: por dónde se respondió cada pregunta
+    - agent_sql_executions_total{attempt} / agent_sql_errors_total{attempt}
+      (attempt = "routed", "1" o "2")
+    - agent_sql_retry_ratio: correcciones / primeros intentos
+    - agent_cache_hit_ratio{cache} y agent_component_stat{component,key}:
+      tomados de `get_stats()` al momento de leer /metrics
+
+    Observar cuesta un `perf_counter`, un bisect y un lock sin
+    contención; con `enabled=False` todo es un no-op.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self.stage_seconds = Histogram(
+            "agent_stage_seconds", "Latencia por etapa del pipeline", "stage", LATENCY_BUCKETS
+        )
+        self.prompt_chars = Histogram(
+            "agent_prompt_chars", "Caracteres de los prompts enviados al LLM", "prompt", PROMPT_BUCKETS
+        )
+        self.result_rows = Histogram(
+            "agent_result_rows", "Filas devueltas por consulta", "attempt", ROW_BUCKETS
+        )
+        self.questions = Counter("agent_questions_total", "Preguntas por camino de respuesta", "path")
+        self.executions = Counter("agent_sql_executions_total", "Ejecuciones de SQL por intento", "attempt")
+        self.errors = Counter("agent_sql_errors_total", "Errores de SQL por intento", "attempt")
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mide la duración del bloque como la etapa `name`"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds.observe(name, time.perf_counter() - start)
+
+    def observe_stage(self, name: str, seconds: float):
+        if self.enabled:
+            self.stage_seconds.observe(name, seconds)
+
+    def prompt(self, kind: str, text: str):
+        if self.enabled:
+            self.prompt_chars.observe(kind, len(text))
+
+    def execution(self, attempt: str, results):
+        """Registra una ejecución de SQL: filas o error"""
+        if not self.enabled:
+            return
+        self.executions.inc(attempt)
+        if results and "error" in results[0]:
+            self.errors.inc(attempt)
+        else:
+            self.result_rows.observe(attempt, len(results))
+
+    def question(self, path: str):
+        if self.enabled:
+            self.questions.inc(path)
+
+    def render(self, stats: Optional[Dict[str, Any]] = None) -> str:
+        """Texto de exposición de Prometheus (incluye los contadores de `stats`)"""
+        lines: List[str] = []
+        for metric in (self.stage_seconds, self.prompt_chars, self.result_rows,
+                       self.questions, self.executions, self.errors):
+            lines.extend(metric.render())
+
+        first = self.executions.get("1")
+        lines += [
+            "# HELP agent_sql_retry_ratio Fracción de consultas que necesitaron corrección",
+            "# TYPE agent_sql_retry_ratio gauge",
+            f"agent_sql_retry_ratio {_format(self.executions.get('2') / first if first else 0.0)}",
+            "# HELP agent_uptime_seconds Segundos desde que arrancó el agente",
+            "# TYPE agent_uptime_seconds gauge",
+            f"agent_uptime_seconds {_format(round(time.time() - self.started_at, 1))}",
+        ]
+
+        if stats:
+            numeric = list(_numeric_stats(stats))
+            lines += [
+                "# HELP agent_cache_hit_ratio Tasa de aciertos de cada caché",
+                "# TYPE agent_cache_hit_ratio gauge",
+            ]
+            lines += [
+                f'agent_cache_hit_ratio{{cache="{_escape(component)}"}} {_format(value)}'
+                for component, key, value in numeric if key == "hit_rate"
+            ]
+            lines += [
+                "# HELP agent_component_stat Contadores de get_stats() (sesiones, cachés, pool, router)",
+                "# TYPE agent_component_stat gauge",
+            ]
+            lines += [
+                f'agent_component_stat{{component="{_escape(component)}",key="{_escape(key)}"}} {_format(value)}'
+                for component, key, value in numeric
+            ]
+        return "\n".join(lines) + "\n"
@@ -2,15 +2,20 @@
 Modelo Gemini simplificado
 """
 import google.generativeai as genai
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional
+
+from context_compactor import ContextCompactor
 
 
 class GeminiModel:
     """Wrapper simple para Gemini"""
     
-    def __init__(self, api_key: str, model_name: str):
+    def __init__(self, api_key: str, model_name: str, compactor: Optional[ContextCompactor] = None):
         genai.configure(api_key=api_key)
+        self.model_name = model_name
         self.model = genai.GenerativeModel(model_name)
+        # Presupuesto de tokens del historial (None = historial completo)
+        self.compactor = compactor
     
     def ask(self, prompt: str, context: List[Dict] = None) -> str:
         """
@@ -23,21 +28,50 @@ class GeminiModel:
         Returns:
             La respuesta del modelo
         """
-        # Si hay contexto, incluirlo
-        if context:
-            full_prompt = self._build_with_context(prompt, context)
-        else:
-            full_prompt = prompt
+        full_prompt = self._prepare_prompt(prompt, context)
         
         response = self.model.generate_content(full_prompt)
         return response.text.strip()
     
+    async def ask_async(self, prompt: str, context: List[Dict] = None) -> str:
+        """
+        Versión asíncrona de `ask`: no bloquea el event loop mientras
+        espera la respuesta de Gemini.
+        """
+        full_prompt = self._prepare_prompt(prompt, context)
+        
+        response = await self.model.generate_content_async(full_prompt)
+        return response.text.strip()
+    
+    async def ask_stream_async(self, prompt: str, context: List[Dict] = None) -> AsyncIterator[str]:
+        """
+        Pregunta al modelo y entrega la respuesta trozo a trozo
+        (generate_content con stream=True), a medida que Gemini la produce.
+        """
+        full_prompt = self._prepare_prompt(prompt, context)
+        
+        response = await self.model.generate_content_async(full_prompt, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+    
+    def _prepare_prompt(self, prompt: str, context: Optional[List[Dict]]) -> str:
+        """Prompt final (con el historial si lo hay), registrando su tamaño"""
+        full_prompt = self._build_with_context(prompt, context) if context else prompt
+        if self.compactor:
+            self.compactor.record_prompt(full_prompt)
+        return full_prompt
+    
     def _build_with_context(self, prompt: str, context: List[Dict]) -> str:
         """Construye el prompt con contexto"""
-        history = "\n".join([
-            f"{'Usuario' if m['role']=='user' else 'Asistente'}: {m['content']}"
-            for m in context  # <-- Eliminamos el [-3:] para usar todo el historial
-        ])
+        if self.compactor:
+            # Resúmenes de tablas/gráficos y turnos viejos recortados al presupuesto
+            history = self.compactor.render(context)
+        else:
+            history = "\n".join([
+                f"{'Usuario' if m['role']=='user' else 'Asistente'}: {m['content']}"
+                for m in context
+            ])
         
         # Este nuevo formato es mucho más claro para la IA
         return f"""HISTORIAL DE LA CONVERSACIÓN PREVIA:
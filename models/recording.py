@@ -0,0 +1,229 @@
+"""
+Grabación y reproducción de llamadas al modelo (record/replay)
+"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+MODES = ("off", "record", "replay")
+LATENCIES = ("recorded", "zero")
+
+
+class ReplayMissError(KeyError):
+    """El prompt no está grabado y el modo replay es estricto"""
+
+
+class RecordReplayModel:
+    """
+    Envoltorio de un modelo (GeminiModel) con el mismo contrato: ask,
+    ask_async y ask_stream_async.
+
+    - record: llama al modelo real y guarda prompt, respuesta y latencia
+    - replay: responde desde lo grabado, esperando la latencia grabada
+      (`latency="recorded"`) o nada (`latency="zero"`). Si el prompt no
+      está grabado: con `strict` lanza ReplayMissError; si no, llama al
+      modelo real y graba la respuesta.
+
+    El almacén es direccionado por contenido: cada grabación es
+    `<store_dir>/<hash[:2]>/<hash>.json`, donde el hash es el SHA-256 del
+    nombre del modelo, del prompt y de los mensajes del historial (sin
+    armar: calcular la clave no pasa por el compactador). El historial se
+    arma una sola vez, solo al llamar al modelo real, y la grabación
+    guarda ese prompt completo.
+
+    El nombre del modelo de la clave es `model_name` si se indica; si no,
+    el del modelo envuelto. Para reproducir con otro modelo (p. ej. el
+    falso de los benchmarks) lo grabado con Gemini, se pasa el nombre
+    del modelo con el que se grabó.
+    """
+
+    def __init__(
+        self,
+        inner,
+        store_dir: str = "data/llm_recordings",
+        mode: str = "record",
+        latency: str = "recorded",
+        strict: bool = False,
+        model_name: Optional[str] = None
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Modo de grabación no soportado: {mode} (usa {', '.join(MODES)})")
+        if latency not in LATENCIES:
+            raise ValueError(f"Latencia de replay no soportada: {latency} (usa {', '.join(LATENCIES)})")
+        self.inner = inner
+        self.store_dir = store_dir
+        self.mode = mode
+        self.latency = latency
+        self.strict = strict
+        self.model_name = model_name or getattr(inner, "model_name", "")
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self.live_calls = 0
+        self.saved_seconds = 0.0
+
+    # --- Almacén ---
+
+    def _full_prompt(self, prompt: str, context: Optional[List[Dict]]) -> str:
+        build = getattr(self.inner, "_build_with_context", None)
+        if context and build:
+            return build(prompt, context)
+        return prompt
+
+    def _live_args(self, prompt: str, context: Optional[List[Dict]]):
+        """
+        (prompt, historial) para el modelo real: el historial se arma aquí
+        una vez y el modelo recibe el prompt completo, que es el que se graba.
+        """
+        if context and getattr(self.inner, "_build_with_context", None):
+            return self._full_prompt(prompt, context), None
+        return prompt, context
+
+    def key(self, prompt: str, context: Optional[List[Dict]] = None) -> str:
+        history = json.dumps(context or [], ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(f"{self.model_name}\0{prompt}\0{history}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.store_dir, key[:2], f"{key}.json")
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Grabación ilegible {key[:12]}: {e}")
+            return None
+
+    def _save(self, key: str, prompt: str, response: str, latency: float, chunks=None):
+        entry = {
+            "model": self.model_name,
+            "prompt": prompt,
+            "response": response,
+            "latency_ms": round(latency * 1000, 1),
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        if chunks is not None:
+            # [ms desde el inicio, texto] de cada trozo del streaming
+            entry["chunks"] = chunks
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Escritura atómica: nunca queda un JSON a medias si dos hilos graban a la vez
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        with self._lock:
+            self.recorded += 1
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Grabación para replay, o None si hay que llamar al modelo real"""
+        if self.mode != "replay":
+            return None
+        entry = self._load(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                if self.latency == "zero":
+                    self.saved_seconds += entry["latency_ms"] / 1000
+        if entry is None and self.strict:
+            raise ReplayMissError(f"Prompt sin grabar (replay estricto): {key[:12]}")
+        compactor = getattr(self.inner, "compactor", None)
+        if entry is not None and compactor:
+            # El tamaño del prompt se registra igual que en una llamada real
+            compactor.record_prompt(entry["prompt"])
+        return entry
+
+    def _delay(self, entry: Dict[str, Any]) -> float:
+        return entry["latency_ms"] / 1000 if self.latency == "recorded" else 0.0
+
+    def _count_live(self):
+        with self._lock:
+            self.live_calls += 1
+
+    # --- Contrato del modelo ---
+
+    def ask(self, prompt: str, context: List[Dict] = None) -> str:
+        key = self.key(prompt, context)
+        entry = self._lookup(key)
+        if entry is not None:
+            time.sleep(self._delay(entry))
+            return entry["response"]
+
+        self._count_live()
+        prompt, context = self._live_args(prompt, context)
+        start = time.perf_counter()
+        response = self.inner.ask(prompt, context)
+        if self.mode != "off":
+            self._save(key, self._full_prompt(prompt, context), response, time.perf_counter() - start)
+        return response
+
+    async def ask_async(self, prompt: str, context: List[Dict] = None) -> str:
+        key = self.key(prompt, context)
+        entry = self._lookup(key)
+        if entry is not None:
+            await asyncio.sleep(self._delay(entry))
+            return entry["response"]
+
+        self._count_live()
+        prompt, context = self._live_args(prompt, context)
+        start = time.perf_counter()
+        response = await self.inner.ask_async(prompt, context)
+        if self.mode != "off":
+            self._save(key, self._full_prompt(prompt, context), response, time.perf_counter() - start)
+        return response
+
+    async def ask_stream_async(self, prompt: str, context: List[Dict] = None) -> AsyncIterator[str]:
+        key = self.key(prompt, context)
+        entry = self._lookup(key)
+        if entry is not None:
+            # Se respetan los tiempos de cada trozo (o se entregan de una vez)
+            chunks = entry.get("chunks") or [[entry["latency_ms"], entry["response"]]]
+            elapsed_ms = 0.0
+            for offset_ms, text in chunks:
+                if self.latency == "recorded":
+                    await asyncio.sleep(max(0.0, offset_ms - elapsed_ms) / 1000)
+                    elapsed_ms = offset_ms
+                yield text
+            return
+
+        self._count_live()
+        prompt, context = self._live_args(prompt, context)
+        start = time.perf_counter()
+        chunks = []
+        async for text in self.inner.ask_stream_async(prompt, context):
+            chunks.append([round((time.perf_counter() - start) * 1000, 1), text])
+            yield text
+        if self.mode != "off":
+            self._save(
+                key, self._full_prompt(prompt, context), "".join(t for _, t in chunks).strip(),
+                time.perf_counter() - start, chunks
+            )
+
+    def _build_with_context(self, prompt: str, context: List[Dict]) -> str:
+        return self._full_prompt(prompt, context)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "mode": self.mode,
+                "latency": self.latency,
+                "strict": self.strict,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "recorded": self.recorded,
+                "live_calls": self.live_calls,
+                "saved_seconds": round(self.saved_seconds, 2),
+            }
@@ -0,0 +1,245 @@
+"""
+Índice en memoria de nombres de productos (exacto + trigramas) para
+resolver las menciones de la pregunta a `id_producto`
+"""
+import re
+import threading
+import time
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from intent_router import EXPIRY_WORDS, FILLER_WORDS, STOCK_WORDS
+from sql_cache import normalize_question
+from tools.result_cache import extract_tables
+
+LOAD_SQL = "SELECT id_producto, nombre_comercial FROM productos"
+
+# Palabras de la pregunta que nunca son nombres de producto
+_IGNORE = FILLER_WORDS | STOCK_WORDS | EXPIRY_WORDS | {
+    "precio", "precios", "vendido", "vendidos", "ventas", "venta", "bajo", "sin", "nivel",
+}
+
+# id_producto = 5 / id_producto IN (1, 2, 3) en una escritura
+_ID_FILTER = re.compile(r"\bid_producto\s*(?:=\s*(\d+)|IN\s*\(([\d\s,]+)\))", re.IGNORECASE)
+
+
+def trigrams(word: str) -> Set[str]:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _brand(words: List[str]) -> Optional[str]:
+    """Primera palabra significativa del nombre (la marca)"""
+    return next((w for w in words if len(w) >= 3 and w not in FILLER_WORDS), None)
+
+
+class ProductIndex:
+    """
+    Nombres comerciales de `productos` indexados por marca, con búsqueda
+    aproximada por trigramas ("dolez" -> "dolex").
+
+    Una pregunta menciona un producto si alguna de sus palabras es (o se
+    parece a) una marca; las demás palabras del nombre desempatan
+    ("dolex forte" -> solo las presentaciones Forte).
+
+    Se carga completo la primera vez y cada `ttl` segundos; después de
+    una escritura en `productos` solo se recargan las filas afectadas
+    (ver `on_write`).
+    """
+
+    def __init__(self, db, ttl: float = 600.0, min_similarity: float = 0.45, max_matches: int = 25):
+        self.db = db
+        self.ttl = ttl
+        self.min_similarity = min_similarity
+        self.max_matches = max_matches
+
+        self._names: Dict[int, str] = {}
+        self._words: Dict[int, Set[str]] = {}
+        self._brand_ids: Dict[str, Set[int]] = {}
+        self._grams: Dict[str, Set[str]] = {}   # trigrama -> marcas
+        self._max_id = 0
+        self._loaded_at = 0.0
+        self._stale = True
+        self._lock = threading.RLock()
+
+        self.lookups = 0
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.full_loads = 0
+        self.incremental_updates = 0
+        self.load_errors = 0
+
+    # --- Carga y mantenimiento ---
+
+    def _rows(self, sql: str) -> Iterable[Tuple[Any, Any]]:
+        for batch in islice(self.db.iter_rows(sql), 1, None):
+            yield from batch
+
+    def _add(self, product_id: int, name: str):
+        words = normalize_question(name).split()
+        brand = _brand(words)
+        if brand is None:
+            return
+        self._names[product_id] = name
+        self._words[product_id] = set(words)
+        if brand not in self._brand_ids:
+            self._brand_ids[brand] = set()
+            for gram in trigrams(brand):
+                self._grams.setdefault(gram, set()).add(brand)
+        self._brand_ids[brand].add(product_id)
+        self._max_id = max(self._max_id, product_id)
+
+    def _remove(self, product_id: int):
+        if product_id not in self._names:
+            return
+        brand = _brand(normalize_question(self._names.pop(product_id)).split())
+        self._words.pop(product_id, None)
+        ids = self._brand_ids.get(brand)
+        if ids is not None:
+            ids.discard(product_id)
+            if not ids:
+                del self._brand_ids[brand]
+                for gram in trigrams(brand):
+                    self._grams.get(gram, set()).discard(brand)
+
+    def _load(self):
+        names, words, brand_ids, grams = self._names, self._words, self._brand_ids, self._grams
+        self._names, self._words, self._brand_ids, self._grams = {}, {}, {}, {}
+        self._max_id = 0
+        try:
+            for product_id, name in self._rows(LOAD_SQL):
+                if name:
+                    self._add(int(product_id), str(name))
+        except Exception as e:
+            # Se conserva el índice anterior y se reintenta en el próximo TTL
+            self._names, self._words, self._brand_ids, self._grams = names, words, brand_ids, grams
+            self.load_errors += 1
+            print(f"⚠️  No se pudo cargar el índice de productos: {e}")
+        else:
+            self.full_loads += 1
+            print(f"🔎 Índice de productos: {len(self._names)} productos, {len(self._brand_ids)} marcas")
+        self._loaded_at = time.monotonic()
+        self._stale = False
+
+    def _ensure_loaded(self):
+        if self._stale or time.monotonic() - self._loaded_at > self.ttl:
+            self._load()
+
+    def _reload_ids(self, ids: Set[int]):
+        found = set()
+        id_list = ", ".join(str(i) for i in sorted(ids))
+        for product_id, name in self._rows(f"{LOAD_SQL} WHERE id_producto IN ({id_list})"):
+            product_id = int(product_id)
+            found.add(product_id)
+            self._remove(product_id)
+            if name:
+                self._add(product_id, str(name))
+        for product_id in ids - found:
+            self._remove(product_id)
+
+    def on_write(self, statements: List[str]):
+        """
+        Actualiza el índice después de una escritura confirmada.
+
+        INSERT: se cargan los productos con id mayor al último conocido.
+        UPDATE/DELETE con `id_producto = n` o `IN (...)`: solo esas filas.
+        Cualquier otra escritura en `productos` marca el índice para
+        recargarlo completo en la próxima búsqueda.
+        """
+        with self._lock:
+            for sql in statements:
+                if "productos" not in extract_tables(sql):
+                    continue
+                kind = sql.strip().split(None, 1)[0].upper()
+                ids = {
+                    int(n)
+                    for single, many in _ID_FILTER.findall(sql)
+                    for n in ([single] if single else many.split(","))
+                    if n.strip()
+                }
+                try:
+                    if kind == "INSERT":
+                        for product_id, name in self._rows(f"{LOAD_SQL} WHERE id_producto > {self._max_id}"):
+                            if name:
+                                self._add(int(product_id), str(name))
+                    elif ids:
+                        self._reload_ids(ids)
+                    else:
+                        self._stale = True
+                        continue
+                    self.incremental_updates += 1
+                except Exception as e:
+                    print(f"⚠️  Actualización del índice de productos falló ({e}); se recargará completo")
+                    self._stale = True
+
+    # --- Búsqueda ---
+
+    def _match_brand(self, word: str) -> Tuple[Optional[str], float]:
+        """Marca exacta o la más parecida por trigramas (similitud de Jaccard)"""
+        if word in self._brand_ids:
+            return word, 1.0
+        if len(word) < 4:
+            return None, 0.0
+        grams = trigrams(word)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for brand in self._grams.get(gram, ()):
+                shared[brand] = shared.get(brand, 0) + 1
+        best, best_score = None, 0.0
+        for brand, common in shared.items():
+            score = common / (len(grams) + len(trigrams(brand)) - common)
+            if score > best_score:
+                best, best_score = brand, score
+        if best_score >= self.min_similarity:
+            return best, best_score
+        return None, 0.0
+
+    def find(self, words: Set[str]) -> Tuple[List[Tuple[int, str]], Set[str]]:
+        """
+        Productos mencionados en la pregunta
+
+        Args:
+            words: Palabras normalizadas de la pregunta
+
+        Returns:
+            ([(id_producto, nombre_comercial)], palabras de la pregunta usadas)
+        """
+        with self._lock:
+            self._ensure_loaded()
+            self.lookups += 1
+
+            brands: Dict[str, str] = {}  # palabra de la pregunta -> marca
+            for word in words - _IGNORE:
+                brand, score = self._match_brand(word)
+                if brand:
+                    brands[word] = brand
+                    if score == 1.0:
+                        self.exact_hits += 1
+                    else:
+                        self.fuzzy_hits += 1
+            if not brands:
+                return [], set()
+
+            candidates = set().union(*(self._brand_ids[b] for b in brands.values()))
+            rest = words - set(brands)
+            scores = {pid: len(self._words[pid] & rest) for pid in candidates}
+            best = max(scores.values())
+            chosen = sorted(pid for pid, score in scores.items() if score == best)
+            if len(chosen) > self.max_matches:
+                return [], set()
+
+            used = set(brands) | set().union(*(self._words[pid] & rest for pid in chosen))
+            return [(pid, self._names[pid]) for pid in chosen], used
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "products": len(self._names),
+                "brands": len(self._brand_ids),
+                "lookups": self.lookups,
+                "exact_hits": self.exact_hits,
+                "fuzzy_hits": self.fuzzy_hits,
+                "full_loads": self.full_loads,
+                "incremental_updates": self.incremental_updates,
+                "load_errors": self.load_errors,
+            }
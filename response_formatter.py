@@ -0,0 +1,148 @@
+"""
+Formateador local de respuestas (texto, tabla o gráfico) sin llamar al LLM
+"""
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from serializer import columnar, dumps
+from sql_cache import normalize_question
+from tools.bounded import QueryResult
+
+# Palabras clave de la pregunta (ya normalizadas: sin tildes y en minúsculas)
+CHART_KEYWORDS = (
+    "reporte", "analisis", "grafico", "grafica", "tendencia", "evolucion",
+    "comparar", "comparacion", "distribucion",
+)
+TABLE_KEYWORDS = (
+    "listar", "lista", "listado", "mostrar", "muestra", "muestrame", "todos",
+    "todas", "cuales", "detalle", "inventario",
+)
+TIME_KEYWORDS = ("por dia", "por mes", "por semana", "por ano", "diario", "mensual", "tendencia", "evolucion")
+
+# Máximo de categorías para que un gráfico de barras siga siendo legible
+MAX_CHART_ROWS = 50
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+
+
+def _humanize(column: str) -> str:
+    return column.replace("_", " ").strip().capitalize()
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, Decimal):
+        value = float(value)
+    if isinstance(value, float):
+        return f"{int(value):,}" if value.is_integer() else f"{value:,.2f}"
+    if isinstance(value, int) and not isinstance(value, bool):
+        return f"{value:,}"
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _title(question: str) -> str:
+    title = question.strip().strip("¿?¡!. ")
+    return title[:1].upper() + title[1:] if title else "Resultados"
+
+
+class ResponseFormatter:
+    """
+    Decide localmente el formato de la respuesta a partir de las palabras
+    clave de la pregunta y de la forma del resultado:
+
+    - sin filas o un único valor escalar  -> 'text'
+    - etiqueta + columnas numéricas y pregunta de reporte/análisis -> 'chart'
+    - varias filas o muchas columnas, o pregunta de listado -> 'table'
+
+    Devuelve None cuando conviene que el LLM redacte la respuesta
+    (p. ej. una sola fila con pocos campos, que se lee mejor en prosa).
+
+    Tablas y gráficos van en forma columnar: `columns`, `types` y `rows`
+    (listas de valores) en lugar de `content` con un dict por fila.
+    """
+
+    def __init__(self):
+        self.local = 0
+        self.delegated = 0
+        self._lock = threading.Lock()
+
+    def format(self, question: str, results: List[Dict[str, Any]], force: bool = False) -> Optional[str]:
+        """
+        Respuesta formateada, o None para delegar en el LLM.
+        Con `force` nunca delega (una fila corta se muestra como tabla).
+        """
+        answer = self._format(question, results, force)
+        with self._lock:
+            if answer is None:
+                self.delegated += 1
+            else:
+                self.local += 1
+        return answer
+
+    def _format(self, question: str, results: List[Dict[str, Any]], force: bool = False) -> Optional[str]:
+        normalized = f" {normalize_question(question)} "
+        wants_chart = any(f" {k} " in normalized for k in CHART_KEYWORDS)
+        wants_table = any(f" {k} " in normalized for k in TABLE_KEYWORDS)
+
+        if not results:
+            return "No se encontraron resultados para tu consulta."
+
+        result = QueryResult.from_dicts(results)
+        columns = result.columns
+
+        # Un único valor (conteos, totales, promedios)
+        if len(result) == 1 and len(columns) == 1:
+            return f"{_humanize(columns[0])}: {_format_value(result.rows[0][0])}"
+
+        values = dict(zip(columns, result.column_values()))
+        numeric = [c for c in columns if all(_is_number(v) or v is None for v in values[c])]
+        labels = [c for c in columns if c not in numeric]
+
+        # Agregación etiqueta + número(s): gráfico si la pregunta lo pide
+        if wants_chart and numeric and len(labels) == 1 and len(result) <= MAX_CHART_ROWS:
+            label_key = labels[0]
+            is_time = (
+                all(isinstance(v, (date, datetime)) for v in values[label_key])
+                or any(k in normalized for k in TIME_KEYWORDS)
+            )
+            return dumps({
+                "type": "chart",
+                "chart_type": "line" if is_time else "bar",
+                "title": _title(question),
+                **columnar(result),
+                "label_key": label_key,
+                "data_key": numeric[0],
+            })
+
+        # Una sola fila con pocos campos: mejor redactada por el LLM
+        if len(result) == 1 and len(columns) <= 4 and not (wants_table or wants_chart or force):
+            return None
+
+        payload = {
+            "type": "table",
+            "title": _title(question),
+            **columnar(result),
+        }
+        if getattr(results, "truncated", False):
+            total = getattr(results, "total_estimate", None)
+            payload["truncated"] = True
+            payload["note"] = (
+                f"Mostrando las primeras {len(result)} filas"
+                + (f" de ~{total:,}" if total else "")
+                + "."
+            )
+        return dumps(payload)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.local + self.delegated
+            return {
+                "local": self.local,
+                "delegated_to_llm": self.delegated,
+                "local_rate": round(self.local / total, 3) if total else 0.0,
+            }
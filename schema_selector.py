@@ -0,0 +1,147 @@
+"""
+Selección de las tablas relevantes del esquema para el prompt de SQL
+"""
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sql_cache import normalize_question
+
+# Palabras sin valor para decidir relevancia
+_STOPWORDS = {
+    "el", "la", "los", "las", "un", "una", "unos", "unas", "de", "del", "al", "a",
+    "en", "por", "para", "con", "sin", "y", "o", "que", "cual", "cuales", "cuanto",
+    "cuantos", "cuantas", "como", "donde", "cuando", "me", "mi", "mis", "se", "su",
+    "sus", "es", "son", "hay", "tiene", "tienen", "dame", "muestra", "mostrar",
+    "lista", "listar", "todos", "todas", "quiero", "ver", "total", "id",
+}
+_HEADER = re.compile(r"^(Tabla|Vista):\s*(\S+)")
+_FK = re.compile(r"FK → (\w+)\.")
+
+
+def _stem(word: str) -> str:
+    """Singular aproximado: productos -> producto, vencimientos -> vencimiento"""
+    for suffix in ("es", "s"):
+        if len(word) > 4 and word.endswith(suffix):
+            return word[: -len(suffix)]
+    return word
+
+
+def _tokens(text: str) -> Set[str]:
+    words = normalize_question(text.replace("_", " ")).split()
+    return {_stem(w) for w in words if w not in _STOPWORDS and len(w) > 2}
+
+
+class SchemaSelector:
+    """
+    Índice de tablas, vistas, columnas y comentarios del esquema renderizado.
+
+    Para cada pregunta devuelve solo los bloques de las `top_k` tablas más
+    relevantes, más las vistas/tablas de las reglas expertas y las tablas
+    a las que estas apuntan por llave foránea.
+    """
+
+    def __init__(self, top_k: int = 6, always_include: Iterable[str] = (), enabled: bool = True):
+        self.top_k = top_k
+        self.always_include = [t.lower() for t in always_include]
+        self.enabled = enabled
+
+        self._schema_text: Optional[str] = None
+        self._header = ""
+        # nombre -> (bloque de texto, tokens del nombre, tokens de columnas/comentarios, FKs)
+        self._blocks: Dict[str, Tuple[str, Set[str], Set[str], Set[str]]] = {}
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.chars_full = 0
+        self.chars_selected = 0
+
+    def _index(self, schema: str):
+        """(Re)construye el índice si el texto del esquema cambió"""
+        if schema is self._schema_text or schema == self._schema_text:
+            return
+
+        parts = schema.split("\n\n")
+        header_parts = []
+        blocks = {}
+        for part in parts:
+            lines = part.strip("\n").split("\n")
+            match = _HEADER.match(lines[0]) if lines and lines[0] else None
+            if not match:
+                # Encabezado del esquema ("ESQUEMA DE LA BASE DE DATOS...")
+                if part.strip():
+                    header_parts.append(part.strip("\n"))
+                continue
+            name = match.group(2).lower()
+            blocks[name] = (
+                part.strip("\n"),
+                _tokens(name),
+                _tokens(" ".join(lines[1:])),
+                set(fk.lower() for fk in _FK.findall(part)),
+            )
+
+        self._header = "\n\n".join(header_parts)
+        self._blocks = blocks
+        self._schema_text = schema
+
+    def _score(self, question_tokens: Set[str], name_tokens: Set[str], body_tokens: Set[str]) -> float:
+        score = 3.0 * len(question_tokens & name_tokens) + len(question_tokens & body_tokens)
+        # Coincidencia parcial por prefijo (ej. "vencen" ~ "vencimiento")
+        for q in question_tokens - name_tokens:
+            if len(q) >= 5 and any(t.startswith(q[:5]) for t in name_tokens):
+                score += 1.5
+        return score
+
+    def select(self, question: str, schema: str) -> str:
+        """
+        Devuelve el esquema recortado a las tablas relevantes para la pregunta
+
+        Si la selección está desactivada o el esquema ya es pequeño,
+        devuelve el esquema completo.
+        """
+        with self._lock:
+            self._index(schema)
+            blocks = self._blocks
+            header = self._header
+
+        if not self.enabled or len(blocks) <= self.top_k + len(self.always_include):
+            selected_text = schema
+        else:
+            question_tokens = _tokens(question)
+            ranked = sorted(
+                ((self._score(question_tokens, b[1], b[2]), name) for name, b in blocks.items()),
+                reverse=True
+            )
+            chosen: List[str] = [name for name in self.always_include if name in blocks]
+            picked = 0
+            for score, name in ranked:
+                if picked >= self.top_k or score <= 0:
+                    break
+                if name not in chosen:
+                    chosen.append(name)
+                    picked += 1
+
+            # Tablas referenciadas por FK, para que los JOIN sigan siendo posibles
+            for name in list(chosen):
+                for target in blocks[name][3]:
+                    if target in blocks and target not in chosen:
+                        chosen.append(target)
+
+            selected_text = header + "\n\n" + "\n\n".join(blocks[n][0] for n in chosen) + "\n"
+
+        with self._lock:
+            self.calls += 1
+            self.chars_full += len(schema)
+            self.chars_selected += len(selected_text)
+        return selected_text
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "top_k": self.top_k,
+                "calls": self.calls,
+                "avg_chars_full": round(self.chars_full / self.calls) if self.calls else 0,
+                "avg_chars_selected": round(self.chars_selected / self.calls) if self.calls else 0,
+                "reduction": round(1 - self.chars_selected / self.chars_full, 3) if self.chars_full else 0.0,
+            }
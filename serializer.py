@@ -0,0 +1,95 @@
+"""
+Serialización JSON de resultados de la BD
+
+Convierte Decimal, fechas y demás tipos no nativos columna por columna
+(en lugar de pasar cada valor por `JSONEncoder.default`) y usa orjson
+si está instalado.
+"""
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from tools.bounded import QueryResult
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+BACKEND = "orjson" if orjson else "json"
+
+_NATIVE = (str, int, float, bool, type(None))
+
+
+def _to_native(value: Any) -> Any:
+    """Conversión valor a valor, para columnas con tipos mezclados"""
+    if isinstance(value, _NATIVE):
+        return value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", errors="replace")
+    return str(value)
+
+
+def _column_converter(values: Sequence[Any]) -> Optional[Callable[[Any], Any]]:
+    """Conversión para toda la columna, o None si ya es nativa"""
+    kinds = {type(v) for v in values}
+    kinds.discard(type(None))
+    if not kinds or all(issubclass(k, _NATIVE) for k in kinds):
+        return None
+    if kinds == {Decimal}:
+        return float
+    if kinds <= {date, datetime, time}:
+        return lambda v: v.isoformat()
+    if kinds == {timedelta}:
+        return str
+    return _to_native
+
+
+def convert_columns(columns: List[Sequence[Any]]) -> List[Sequence[Any]]:
+    """Convierte cada columna a tipos JSON nativos (None se conserva)"""
+    converted = []
+    for values in columns:
+        convert = _column_converter(values)
+        if convert is None:
+            converted.append(values)
+        else:
+            converted.append([None if v is None else convert(v) for v in values])
+    return converted
+
+
+def native_rows(result: QueryResult) -> List[List[Any]]:
+    """Filas de `result` con los valores ya convertidos a tipos JSON"""
+    if not result.rows:
+        return []
+    return [list(row) for row in zip(*convert_columns(result.column_values()))]
+
+
+def columnar(results: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Forma columnar para el wire format de tablas y gráficos:
+    {"columns": [...], "types": [...], "rows": [[...], ...]}
+    """
+    result = QueryResult.from_dicts(results)
+    return {"columns": result.columns, "types": result.types, "rows": native_rows(result)}
+
+
+def records(results: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Lista de dicts con los valores convertidos (para el prompt del LLM o NDJSON)"""
+    result = QueryResult.from_dicts(results)
+    columns = result.columns
+    return [dict(zip(columns, row)) for row in native_rows(result)]
+
+
+def dumps(obj: Any) -> str:
+    """JSON compacto; los resultados deben pasar antes por `columnar` o `records`"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode("utf-8")
+        except TypeError:
+            pass  # Tipo no soportado por orjson: se usa el camino lento
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_to_native)
@@ -0,0 +1,113 @@
+"""
+Almacén de sesiones de conversación del agente
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+DEFAULT_SESSION = "default"
+
+
+class SessionStore:
+    """
+    Historial de conversación por sesión, con memoria acotada.
+
+    - Cada sesión guarda como máximo `max_messages` mensajes.
+    - Las sesiones inactivas más de `idle_ttl` segundos se descartan.
+    - Si se supera `max_sessions` o el tope global de caracteres
+      (`max_total_chars`), se expulsan las sesiones usadas hace más tiempo (LRU).
+    """
+
+    def __init__(
+        self,
+        max_messages: int = 10,
+        max_sessions: int = 1000,
+        idle_ttl: float = 1800.0,
+        max_total_chars: int = 5_000_000
+    ):
+        self.max_messages = max_messages
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_total_chars = max_total_chars
+
+        # session_id -> {"messages": [...], "chars": int, "last_seen": float}
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._total_chars = 0
+        self._lock = threading.Lock()
+
+        self.created = 0
+        self.evicted_lru = 0
+        self.evicted_idle = 0
+
+    def _touch(self, session_id: str) -> Dict[str, Any]:
+        """Devuelve la sesión (creándola si no existe) y la marca como reciente"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = {"messages": [], "chars": 0, "last_seen": 0.0}
+            self._sessions[session_id] = session
+            self.created += 1
+        else:
+            self._sessions.move_to_end(session_id)
+        session["last_seen"] = time.monotonic()
+        return session
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id)
+        self._total_chars -= session["chars"]
+
+    def _evict(self, keep: str):
+        """Aplica el TTL de inactividad y los topes globales"""
+        now = time.monotonic()
+        # Las sesiones están en orden LRU: las inactivas están al principio
+        for sid in list(self._sessions):
+            if sid == keep or now - self._sessions[sid]["last_seen"] <= self.idle_ttl:
+                break
+            self._drop(sid)
+            self.evicted_idle += 1
+
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self._total_chars > self.max_total_chars
+        ):
+            oldest = next(iter(self._sessions))
+            if oldest == keep:
+                break
+            self._drop(oldest)
+            self.evicted_lru += 1
+
+    def append(self, session_id: str, role: str, content: str):
+        """Agrega un mensaje al historial de la sesión"""
+        with self._lock:
+            session = self._touch(session_id)
+            session["messages"].append({"role": role, "content": content})
+            session["chars"] += len(content)
+            self._total_chars += len(content)
+
+            while len(session["messages"]) > self.max_messages:
+                removed = session["messages"].pop(0)
+                session["chars"] -= len(removed["content"])
+                self._total_chars -= len(removed["content"])
+
+            self._evict(keep=session_id)
+
+    def history(self, session_id: str) -> List[Dict[str, str]]:
+        """Copia del historial de la sesión (segura para usar fuera del lock)"""
+        with self._lock:
+            return list(self._touch(session_id)["messages"])
+
+    def clear(self, session_id: str):
+        """Borra el historial de una sesión"""
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de sesiones activas, memoria y expulsiones"""
+        with self._lock:
+            return {
+                "active_sessions": len(self._sessions),
+                "total_chars": self._total_chars,
+                "created": self.created,
+                "evicted_lru": self.evicted_lru,
+                "evicted_idle": self.evicted_idle,
+            }
@@ -0,0 +1,123 @@
+"""
+Caché pregunta → SQL del agente
+"""
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Palabras que delatan una pregunta de seguimiento ("lístalos", "y de esos...")
+_FOLLOW_UP_WORDS = {
+    "esos", "esas", "estos", "estas", "ellos", "ellas", "aquellos", "aquellas",
+    "anterior", "anteriores", "mismo", "misma", "mismos", "mismas", "tambien",
+    "ademas", "eso", "esto", "ese", "esa",
+}
+# Verbos con pronombre enclítico: listalos, muestralas, ordenalos, damelo...
+_ENCLITIC = re.compile(r"\b\w+(?:alos|alas|elos|elas|amelo|amela|amelos|amelas)\b")
+
+
+def normalize_question(question: str) -> str:
+    """Minúsculas, sin tildes, sin signos de puntuación y con espacios colapsados"""
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w%]+", " ", text)
+    return " ".join(text.split())
+
+
+def is_follow_up(question: str, history: List[Dict[str, str]]) -> bool:
+    """
+    ¿La pregunta depende de la conversación previa?
+
+    Solo puede serlo si ya hubo una respuesta del asistente en la sesión.
+    """
+    if not any(m["role"] == "assistant" for m in history):
+        return False
+
+    normalized = normalize_question(question)
+    words = normalized.split()
+    if normalized.startswith("y ") or len(words) <= 1:
+        return True
+    if _FOLLOW_UP_WORDS.intersection(words):
+        return True
+    return bool(_ENCLITIC.search(normalized))
+
+
+class SQLCache:
+    """
+    Caché LRU de SQL ya validado (que se ejecutó sin error).
+
+    La llave es la pregunta normalizada más la huella de la estructura
+    del esquema, así un cambio de DDL invalida todo automáticamente.
+    """
+
+    def __init__(self, max_entries: int = 500):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        # Latencia media de generar SQL con el LLM (media móvil exponencial)
+        self._llm_latency_avg = 0.0
+        self.saved_llm_seconds = 0.0
+
+    @staticmethod
+    def key(question: str, fingerprint: Optional[str]) -> Optional[str]:
+        if fingerprint is None:
+            return None
+        return f"{fingerprint}:{normalize_question(question)}"
+
+    def get(self, key: Optional[str]) -> Optional[str]:
+        with self._lock:
+            sql = self._entries.get(key) if key else None
+            if sql is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_llm_seconds += self._llm_latency_avg
+            return sql
+
+    def put(self, key: Optional[str], sql: str):
+        if not key:
+            return
+        with self._lock:
+            self._entries[key] = sql
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key: Optional[str]):
+        """Elimina una entrada (p. ej. si el SQL cacheado dejó de funcionar)"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def record_llm_latency(self, seconds: float):
+        """Registra cuánto tardó una generación de SQL con el LLM"""
+        with self._lock:
+            if self._llm_latency_avg == 0.0:
+                self._llm_latency_avg = seconds
+            else:
+                self._llm_latency_avg = 0.8 * self._llm_latency_avg + 0.2 * seconds
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "llm_latency_avg_ms": round(self._llm_latency_avg * 1000, 1),
+                "saved_llm_seconds": round(self.saved_llm_seconds, 2),
+            }
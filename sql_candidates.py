@@ -0,0 +1,255 @@
+"""
+Generación de SQL con varios candidatos en paralelo
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class SQLCandidates:
+    """
+    Carrera de candidatos de SQL: gana el primero que pasa la validación
+    barata (EXPLAIN, sin ejecutar la consulta).
+
+    - Se pide un candidato. Si no ha llegado cuando ya pasó el percentil
+      `hedge_percentile` de la latencia medida de Gemini, se piden más
+      (hasta `fan_out` en vuelo): la cola lenta deja de marcar la
+      latencia y, como ~90% de los primeros llega a tiempo, el costo
+      medio casi no cambia. Mientras no hay `min_samples` mediciones se
+      espera `hedge_ms`.
+    - Si un candidato no pasa la validación, se pide su corrección en el
+      acto (con el error y el esquema que ya se tenía), mientras los
+      demás candidatos siguen en curso. Cada SQL inválido distinto se
+      corrige una sola vez.
+    - Si ninguno es válido, se devuelve el último: el ciclo de corrección
+      normal del agente se encarga del error.
+
+    Con `fan_out=1` no se usa (el agente genera y corrige en serie).
+    """
+
+    def __init__(
+        self,
+        fan_out: int = 1,
+        hedge_ms: float = 8000.0,
+        hedge_percentile: float = 90.0,
+        min_samples: int = 20,
+        max_samples: int = 200,
+        max_corrections: Optional[int] = None
+    ):
+        """
+        Args:
+            fan_out: Candidatos simultáneos como máximo (1 = desactivado)
+            hedge_ms: Espera antes de pedir otro candidato mientras no hay
+                suficientes mediciones (0 = todos a la vez, siempre)
+            hedge_percentile: Percentil de la latencia medida que se espera
+                antes de pedir otro candidato (0 = usar siempre `hedge_ms`)
+            min_samples: Mediciones necesarias para usar el percentil
+            max_samples: Mediciones recientes que se conservan
+            max_corrections: Correcciones especulativas por pregunta (por defecto `fan_out`)
+        """
+        self.fan_out = max(1, fan_out)
+        self.hedge_ms = hedge_ms
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = max(1, min_samples)
+        self.max_corrections = self.fan_out if max_corrections is None else max_corrections
+        # Latencias (ms) de las generaciones que terminaron
+        self._latencies: "deque[float]" = deque(maxlen=max_samples)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        self.races = 0
+        self.requests = 0
+        self.hedges = 0
+        self.corrections = 0
+        self.invalid = 0
+        self.no_valid = 0
+        self.wins: Dict[str, int] = {"first": 0, "hedge": 0, "correction": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.fan_out > 1
+
+    def _count(self, **amounts: int):
+        with self._lock:
+            for name, amount in amounts.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def _win(self, kind: str):
+        with self._lock:
+            self.wins[kind] += 1
+
+    def _record_latency(self, start: float):
+        with self._lock:
+            self._latencies.append((time.perf_counter() - start) * 1000)
+
+    def _timed(self, generate: Callable[[], str]) -> str:
+        start = time.perf_counter()
+        sql = generate()
+        self._record_latency(start)
+        return sql
+
+    async def _timed_async(self, generate: Callable[[], Awaitable[str]]) -> str:
+        # Las generaciones canceladas (perdieron la carrera) no se miden
+        start = time.perf_counter()
+        sql = await generate()
+        self._record_latency(start)
+        return sql
+
+    def hedge_delay_ms(self) -> float:
+        """Espera actual antes de pedir otro candidato: percentil medido, o `hedge_ms`"""
+        if not self.hedge_ms or not self.hedge_percentile:
+            return self.hedge_ms
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.hedge_ms
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, max(0, math.ceil(self.hedge_percentile / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def _next_hedge(self, launched: int, last_launch: float, delay_ms: float) -> Optional[float]:
+        """Segundos hasta el siguiente candidato de respaldo (None si ya no hay más)"""
+        if launched >= self.fan_out:
+            return None
+        return max(0.0, last_launch + delay_ms / 1000 - time.perf_counter())
+
+    def race(
+        self,
+        generate: Callable[[], str],
+        correct: Callable[[str, str], str],
+        validate: Callable[[str], Optional[str]]
+    ) -> str:
+        """
+        Versión síncrona (hilos). `validate(sql)` devuelve None si el SQL
+        es válido o el motivo; `correct(sql, error)` pide la corrección.
+        Los candidatos que pierden terminan en segundo plano y se ignoran.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.fan_out + self.max_corrections, thread_name_prefix="sql-candidate"
+                )
+        self._count(races=1, requests=1)
+        delay_ms = self.hedge_delay_ms()
+        pending = {self._executor.submit(self._timed, generate): "first"}
+        launched, last_launch = 1, time.perf_counter()
+        corrections = 0
+        # Un mismo SQL inválido (p. ej. el respaldo repitió al primero) se corrige una vez
+        corrected = set()
+        last: Optional[Tuple[str, Any]] = None
+
+        while pending:
+            timeout = self._next_hedge(launched, last_launch, delay_ms)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                pending[self._executor.submit(self._timed, generate)] = "hedge"
+                launched, last_launch = launched + 1, time.perf_counter()
+                self._count(requests=1, hedges=1)
+                continue
+            for future in done:
+                kind = pending.pop(future)
+                try:
+                    sql = future.result()
+                except Exception as e:
+                    print(f"⚠️  Candidato de SQL ({kind}) falló: {e}")
+                    last = last or (None, e)
+                    continue
+                error = validate(sql)
+                if error is None:
+                    self._win(kind)
+                    return sql
+                print(f"🔁 Candidato inválido ({kind}): {error}")
+                self._count(invalid=1)
+                last = (sql, error)
+                if corrections < self.max_corrections and sql not in corrected:
+                    corrected.add(sql)
+                    pending[self._executor.submit(correct, sql, error)] = "correction"
+                    corrections += 1
+                    self._count(requests=1, corrections=1)
+
+        return self._give_up(last)
+
+    async def race_async(
+        self,
+        generate: Callable[[], Awaitable[str]],
+        correct: Callable[[str, str], Awaitable[str]],
+        validate: Callable[[str], Awaitable[Optional[str]]]
+    ) -> str:
+        """Versión asíncrona: los candidatos que pierden se cancelan"""
+        self._count(races=1, requests=1)
+        delay_ms = self.hedge_delay_ms()
+        pending = {asyncio.ensure_future(self._timed_async(generate)): "first"}
+        launched, last_launch = 1, time.perf_counter()
+        corrections = 0
+        # Un mismo SQL inválido (p. ej. el respaldo repitió al primero) se corrige una vez
+        corrected = set()
+        last: Optional[Tuple[str, Any]] = None
+
+        try:
+            while pending:
+                timeout = self._next_hedge(launched, last_launch, delay_ms)
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    pending[asyncio.ensure_future(self._timed_async(generate))] = "hedge"
+                    launched, last_launch = launched + 1, time.perf_counter()
+                    self._count(requests=1, hedges=1)
+                    continue
+                for task in done:
+                    kind = pending.pop(task)
+                    try:
+                        sql = task.result()
+                    except Exception as e:
+                        print(f"⚠️  Candidato de SQL ({kind}) falló: {e}")
+                        last = last or (None, e)
+                        continue
+                    error = await validate(sql)
+                    if error is None:
+                        self._win(kind)
+                        return sql
+                    print(f"🔁 Candidato inválido ({kind}): {error}")
+                    self._count(invalid=1)
+                    last = (sql, error)
+                    if corrections < self.max_corrections and sql not in corrected:
+                        corrected.add(sql)
+                        pending[asyncio.ensure_future(correct(sql, error))] = "correction"
+                        corrections += 1
+                        self._count(requests=1, corrections=1)
+        finally:
+            for task in pending:
+                task.cancel()
+
+        return self._give_up(last)
+
+    def _give_up(self, last: Optional[Tuple[Optional[str], Any]]) -> str:
+        """Ningún candidato válido: el último inválido, o el error si todos fallaron"""
+        self._count(no_valid=1)
+        sql, error = last
+        if sql is None:
+            raise error
+        return sql
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        hedge_ms = self.hedge_delay_ms()
+        with self._lock:
+            return {
+                "fan_out": self.fan_out,
+                "hedge_ms": round(hedge_ms, 1),
+                "latency_samples": len(self._latencies),
+                "races": self.races,
+                "llm_requests": self.requests,
+                "requests_per_race": round(self.requests / self.races, 2) if self.races else 0.0,
+                "hedges": self.hedges,
+                "speculative_corrections": self.corrections,
+                "invalid_candidates": self.invalid,
+                "no_valid": self.no_valid,
+                "wins_first": self.wins["first"],
+                "wins_hedge": self.wins["hedge"],
+                "wins_correction": self.wins["correction"],
+            }
@@ -0,0 +1,158 @@
+"""
+Utilidades para ejecutar SELECT generados por el LLM con límites de filas y bytes
+"""
+import re
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# LIMIT al final de la consulta: "LIMIT n", "LIMIT n OFFSET m" o "LIMIT m, n"
+_TRAILING_LIMIT = re.compile(
+    r"\bLIMIT\s+(\d+)(?:\s*,\s*(\d+)|\s+OFFSET\s+(\d+))?\s*$",
+    re.IGNORECASE,
+)
+
+
+def _type_name(values: Iterable[Any]) -> str:
+    """Nombre del tipo Python del primer valor no nulo de la columna"""
+    for value in values:
+        if value is not None:
+            return type(value).__name__.lower()
+    return "null"
+
+
+class QueryResult(Sequence):
+    """
+    Resultado columnar: `columns`, filas como tuplas y tipos por columna.
+
+    Guardar tuplas evita repetir los nombres de columna en cada fila. Para
+    el resto del agente se sigue comportando como una lista de dicts
+    (`results[0]["col"]`, `for row in results`, `len(results)`), armando
+    cada dict al vuelo. `truncated` y `total_estimate` indican si el
+    resultado fue cortado por los topes de lectura.
+    """
+
+    def __init__(
+        self,
+        columns: Iterable[str],
+        rows: Iterable[Tuple[Any, ...]] = (),
+        truncated: bool = False,
+        total_estimate: Optional[int] = None
+    ):
+        self.columns = list(columns)
+        self.rows = list(rows)
+        self.truncated = truncated
+        self.total_estimate = total_estimate
+        self._types: Optional[List[str]] = None
+
+    @classmethod
+    def from_dicts(cls, rows: List[Dict[str, Any]]) -> "QueryResult":
+        """Convierte una lista de dicts (formato anterior) a QueryResult"""
+        if isinstance(rows, QueryResult):
+            return rows
+        columns = list(rows[0].keys()) if rows else []
+        return cls(columns, (tuple(row.get(c) for c in columns) for row in rows))
+
+    @property
+    def types(self) -> List[str]:
+        if self._types is None:
+            self._types = [_type_name(values) for values in self.column_values()]
+        return self._types
+
+    def column(self, name: str) -> List[Any]:
+        """Valores de una columna"""
+        index = self.columns.index(name)
+        return [row[index] for row in self.rows]
+
+    def column_values(self) -> List[Tuple[Any, ...]]:
+        """Todas las columnas (transpuesta de las filas)"""
+        if not self.rows:
+            return [() for _ in self.columns]
+        return list(zip(*self.rows))
+
+    def head(self, n: int) -> "QueryResult":
+        return QueryResult(self.columns, self.rows[:n], self.truncated, self.total_estimate)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [dict(zip(self.columns, row)) for row in self.rows[index]]
+        return dict(zip(self.columns, self.rows[index]))
+
+    def __iter__(self):
+        columns = self.columns
+        for row in self.rows:
+            yield dict(zip(columns, row))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, QueryResult):
+            return self.columns == other.columns and self.rows == other.rows
+        return list(self) == other
+
+    def __repr__(self) -> str:
+        return f"QueryResult(columns={self.columns!r}, rows={len(self.rows)}, truncated={self.truncated})"
+
+
+def apply_row_limit(sql: str, max_rows: int) -> str:
+    """
+    Asegura que el SELECT no devuelva más de `max_rows + 1` filas.
+
+    La fila extra permite saber si el resultado fue truncado. Si la
+    consulta ya tiene un LIMIT menor, se respeta.
+    """
+    sql = sql.strip().rstrip(";").strip()
+    cap = max_rows + 1
+
+    match = _TRAILING_LIMIT.search(sql)
+    if not match:
+        return f"{sql}\nLIMIT {cap}"
+
+    if match.group(2) is not None:
+        # LIMIT offset, count
+        offset, count = int(match.group(1)), int(match.group(2))
+        if count <= cap:
+            return sql
+        return f"{sql[:match.start()]}LIMIT {offset}, {cap}"
+
+    count = int(match.group(1))
+    if count <= cap:
+        return sql
+    offset = f" OFFSET {match.group(3)}" if match.group(3) is not None else ""
+    return f"{sql[:match.start()]}LIMIT {cap}{offset}"
+
+
+def row_size(row: Tuple[Any, ...]) -> int:
+    """Tamaño aproximado de una fila en bytes (para el presupuesto de memoria)"""
+    return sum(len(str(v)) + 8 for v in row) + 16
+
+
+def fetch_bounded(cursor, max_rows: int, max_bytes: int, batch_size: int = 200) -> QueryResult:
+    """
+    Lee filas (tuplas) con `fetchmany` hasta agotar el resultado o los presupuestos
+
+    Args:
+        cursor: Cursor ya ejecutado (de tuplas, no de diccionarios)
+        max_rows: Máximo de filas a devolver (0 = sin límite)
+        max_bytes: Máximo aproximado de bytes a devolver (0 = sin límite)
+    """
+    columns = [desc[0] for desc in cursor.description]
+    rows: List[Tuple[Any, ...]] = []
+    size = 0
+    truncated = False
+
+    while not truncated:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+        for row in batch:
+            if max_rows and len(rows) >= max_rows:
+                truncated = True
+                break
+            size += row_size(row)
+            if max_bytes and size > max_bytes and rows:
+                truncated = True
+                break
+            rows.append(tuple(row))
+
+    return QueryResult(columns, rows, truncated=truncated)
@@ -0,0 +1,251 @@
+"""
+Pool de conexiones MySQL seguro para hilos
+"""
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Sequence
+
+import mysql.connector
+from mysql.connector import errors
+
+
+class PoolTimeout(errors.PoolError):
+    """No se liberó ninguna conexión dentro del tiempo de espera"""
+
+
+# Errores que indican que la conexión quedó inservible y no debe volver al pool
+DISCONNECT_ERRORS = (errors.OperationalError, errors.InterfaceError)
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones con tamaño fijo.
+
+    Cada operación toma una conexión con `connection()` y la devuelve al
+    terminar. Al entregarla se verifica con un ping (si estuvo inactiva más
+    de `health_check_interval` segundos) y se reconecta si se cayó.
+    """
+
+    def __init__(
+        self,
+        connection_params: Dict[str, Any],
+        size: int = 5,
+        timeout: float = 10.0,
+        health_check_interval: float = 30.0,
+        init_statements: Sequence[str] = (),
+        on_new_session: Optional[Callable[[Any], None]] = None
+    ):
+        """
+        Args:
+            connection_params: Parámetros para mysql.connector.connect
+            size: Número máximo de conexiones abiertas
+            timeout: Segundos máximos esperando una conexión libre
+            health_check_interval: Inactividad (s) a partir de la cual se hace ping
+            init_statements: Sentencias que se ejecutan en cada sesión nueva
+                (ej. "SET SESSION max_execution_time = 30000")
+            on_new_session: Se llama con la conexión cuando el ping reconecta:
+                lo que dependía de la sesión anterior (p. ej. sentencias
+                preparadas) ya no existe en el servidor
+        """
+        if size < 1:
+            raise ValueError("El tamaño del pool debe ser al menos 1")
+
+        self.connection_params = connection_params
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.init_statements = list(init_statements)
+        self.on_new_session = on_new_session
+
+        # LIFO: se reutilizan primero las conexiones más "calientes"
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+        # Estadísticas
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._discarded = 0
+
+    def _new_connection(self):
+        conn = mysql.connector.connect(**self.connection_params)
+        try:
+            self._init_session(conn)
+        except mysql.connector.Error:
+            self._close_quietly(conn)
+            raise
+        return conn
+
+    def _init_session(self, conn):
+        """Aplica `init_statements` (las variables de sesión se pierden al reconectar)"""
+        if not self.init_statements:
+            return
+        cursor = conn.cursor()
+        try:
+            for statement in self.init_statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    def _acquire(self):
+        if self._closed:
+            raise errors.PoolError("El pool de conexiones está cerrado")
+
+        start = time.perf_counter()
+        waited = False
+        try:
+            conn, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+
+            if can_create:
+                try:
+                    conn = self._new_connection()
+                except mysql.connector.Error:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+                last_used = time.monotonic()
+            else:
+                waited = True
+                try:
+                    conn, last_used = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeout(
+                        f"Sin conexiones libres tras {self.timeout}s (pool de {self.size})"
+                    )
+
+        # Health-check: solo si la conexión estuvo inactiva un buen rato
+        if time.monotonic() - last_used > self.health_check_interval:
+            conn = self._ensure_alive(conn)
+
+        wait = time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+        return conn
+
+    def _ensure_alive(self, conn):
+        """Hace ping; si falla, reemplaza la conexión por una nueva"""
+        try:
+            session = conn.connection_id
+            conn.ping(reconnect=True, attempts=2, delay=0)
+            if conn.connection_id != session:
+                # ping reconectó: es una sesión nueva
+                self._init_session(conn)
+                if self.on_new_session:
+                    self.on_new_session(conn)
+            return conn
+        except mysql.connector.Error:
+            pass
+
+        self._close_quietly(conn)
+        try:
+            conn = self._new_connection()
+        except mysql.connector.Error:
+            with self._lock:
+                self._created -= 1
+            raise
+        with self._lock:
+            self._reconnects += 1
+        return conn
+
+    def _release(self, conn, broken: bool = False):
+        with self._lock:
+            self._in_use -= 1
+
+        if broken or self._closed:
+            self._discard(conn)
+            return
+
+        try:
+            # No dejar transacciones abiertas entre usos (solo las escrituras
+            # las abren si la conexión va en autocommit; el flag es local)
+            if conn.in_transaction:
+                conn.rollback()
+        except mysql.connector.Error:
+            self._discard(conn)
+            return
+
+        self._idle.put((conn, time.monotonic()))
+
+    def _discard(self, conn):
+        self._close_quietly(conn)
+        with self._lock:
+            self._created -= 1
+            self._discarded += 1
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """
+        Toma una conexión del pool durante el bloque `with`
+
+        Ejemplo:
+            with pool.connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+        """
+        conn = self._acquire()
+        broken = False
+        try:
+            yield conn
+        except DISCONNECT_ERRORS:
+            broken = True
+            raise
+        except GeneratorExit:
+            # Un consumidor abandonó a medias un resultado en streaming: la
+            # conexión quedó con filas sin leer y no se puede reutilizar
+            broken = True
+            raise
+        finally:
+            self._release(conn, broken=broken)
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de uso del pool"""
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_avg_ms": round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+                "timeouts": self._timeouts,
+                "reconnects": self._reconnects,
+                "discarded": self._discarded,
+            }
+
+    def close(self):
+        """Cierra todas las conexiones inactivas; las que estén en uso se cierran al liberarse"""
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
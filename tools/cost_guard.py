@@ -0,0 +1,176 @@
+"""
+Control de costo de los SELECT antes de ejecutarlos (EXPLAIN FORMAT=JSON)
+"""
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class QueryPlan:
+    """Lo que interesa del plan de MySQL: costo, filas estimadas y accesos caros"""
+
+    def __init__(self, cost: float, rows: int, full_scans: List[Tuple[str, int]], cross_joins: List[str]):
+        self.cost = cost
+        self.rows = rows
+        # (tabla, filas) de los recorridos completos (access_type ALL)
+        self.full_scans = full_scans
+        # Tablas unidas sin ninguna condición (producto cartesiano)
+        self.cross_joins = cross_joins
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _walk(node: Any) -> Iterator[Dict[str, Any]]:
+    """Todos los diccionarios del plan (subconsultas, uniones y vistas incluidas)"""
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def parse_plan(plan: Dict[str, Any]) -> QueryPlan:
+    """
+    Resume la salida de EXPLAIN FORMAT=JSON.
+
+    - costo: el mayor `query_cost` del plan (el del bloque principal, o el
+      de cada parte de un UNION)
+    - filas: lo máximo que produce o examina una tabla (`rows_produced_per_join`
+      ya acumula las filas de los JOIN anteriores)
+    """
+    cost = 0.0
+    rows = 0
+    full_scans: List[Tuple[str, int]] = []
+    cross_joins: List[str] = []
+
+    for node in _walk(plan):
+        cost_info = node.get("cost_info")
+        if isinstance(cost_info, dict) and "query_cost" in cost_info:
+            cost = max(cost, _number(cost_info["query_cost"]))
+
+        loop = node.get("nested_loop")
+        if isinstance(loop, list):
+            for position, step in enumerate(loop):
+                table = step.get("table") if isinstance(step, dict) else None
+                if (
+                    isinstance(table, dict) and position > 0
+                    and table.get("access_type") == "ALL" and "attached_condition" not in table
+                ):
+                    cross_joins.append(table.get("table_name", "?"))
+
+        table = node.get("table")
+        if isinstance(table, dict) and "table_name" in table:
+            examined = int(_number(table.get("rows_examined_per_scan")))
+            produced = int(_number(table.get("rows_produced_per_join")))
+            rows = max(rows, examined, produced)
+            if table.get("access_type") == "ALL":
+                full_scans.append((table["table_name"], examined))
+
+    return QueryPlan(cost, rows, full_scans, cross_joins)
+
+
+class CostGuard:
+    """
+    Rechaza los SELECT cuyo plan estimado supera los topes de filas o de
+    costo, antes de que ocupen el servidor durante minutos.
+
+    El motivo del rechazo describe el problema (recorridos completos,
+    JOIN sin condición) y vuelve al agente como un error de la consulta,
+    así el ciclo de corrección le pide a Gemini una consulta más barata.
+
+    El veredicto de cada SQL se recuerda (LRU de `max_entries`): las
+    consultas repetidas no pagan un EXPLAIN por ejecución.
+    """
+
+    def __init__(self, max_rows: int = 5_000_000, max_cost: float = 1_000_000.0, max_entries: int = 256):
+        """
+        Args:
+            max_rows: Filas estimadas máximas (0 = sin tope)
+            max_cost: `query_cost` máximo del optimizador (0 = sin tope)
+            max_entries: Veredictos que se recuerdan
+        """
+        self.max_rows = max_rows
+        self.max_cost = max_cost
+        self.max_entries = max_entries
+        # sql -> (motivo del rechazo o None, filas estimadas)
+        self._verdicts: "OrderedDict[str, Tuple[Optional[str], int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.checks = 0
+        self.cached = 0
+        self.rejected = 0
+        self.explain_errors = 0
+
+    def check(self, sql: str, explain) -> Tuple[Optional[str], Optional[int]]:
+        """
+        Devuelve (motivo del rechazo o None, filas estimadas).
+
+        `explain(sql)` debe devolver el JSON de EXPLAIN FORMAT=JSON; si
+        falla, la consulta se deja pasar (su propio error llegará al ejecutarla).
+        """
+        with self._lock:
+            verdict = self._verdicts.get(sql)
+            if verdict is not None:
+                self._verdicts.move_to_end(sql)
+                self.cached += 1
+                if verdict[0]:
+                    self.rejected += 1
+                return verdict
+
+        try:
+            plan = parse_plan(json.loads(explain(sql)))
+        except Exception:
+            with self._lock:
+                self.explain_errors += 1
+            return None, None
+
+        verdict = (self.reason(plan), plan.rows)
+        with self._lock:
+            self.checks += 1
+            if verdict[0]:
+                self.rejected += 1
+            self._verdicts[sql] = verdict
+            while len(self._verdicts) > self.max_entries:
+                self._verdicts.popitem(last=False)
+        return verdict
+
+    def reason(self, plan: QueryPlan) -> Optional[str]:
+        """Motivo del rechazo (en términos útiles para corregir la consulta), o None"""
+        problems = []
+        if self.max_rows and plan.rows > self.max_rows:
+            problems.append(f"~{plan.rows:,} filas estimadas (máximo {self.max_rows:,})")
+        if self.max_cost and plan.cost > self.max_cost:
+            problems.append(f"costo estimado {plan.cost:,.0f} (máximo {self.max_cost:,.0f})")
+        if not problems:
+            return None
+
+        details = []
+        if plan.cross_joins:
+            details.append(f"JOIN sin condición (producto cartesiano) con {', '.join(sorted(set(plan.cross_joins)))}")
+        if plan.full_scans:
+            scans = ", ".join(f"{table} (~{rows:,} filas)" for table, rows in plan.full_scans)
+            details.append(f"recorrido completo de {scans}")
+        return (
+            "Consulta rechazada por el control de costo: " + "; ".join(problems + details)
+            + ". Agrega condiciones de JOIN, filtra (WHERE) por columnas indexadas o por fecha, "
+            "o agrega los datos (GROUP BY) en lugar de leer todas las filas."
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_rows": self.max_rows,
+                "max_cost": self.max_cost,
+                "checks": self.checks,
+                "cached": self.cached,
+                "rejected": self.rejected,
+                "explain_errors": self.explain_errors,
+            }
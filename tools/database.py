@@ -2,19 +2,92 @@
 Herramienta para trabajar con bases de datos
 """
 import sqlite3
-from typing import List, Dict, Any
+import threading
+import time
+from typing import List, Dict, Any, Callable, Iterator, Optional, Sequence
+
+from tools.bounded import QueryResult, apply_row_limit, fetch_bounded
+from tools.prepared_cache import PreparedStatementCache
+from tools.schema_cache import SchemaCache, make_fingerprint
+from tools.sql_template import parameterize
+from tools.write_batch import BatchInput, check_batch, normalize_batch, write_summary
+
+
+def _is_binding_error(error: sqlite3.Error) -> bool:
+    """
+    Error al pasar los parámetros de la plantilla (tipo no soportado,
+    número de parámetros): con los literales la consulta sí puede correr.
+    Un SQL inválido o un timeout fallarían igual, así que se propagan.
+    """
+    if isinstance(error, sqlite3.InterfaceError):
+        return True
+    return isinstance(error, sqlite3.ProgrammingError) and "binding" in str(error).lower()
 
 
 class DatabaseTool:
     """Herramienta para consultar bases de datos"""
     
-    def __init__(self, db_path: str):
+    def __init__(
+        self,
+        db_path: str,
+        schema_cache_ttl: float = 300.0,
+        max_result_rows: int = 1000,
+        max_result_bytes: int = 2 * 1024 * 1024,
+        prepared_statements: bool = True,
+        prepared_cache_size: int = 64,
+        max_execution_ms: int = 30000
+    ):
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
+        self.max_result_rows = max_result_rows
+        self.max_result_bytes = max_result_bytes
+        # La conexión se usa desde los hilos de la API (asyncio.to_thread),
+        # así que se permite cualquier hilo y se serializa con un lock.
+        # sqlite3 guarda compiladas las últimas `cached_statements` sentencias (por texto)
+        self.conn = sqlite3.connect(
+            db_path, check_same_thread=False, cached_statements=prepared_cache_size
+        )
+        self.prepared: Optional[PreparedStatementCache] = (
+            PreparedStatementCache(prepared_cache_size) if prepared_statements else None
+        )
         self.cursor = self.conn.cursor()
+        self._lock = threading.RLock()
+        self.schema_cache = SchemaCache(ttl=schema_cache_ttl)
+        # En SQLite schema_version ya solo cambia con DDL
+        self.structure_fingerprint = None
+        self._write_listeners: List[Callable[[List[str]], None]] = []
+        # Tiempo máximo de un SELECT (como MAX_EXECUTION_TIME en MySQL): el
+        # progress handler cancela la sentencia al pasar el plazo
+        self.max_execution_ms = max_execution_ms
+        self._deadline: Optional[float] = None
+        if max_execution_ms:
+            self.conn.set_progress_handler(self._past_deadline, 1000)
     
     def get_schema(self) -> str:
-        """Obtiene el esquema de la BD"""
+        """Obtiene el esquema de la BD (cacheado mientras no cambie schema_version)"""
+        with self._lock:
+            return self.schema_cache.get(self.schema_fingerprint, self._build_schema)
+    
+    def schema_fingerprint(self) -> str:
+        """Huella del esquema: SQLite incrementa schema_version en cada cambio de DDL"""
+        with self._lock:
+            self.cursor.execute("PRAGMA schema_version;")
+            self.structure_fingerprint = make_fingerprint(self.cursor.fetchone()[0])
+            return self.structure_fingerprint
+    
+    def invalidate_schema(self):
+        """Fuerza a reconstruir el esquema en la próxima llamada a get_schema"""
+        self.schema_cache.invalidate()
+    
+    def add_write_listener(self, listener: Callable[[List[str]], None]):
+        """Registra una función que recibe las sentencias de cada escritura confirmada"""
+        self._write_listeners.append(listener)
+    
+    def _past_deadline(self) -> bool:
+        """Progress handler de SQLite: si devuelve True, la sentencia en curso se cancela"""
+        return self._deadline is not None and time.perf_counter() > self._deadline
+    
+    def _build_schema(self) -> str:
+        """Renderiza el esquema completo como texto"""
         self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
         tables = self.cursor.fetchall()
         
@@ -29,25 +102,161 @@ class DatabaseTool:
         
         return schema
     
-    def execute(self, sql: str) -> List[Dict[str, Any]]:
+    def execute(
+        self,
+        sql: str,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Ejecuta SQL y retorna resultados
+        Ejecuta SQL y retorna resultados (lectura acotada, ver MySQLTool.execute)
         
         Args:
             sql: Consulta SQL
+            max_rows: Tope de filas (por defecto `max_result_rows`)
+            max_bytes: Tope de bytes (por defecto `max_result_bytes`)
         
         Returns:
             Lista de diccionarios con los resultados
         """
+        max_rows = self.max_result_rows if max_rows is None else max_rows
+        max_bytes = self.max_result_bytes if max_bytes is None else max_bytes
         try:
-            self.cursor.execute(sql)
-            columns = [desc[0] for desc in self.cursor.description]
-            rows = self.cursor.fetchall()
-            
-            return [dict(zip(columns, row)) for row in rows]
+            is_select = sql.strip().upper().startswith("SELECT")
+            if max_rows and is_select:
+                sql = apply_row_limit(sql, max_rows)
+            with self._lock:
+                if is_select and self.max_execution_ms:
+                    self._deadline = time.perf_counter() + self.max_execution_ms / 1000
+                try:
+                    if self.prepared and is_select:
+                        results = self._execute_prepared(sql, max_rows, max_bytes)
+                        if results is not None:
+                            return results
+                    self.cursor.execute(sql)
+                    return fetch_bounded(self.cursor, max_rows, max_bytes)
+                finally:
+                    self._deadline = None
+        except sqlite3.OperationalError as e:
+            if str(e) == "interrupted":
+                return [{"error": (
+                    f"Consulta cancelada: superó el tiempo máximo de ejecución ({self.max_execution_ms} ms). "
+                    "Filtra o agrega los datos para leer menos filas."
+                )}]
+            return [{"error": str(e)}]
         except Exception as e:
             return [{"error": str(e)}]
     
+    def validate(self, sql: str) -> Optional[str]:
+        """
+        Valida un SELECT sin ejecutarlo (EXPLAIN QUERY PLAN lo compila)
+        
+        Returns:
+            None si es válido, o el mensaje de error
+        """
+        try:
+            with self._lock:
+                self.cursor.execute(f"EXPLAIN QUERY PLAN {sql.strip().rstrip(';')}")
+                self.cursor.fetchall()
+            return None
+        except sqlite3.Error as e:
+            return str(e)
+    
+    def _execute_prepared(self, sql: str, max_rows: int, max_bytes: int) -> Optional[QueryResult]:
+        """
+        Ejecuta la plantilla parametrizada del SELECT (ver MySQLTool._run_select).
+        
+        sqlite3 reutiliza la sentencia compilada cuando el texto se repite;
+        aquí solo se lleva la cuenta de la LRU para las métricas. Devuelve
+        None si hay que ejecutar el SQL literal (solo si fallaron los
+        parámetros; los demás errores se propagan).
+        """
+        template, params = parameterize(sql)
+        if self.prepared.is_rejected(template):
+            return None
+        start = time.perf_counter()
+        _, hit = self.prepared.handle(self, template, lambda: template)
+        try:
+            self.cursor.execute(template, params)
+        except sqlite3.Error as e:
+            if not _is_binding_error(e):
+                self.prepared.forget(self, template)
+                raise
+            print(f"⚠️  Sentencia preparada descartada ({e}); se ejecuta con literales")
+            self.prepared.discard(self, template)
+            return None
+        self.prepared.record(template, time.perf_counter() - start, hit)
+        return fetch_bounded(self.cursor, max_rows, max_bytes)
+    
+    def execute_write(
+        self,
+        sql: BatchInput,
+        params: Optional[List[Sequence[Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Ejecuta escrituras en una sola transacción (ver MySQLTool.execute_write)
+        
+        En SQLite los parámetros usan `?` en lugar de `%s`.
+        """
+        batch = normalize_batch(sql, params)
+        problem = check_batch(batch)
+        if problem:
+            return {"error": problem}
+        
+        index = 0
+        with self._lock:
+            try:
+                rowcounts = []
+                for index, (statement, rows) in enumerate(batch):
+                    if rows is None:
+                        self.cursor.execute(statement)
+                    else:
+                        self.cursor.executemany(statement, rows)
+                    rowcounts.append(self.cursor.rowcount)
+                self.conn.commit()
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                return {"error": str(e), "failed_index": index}
+        
+        # Los conteos (o la estructura, si hubo DDL) cambiaron
+        self.invalidate_schema()
+        for listener in self._write_listeners:
+            try:
+                listener([statement for statement, _ in batch])
+            except Exception as e:
+                print(f"⚠️  Error en un listener de escritura: {e}")
+        
+        return {"success": True, "message": write_summary(batch, rowcounts), "rowcounts": rowcounts}
+    
+    def iter_rows(self, sql: str, batch_size: int = 500) -> Iterator[List[Any]]:
+        """
+        Ejecuta un SELECT y entrega columnas y luego lotes de tuplas (ver MySQLTool.iter_rows)
+        
+        Usa una conexión propia para no retener el lock compartido
+        mientras el consumidor lee el resultado.
+        """
+        if not sql.strip().upper().startswith("SELECT"):
+            raise ValueError("Solo se permiten consultas SELECT")
+        
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        try:
+            cursor = conn.execute(sql)
+            yield [desc[0] for desc in cursor.description]
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield batch
+        finally:
+            conn.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de la caché de esquema y de las sentencias preparadas"""
+        return {
+            "schema_cache": self.schema_cache.stats(),
+            "prepared_statements": self.prepared.stats() if self.prepared else None,
+        }
+    
     def close(self):
         """Cierra la conexión"""
         self.conn.close()
\ No newline at end of file
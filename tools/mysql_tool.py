@@ -1,8 +1,90 @@
 """
 Herramienta para trabajar con bases de datos MySQL
 """
+import re
+import threading
+import time
+from contextlib import contextmanager
 import mysql.connector
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Iterator, Optional, Sequence
+
+from tools.bounded import QueryResult, apply_row_limit, fetch_bounded
+from tools.connection_pool import DISCONNECT_ERRORS, ConnectionPool
+from tools.cost_guard import CostGuard
+from tools.prepared_cache import PreparedStatementCache
+from tools.sql_template import parameterize
+from tools.write_batch import BatchInput, check_batch, normalize_batch, write_summary
+from tools.result_cache import ResultCache, extract_tables, expand_dependencies
+from tools.schema_cache import SchemaCache, make_fingerprint
+
+
+# Huella barata del esquema: lista de tablas, definición de columnas
+# y CREATE_TIME/UPDATE_TIME, todo agregado en el servidor en una sola fila.
+# `structure_crc` omite UPDATE_TIME: solo cambia con DDL, no con los datos.
+SCHEMA_FINGERPRINT_SQL = """
+SELECT
+    (SELECT COUNT(*) FROM information_schema.TABLES
+      WHERE TABLE_SCHEMA = DATABASE()) AS n_tables,
+    (SELECT COALESCE(SUM(CRC32(CONCAT_WS('|', TABLE_NAME, TABLE_TYPE, CREATE_TIME, UPDATE_TIME))), 0)
+       FROM information_schema.TABLES
+      WHERE TABLE_SCHEMA = DATABASE()) AS tables_crc,
+    (SELECT COALESCE(SUM(CRC32(CONCAT_WS('|', TABLE_NAME, TABLE_TYPE, CREATE_TIME))), 0)
+       FROM information_schema.TABLES
+      WHERE TABLE_SCHEMA = DATABASE()) AS structure_crc,
+    (SELECT COUNT(*) FROM information_schema.COLUMNS
+      WHERE TABLE_SCHEMA = DATABASE()) AS n_columns,
+    (SELECT COALESCE(SUM(CRC32(CONCAT_WS('|', TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_KEY, EXTRA))), 0)
+       FROM information_schema.COLUMNS
+      WHERE TABLE_SCHEMA = DATABASE()) AS columns_crc
+"""
+
+# Introspección en bloque (modo 'bulk'): tablas y vistas con su estimación
+# de filas, y todas las columnas con sus llaves foráneas en una sola pasada.
+BULK_TABLES_SQL = """
+SELECT TABLE_NAME, TABLE_TYPE, TABLE_ROWS, TABLE_COMMENT
+  FROM information_schema.TABLES
+ WHERE TABLE_SCHEMA = DATABASE()
+ ORDER BY TABLE_NAME
+"""
+
+VIEW_DEFINITIONS_SQL = """
+SELECT TABLE_NAME, VIEW_DEFINITION
+  FROM information_schema.VIEWS
+ WHERE TABLE_SCHEMA = DATABASE()
+"""
+
+BULK_COLUMNS_SQL = """
+SELECT c.TABLE_NAME, c.COLUMN_NAME, c.COLUMN_TYPE, c.IS_NULLABLE, c.COLUMN_KEY,
+       c.EXTRA, c.COLUMN_COMMENT, k.REFERENCED_TABLE_NAME, k.REFERENCED_COLUMN_NAME
+  FROM information_schema.COLUMNS c
+  LEFT JOIN information_schema.KEY_COLUMN_USAGE k
+    ON k.TABLE_SCHEMA = c.TABLE_SCHEMA
+   AND k.TABLE_NAME = c.TABLE_NAME
+   AND k.COLUMN_NAME = c.COLUMN_NAME
+   AND k.REFERENCED_TABLE_NAME IS NOT NULL
+ WHERE c.TABLE_SCHEMA = DATABASE()
+ ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION
+"""
+
+# ER_QUERY_TIMEOUT: el SELECT superó max_execution_time y el servidor lo canceló
+QUERY_TIMEOUT_ERRNO = 3024
+
+# Errores propios de ejecutar la plantilla como sentencia preparada; con ellos
+# se reintenta con literales. Cualquier otro error (sintaxis, columna
+# inexistente...) también fallaría con literales: se devuelve tal cual.
+#   1295 ER_UNSUPPORTED_PS, 1210 ER_WRONG_ARGUMENTS (parámetros de EXECUTE),
+#   1055 ER_WRONG_FIELD_WITH_GROUP (GROUP BY que repite una expresión con
+#   literales, que como parámetros dejan de ser la misma expresión),
+#   None / -1: errores del conector al convertir los parámetros
+PREPARE_FALLBACK_ERRNOS = {1295, 1210, 1055, None, -1}
+
+# ER_UNKNOWN_STMT_HANDLER: el handle es de una sesión que ya no existe
+# (reconexión); se olvidan los handles de la conexión, sin rechazar la plantilla
+UNKNOWN_STMT_ERRNO = 1243
+
+# Tope de max_execution_time; se usa cuando la exportación no tiene límite
+MAX_EXECUTION_TIME_CAP = 4294967295
+_LEADING_SELECT = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
 
 
 class MySQLTool:
@@ -14,7 +96,24 @@ class MySQLTool:
         user: str,
         password: str,
         database: str,
-        port: int = 3307
+        port: int = 3307,
+        schema_cache_ttl: float = 300.0,
+        schema_mode: str = 'bulk',
+        exact_counts: bool = False,
+        pool_size: int = 5,
+        pool_timeout: float = 10.0,
+        result_cache_ttl: float = 30.0,
+        result_cache_table_ttls: Optional[Dict[str, float]] = None,
+        result_cache_max_bytes: int = 32 * 1024 * 1024,
+        max_result_rows: int = 1000,
+        max_result_bytes: int = 2 * 1024 * 1024,
+        prepared_statements: bool = True,
+        prepared_cache_size: int = 64,
+        cost_guard: bool = True,
+        max_query_rows: int = 5_000_000,
+        max_query_cost: float = 1_000_000.0,
+        max_execution_ms: int = 30000,
+        export_max_execution_ms: int = 600000
     ):
         """
         Inicializa la conexión a MySQL
@@ -25,143 +124,604 @@ class MySQLTool:
             password: Contraseña
             database: Nombre de la base de datos
             port: Puerto (por defecto 3306)
+            schema_cache_ttl: Segundos que se reutiliza el esquema cacheado
+            schema_mode: 'bulk' (information_schema, filas estimadas) o
+                'describe' (DESCRIBE + COUNT(*) por tabla, el modo original)
+            exact_counts: En modo 'bulk', calcula COUNT(*) exactos en segundo plano
+            pool_size: Conexiones máximas del pool (peticiones concurrentes a la BD)
+            pool_timeout: Segundos máximos esperando una conexión libre
+            result_cache_ttl: Segundos que se reutiliza el resultado de un SELECT (0 = sin caché)
+            result_cache_table_ttls: TTL por tabla/vista, ej. {'ventas': 5}
+            result_cache_max_bytes: Presupuesto de memoria de la caché de resultados
+            max_result_rows: Filas máximas que devuelve un SELECT (0 = sin límite)
+            max_result_bytes: Bytes aproximados máximos que devuelve un SELECT (0 = sin límite)
+            prepared_statements: Ejecuta los SELECT como sentencias preparadas (literales -> parámetros)
+            prepared_cache_size: Sentencias preparadas que se guardan por conexión (LRU)
+            cost_guard: Revisa el plan (EXPLAIN FORMAT=JSON) de cada SELECT antes de ejecutarlo
+            max_query_rows: Filas estimadas a partir de las cuales se rechaza un SELECT (0 = sin tope)
+            max_query_cost: Costo estimado (query_cost) a partir del cual se rechaza (0 = sin tope)
+            max_execution_ms: MAX_EXECUTION_TIME de la sesión para los SELECT (0 = sin límite)
+            export_max_execution_ms: Límite propio de las exportaciones (iter_rows), que
+                leen todo el resultado y pueden tardar más (0 = sin límite)
         """
+        if schema_mode not in ('bulk', 'describe'):
+            raise ValueError(f"schema_mode no soportado: {schema_mode}")
+
         self.connection_params = {
             'host': host,
             'user': user,
             'password': password,
             'database': database,
-            'port': port
+            'port': port,
+            # Las lecturas no abren transacción: al devolver la conexión al
+            # pool no hace falta un ROLLBACK. execute_write abre la suya.
+            'autocommit': True
         }
-        self.conn = None
-        self.cursor = None
+        self.pool: Optional[ConnectionPool] = None
+        # Huella solo de la estructura (tablas/columnas), útil como llave de cachés de SQL
+        self.structure_fingerprint: Optional[str] = None
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self.schema_cache = SchemaCache(ttl=schema_cache_ttl)
+        self.schema_mode = schema_mode
+        self.exact_counts = exact_counts
+        self._exact_row_counts: Dict[str, int] = {}
+        self._exact_counts_at = 0.0
+        self._count_thread: Optional[threading.Thread] = None
+        self.max_result_rows = max_result_rows
+        self.max_result_bytes = max_result_bytes
+        self.prepared: Optional[PreparedStatementCache] = (
+            PreparedStatementCache(prepared_cache_size) if prepared_statements else None
+        )
+        self.max_execution_ms = max_execution_ms
+        self.export_max_execution_ms = export_max_execution_ms
+        self.cost_guard: Optional[CostGuard] = (
+            CostGuard(max_rows=max_query_rows, max_cost=max_query_cost) if cost_guard else None
+        )
+        self.result_cache: Optional[ResultCache] = None
+        if result_cache_ttl > 0:
+            self.result_cache = ResultCache(
+                default_ttl=result_cache_ttl,
+                table_ttls=result_cache_table_ttls,
+                max_bytes=result_cache_max_bytes
+            )
+        # vista -> tablas que usa, recargado cuando cambia la estructura
+        self._view_deps: Dict[str, set] = {}
+        self._view_deps_fingerprint: Optional[str] = ""
+        # Funciones a avisar (con las sentencias) después de cada escritura confirmada
+        self._write_listeners: List[Callable[[List[str]], None]] = []
         self._connect()
     
     def _connect(self):
-        """Establece la conexión con MySQL"""
+        """Crea el pool y abre la primera conexión para validar las credenciales"""
         try:
-            self.conn = mysql.connector.connect(**self.connection_params)
-            self.cursor = self.conn.cursor(dictionary=True)
-            print(f"✅ Conectado a MySQL: {self.connection_params['database']}")
+            self.pool = ConnectionPool(
+                self.connection_params,
+                size=self.pool_size,
+                timeout=self.pool_timeout,
+                # MySQL corta cualquier SELECT de la sesión que pase este tiempo
+                init_statements=(
+                    [f"SET SESSION max_execution_time = {int(self.max_execution_ms)}"]
+                    if self.max_execution_ms else []
+                ),
+                on_new_session=self._forget_prepared
+            )
+            with self.pool.connection():
+                pass
+            print(f"✅ Conectado a MySQL: {self.connection_params['database']} (pool de {self.pool_size})")
         except mysql.connector.Error as e:
             print(f"❌ Error al conectar a MySQL: {e}")
             raise
+
+    def _forget_prepared(self, conn):
+        """La sesión cambió: sus sentencias preparadas ya no existen en el servidor"""
+        if self.prepared:
+            self.prepared.forget(conn)
+
+    @contextmanager
+    def _cursor(self):
+        """Toma una conexión del pool y entrega un cursor de diccionarios"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor(dictionary=True, buffered=True)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
     
     def get_schema(self) -> str:
-        """Obtiene el esquema de todas las tablas"""
+        """
+        Obtiene el esquema de todas las tablas.
+
+        Usa la caché de esquema: solo se vuelve a introspectar la BD
+        si cambió la huella de `information_schema` o expiró el TTL.
+        """
         try:
-            # Obtener todas las tablas
-            self.cursor.execute("SHOW TABLES")
-            tables = [list(row.values())[0] for row in self.cursor.fetchall()]
-            
-            schema = "ESQUEMA DE LA BASE DE DATOS MySQL:\n\n"
-            
+            with self._cursor() as cursor:
+                return self.schema_cache.get(
+                    lambda: self._schema_fingerprint(cursor),
+                    lambda: self._build_schema(cursor)
+                )
+        except mysql.connector.Error as e:
+            return f"Error al obtener esquema: {e}"
+
+    def schema_fingerprint(self) -> str:
+        """Calcula la huella actual del esquema con una sola consulta"""
+        with self._cursor() as cursor:
+            return self._schema_fingerprint(cursor)
+
+    def _schema_fingerprint(self, cursor) -> str:
+        cursor.execute(SCHEMA_FINGERPRINT_SQL)
+        row = cursor.fetchone()
+        self.structure_fingerprint = make_fingerprint(
+            row['n_tables'], row['structure_crc'], row['n_columns'], row['columns_crc']
+        )
+        return make_fingerprint(*row.values())
+
+    def invalidate_schema(self):
+        """Fuerza a reconstruir el esquema en la próxima llamada a get_schema"""
+        self.schema_cache.invalidate()
+
+    def add_write_listener(self, listener: Callable[[List[str]], None]):
+        """Registra una función que recibe las sentencias de cada escritura confirmada"""
+        self._write_listeners.append(listener)
+
+    def _notify_write(self, statements: List[str]):
+        for listener in self._write_listeners:
+            try:
+                listener(statements)
+            except Exception as e:
+                print(f"⚠️  Error en un listener de escritura: {e}")
+
+    def _build_schema(self, cursor) -> str:
+        """Introspecta la BD completa y renderiza el esquema como texto"""
+        if self.schema_mode == 'bulk':
+            return self._build_schema_bulk(cursor)
+        return self._build_schema_describe(cursor)
+
+    def _build_schema_bulk(self, cursor) -> str:
+        """
+        Renderiza el esquema con dos consultas a information_schema.
+
+        Las filas se reportan con TABLE_ROWS (estimación de InnoDB), salvo
+        que ya exista un conteo exacto calculado en segundo plano.
+        """
+        cursor.execute(BULK_TABLES_SQL)
+        tables = cursor.fetchall()
+
+        cursor.execute(BULK_COLUMNS_SQL)
+        columns_by_table: Dict[str, List[Dict[str, Any]]] = {}
+        for col in cursor.fetchall():
+            columns_by_table.setdefault(col['TABLE_NAME'], []).append(col)
+
+        if self.exact_counts:
+            self._maybe_start_exact_counts(
+                [t['TABLE_NAME'] for t in tables if t['TABLE_TYPE'] == 'BASE TABLE']
+            )
+
+        schema = "ESQUEMA DE LA BASE DE DATOS MySQL:\n\n"
+
+        for table in tables:
+            name = table['TABLE_NAME']
+            is_view = table['TABLE_TYPE'] == 'VIEW'
+
+            schema += f"{'Vista' if is_view else 'Tabla'}: {name}\n"
+            if table['TABLE_COMMENT'] and not is_view:
+                schema += f"  Descripción: {table['TABLE_COMMENT']}\n"
+
+            # Una columna con varias FKs llega repetida: se agrupan sus referencias
+            columns: Dict[str, Dict[str, Any]] = {}
+            for col in columns_by_table.get(name, []):
+                entry = columns.setdefault(col['COLUMN_NAME'], {**col, 'fks': []})
+                if col['REFERENCED_TABLE_NAME']:
+                    entry['fks'].append(
+                        f"FK → {col['REFERENCED_TABLE_NAME']}.{col['REFERENCED_COLUMN_NAME']}"
+                    )
+
+            for field, col in columns.items():
+                constraints = []
+                if col['COLUMN_KEY'] == 'PRI':
+                    constraints.append('PRIMARY KEY')
+                elif col['COLUMN_KEY'] == 'UNI':
+                    constraints.append('UNIQUE')
+                if col['IS_NULLABLE'] == 'NO':
+                    constraints.append('NOT NULL')
+                if col['EXTRA']:
+                    constraints.append(col['EXTRA'])
+                constraints.extend(col['fks'])
+
+                constraint_str = f" ({', '.join(constraints)})" if constraints else ""
+                comment = f" -- {col['COLUMN_COMMENT']}" if col['COLUMN_COMMENT'] else ""
+                schema += f"  - {field}: {col['COLUMN_TYPE']}{constraint_str}{comment}\n"
+
+            if not is_view:
+                if name in self._exact_row_counts:
+                    schema += f"  Total de registros: {self._exact_row_counts[name]}\n"
+                else:
+                    schema += f"  Total de registros (estimado): ~{table['TABLE_ROWS'] or 0}\n"
+            schema += "\n"
+
+        return schema
+
+    def _maybe_start_exact_counts(self, tables: List[str]):
+        """Lanza el conteo exacto en segundo plano si no hay uno vigente"""
+        fresh = (time.monotonic() - self._exact_counts_at) < self.schema_cache.ttl
+        running = self._count_thread is not None and self._count_thread.is_alive()
+        if (self._exact_row_counts and fresh) or running:
+            return
+
+        self._count_thread = threading.Thread(
+            target=self._compute_exact_counts, args=(tables,), daemon=True
+        )
+        self._count_thread.start()
+
+    def _compute_exact_counts(self, tables: List[str]):
+        """Ejecuta COUNT(*) por tabla en una conexión propia y refresca la caché"""
+        conn = None
+        try:
+            conn = mysql.connector.connect(**self.connection_params)
+            cursor = conn.cursor()
+            counts = {}
             for table in tables:
-                # Información de la tabla
-                self.cursor.execute(f"DESCRIBE {table}")
-                columns = self.cursor.fetchall()
+                cursor.execute(f"SELECT COUNT(*) FROM `{table}`")
+                counts[table] = cursor.fetchone()[0]
+            cursor.close()
+
+            self._exact_row_counts = counts
+            self._exact_counts_at = time.monotonic()
+            self.invalidate_schema()
+        except mysql.connector.Error as e:
+            print(f"⚠️ Error calculando conteos exactos: {e}")
+        finally:
+            if conn:
+                conn.close()
+
+    def _build_schema_describe(self, cursor) -> str:
+        """Modo original: DESCRIBE y COUNT(*) exacto por cada tabla"""
+        # Obtener todas las tablas
+        cursor.execute("SHOW TABLES")
+        tables = [list(row.values())[0] for row in cursor.fetchall()]
+        
+        schema = "ESQUEMA DE LA BASE DE DATOS MySQL:\n\n"
+        
+        for table in tables:
+            # Información de la tabla
+            cursor.execute(f"DESCRIBE {table}")
+            columns = cursor.fetchall()
+            
+            schema += f"Tabla: {table}\n"
+            for col in columns:
+                field = col['Field']
+                col_type = col['Type']
+                null = col['Null']
+                key = col['Key']
+                extra = col['Extra']
                 
-                schema += f"Tabla: {table}\n"
-                for col in columns:
-                    field = col['Field']
-                    col_type = col['Type']
-                    null = col['Null']
-                    key = col['Key']
-                    extra = col['Extra']
-                    
-                    constraints = []
-                    if key == 'PRI':
-                        constraints.append('PRIMARY KEY')
-                    if null == 'NO':
-                        constraints.append('NOT NULL')
-                    if extra:
-                        constraints.append(extra)
-                    
-                    constraint_str = f" ({', '.join(constraints)})" if constraints else ""
-                    schema += f"  - {field}: {col_type}{constraint_str}\n"
+                constraints = []
+                if key == 'PRI':
+                    constraints.append('PRIMARY KEY')
+                if null == 'NO':
+                    constraints.append('NOT NULL')
+                if extra:
+                    constraints.append(extra)
                 
-                # Contar registros
-                self.cursor.execute(f"SELECT COUNT(*) as count FROM {table}")
-                count = self.cursor.fetchone()['count']
-                schema += f"  Total de registros: {count}\n\n"
+                constraint_str = f" ({', '.join(constraints)})" if constraints else ""
+                schema += f"  - {field}: {col_type}{constraint_str}\n"
             
-            return schema
-        except mysql.connector.Error as e:
-            return f"Error al obtener esquema: {e}"
+            # Contar registros
+            cursor.execute(f"SELECT COUNT(*) as count FROM {table}")
+            count = cursor.fetchone()['count']
+            schema += f"  Total de registros: {count}\n\n"
+        
+        return schema
     
-    def execute(self, sql: str) -> List[Dict[str, Any]]:
+    def _view_dependencies(self, cursor) -> Dict[str, set]:
+        """Mapa vista -> tablas que referencia (según information_schema.VIEWS)"""
+        if self._view_deps_fingerprint != self.structure_fingerprint:
+            cursor.execute(VIEW_DEFINITIONS_SQL)
+            self._view_deps = {
+                row['TABLE_NAME'].lower(): extract_tables(row['VIEW_DEFINITION'] or "")
+                for row in cursor.fetchall()
+            }
+            self._view_deps_fingerprint = self.structure_fingerprint
+        return self._view_deps
+
+    def _dependencies(self, cursor, sql: str) -> set:
+        """Tablas de las que depende `sql`, incluidas las tablas base de las vistas"""
+        return expand_dependencies(extract_tables(sql), self._view_dependencies(cursor))
+
+    def execute(
+        self,
+        sql: str,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """
         Ejecuta una consulta SQL y retorna los resultados
         
+        La lectura es acotada: se agrega (o se ajusta) un LIMIT, las filas
+        se leen por lotes con un cursor sin buffer y se deja de leer al
+        llegar al tope de filas o de bytes. Si el resultado quedó cortado,
+        `results.truncated` es True y `results.total_estimate` trae el
+        estimado de filas de EXPLAIN.
+        
+        Con el control de costo activo, un SELECT cuyo plan supera los
+        topes no se ejecuta: se devuelve un error con el motivo (que el
+        agente usa para pedir una consulta corregida).
+        
         Args:
             sql: Consulta SQL a ejecutar
+            max_rows: Tope de filas (por defecto `max_result_rows`)
+            max_bytes: Tope de bytes (por defecto `max_result_bytes`)
         
         Returns:
-            Lista de diccionarios con los resultados
+            QueryResult (columnar; se usa como una lista de diccionarios)
         """
+        max_rows = self.max_result_rows if max_rows is None else max_rows
+        max_bytes = self.max_result_bytes if max_bytes is None else max_bytes
         try:
             # Validar que sea una consulta SELECT
             sql_upper = sql.strip().upper()
             if not sql_upper.startswith('SELECT'):
                 return [{"error": "Solo se permiten consultas SELECT"}]
             
-            self.cursor.execute(sql)
-            results = self.cursor.fetchall()
+            caps = f"rows={max_rows} bytes={max_bytes}"
+            if self.result_cache:
+                cached = self.result_cache.get(sql, caps)
+                if cached is not None:
+                    return cached
+            
+            with self.pool.connection() as conn:
+                bounded_sql = apply_row_limit(sql, max_rows) if max_rows else sql
+                estimate = None
+                if self.cost_guard:
+                    reason, estimate = self.cost_guard.check(
+                        bounded_sql, lambda query: self._explain_json(conn, query)
+                    )
+                    if reason:
+                        print(f"🛑 {reason}")
+                        return [{"error": reason}]
+                
+                results = self._run_select(conn, bounded_sql, max_rows, max_bytes)
+                
+                if results.truncated or self.result_cache:
+                    meta = conn.cursor(dictionary=True, buffered=True)
+                    try:
+                        if results.truncated:
+                            results.total_estimate = (
+                                estimate if estimate is not None else self._estimate_rows(meta, sql)
+                            )
+                            print(f"✂️  Resultado truncado a {len(results)} filas (~{results.total_estimate} en total)")
+                        if self.result_cache:
+                            self.result_cache.put(sql, results, self._dependencies(meta, sql), caps)
+                    finally:
+                        meta.close()
             
-            return results if results else []
+            return results
             
         except mysql.connector.Error as e:
+            if e.errno == QUERY_TIMEOUT_ERRNO:
+                return [{"error": (
+                    f"Consulta cancelada: superó el tiempo máximo de ejecución ({self.max_execution_ms} ms). "
+                    "Filtra o agrega los datos para leer menos filas."
+                )}]
             return [{"error": str(e)}]
+
+    def iter_rows(self, sql: str, batch_size: int = 500) -> Iterator[List[Any]]:
+        """
+        Ejecuta un SELECT y entrega el resultado completo por lotes
+        
+        Primero entrega la lista de columnas y luego lotes de tuplas. Usa
+        un cursor sin buffer, así que las filas se leen del servidor a
+        medida que se consumen y la memoria no crece con el resultado.
+        No aplica topes de filas: es para exportar.
         
+        Sí pasa por el control de costo (un plan demasiado caro lanza
+        ValueError con el motivo). El límite de tiempo de la sesión se
+        reemplaza, solo para esta sentencia, por `export_max_execution_ms`
+        con el hint MAX_EXECUTION_TIME: una exportación grande pero
+        legítima no se corta a la mitad.
+        
+        Args:
+            sql: Consulta SELECT
+            batch_size: Filas por lote
+        """
+        if not sql.strip().upper().startswith('SELECT'):
+            raise ValueError("Solo se permiten consultas SELECT")
         
+        with self.pool.connection() as conn:
+            if self.cost_guard:
+                reason, _ = self.cost_guard.check(sql, lambda query: self._explain_json(conn, query))
+                if reason:
+                    print(f"🛑 Exportación: {reason}")
+                    raise ValueError(reason)
+            
+            limit = self.export_max_execution_ms or MAX_EXECUTION_TIME_CAP
+            cursor = conn.cursor()
+            try:
+                cursor.execute(_LEADING_SELECT.sub(f"SELECT /*+ MAX_EXECUTION_TIME({limit}) */", sql, count=1))
+                yield [desc[0] for desc in cursor.description]
+                while True:
+                    batch = cursor.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    yield batch
+            finally:
+                try:
+                    cursor.close()
+                except mysql.connector.Error:
+                    pass
 
-    def execute_write(self, sql: str) -> Dict[str, Any]:
+    def _run_select(self, conn, sql: str, max_rows: int, max_bytes: int) -> QueryResult:
         """
-        Ejecuta una consulta de ESCRITURA (INSERT, UPDATE, DELETE)
-        y retorna el resultado.
+        Ejecuta el SELECT y lee el resultado acotado.
         
-        Args:
-            sql: Consulta SQL de escritura
+        Si están activas las sentencias preparadas, los literales pasan a
+        parámetros y se reutiliza el handle preparado de la plantilla en
+        esta conexión. Si la plantilla no se puede preparar (p. ej. un
+        GROUP BY que repite una expresión con literales), se ejecuta el
+        SQL literal; los demás errores se propagan (ver PREPARE_FALLBACK_ERRNOS).
+        """
+        if self.prepared:
+            template, params = parameterize(sql)
+            if not self.prepared.is_rejected(template):
+                start = time.perf_counter()
+                cursor, hit = self.prepared.handle(conn, template, lambda: conn.cursor(prepared=True))
+                try:
+                    cursor.execute(template, params)
+                    self.prepared.record(template, time.perf_counter() - start, hit)
+                    results = fetch_bounded(cursor, max_rows, max_bytes)
+                    if results.truncated:
+                        cursor.fetchall()  # Descartar lo que queda (acotado por el LIMIT)
+                    return results
+                except DISCONNECT_ERRORS:
+                    raise
+                except mysql.connector.Error as e:
+                    if e.errno == UNKNOWN_STMT_ERRNO:
+                        print("⚠️  Sentencias preparadas de una sesión anterior; se vuelven a preparar")
+                        self._forget_prepared(conn)
+                    # Un timeout reintentado con literales ocuparía el servidor otro
+                    # tanto; un SQL inválido fallaría igual con literales
+                    elif e.errno not in PREPARE_FALLBACK_ERRNOS:
+                        raise
+                    else:
+                        print(f"⚠️  Sentencia preparada descartada ({e}); se ejecuta con literales")
+                        self.prepared.discard(conn, template)
+        
+        # Sin buffer y de tuplas: las filas llegan por lotes a medida que se leen
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql)
+            results = fetch_bounded(cursor, max_rows, max_bytes)
+            if results.truncated:
+                cursor.fetchall()  # Descartar lo que queda (acotado por el LIMIT)
+            return results
+        finally:
+            cursor.close()
+
+    def _estimate_rows(self, cursor, sql: str) -> Optional[int]:
+        """Estimado (barato) de filas totales según EXPLAIN"""
+        try:
+            cursor.execute(f"EXPLAIN {sql.strip().rstrip(';')}")
+            plan = cursor.fetchall()
+            return max((int(row.get('rows') or 0) for row in plan), default=None)
+        except mysql.connector.Error:
+            return None
+
+    def validate(self, sql: str) -> Optional[str]:
+        """
+        Valida un SELECT sin ejecutarlo: EXPLAIN detecta los errores de
+        sintaxis o de columnas, y el control de costo los planes caros
+        (su veredicto queda cacheado para cuando se ejecute).
         
         Returns:
-            Un diccionario con el estado de la operación.
+            None si es válido, o el error / motivo del rechazo
         """
+        bounded_sql = apply_row_limit(sql, self.max_result_rows) if self.max_result_rows else sql
         try:
-            # Validar que NO sea un SELECT
-            sql_upper = sql.strip().upper()
-            if sql_upper.startswith('SELECT'):
-                return {"error": "Esta función es solo para INSERT, UPDATE o DELETE."}
+            with self.pool.connection() as conn:
+                plan = self._explain_json(conn, bounded_sql)
+        except mysql.connector.Error as e:
+            return str(e)
+        if self.cost_guard:
+            reason, _ = self.cost_guard.check(bounded_sql, lambda _: plan)
+            return reason
+        return None
 
-            self.cursor.execute(sql)
-            self.conn.commit() # ¡MUY IMPORTANTE! Confirmar la transacción
-            
-            rows_affected = self.cursor.rowcount
-            
-            if sql_upper.startswith('INSERT'):
-                return {"success": True, "message": f"Inserción completada. {rows_affected} fila(s) afectada(s)."}
-            elif sql_upper.startswith('UPDATE'):
-                return {"success": True, "message": f"Actualización completada. {rows_affected} fila(s) afectada(s)."}
-            elif sql_upper.startswith('DELETE'):
-                return {"success": True, "message": f"Eliminación completada. {rows_affected} fila(s) afectada(s)."}
-            else:
-                return {"success": True, "message": f"Operación completada. {rows_affected} fila(s) afectada(s)."}
+    def _explain_json(self, conn, sql: str) -> str:
+        """Plan del SELECT en formato JSON (sin ejecutarlo)"""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"EXPLAIN FORMAT=JSON {sql.strip().rstrip(';')}")
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
 
+    def execute_write(
+        self,
+        sql: BatchInput,
+        params: Optional[List[Sequence[Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Ejecuta escrituras (INSERT, UPDATE, DELETE) en UNA transacción
+        
+        Acepta una sentencia, varias (lista o texto separado por ';'), una
+        sentencia parametrizada con muchas filas en `params` (va por
+        `executemany`) o una lista de {"sql", "params"}. Todo o nada: si
+        una sentencia falla se revierte el lote completo; si no, se hace
+        un único commit.
+        
+        Args:
+            sql: Sentencia(s) de escritura
+            params: Filas de parámetros para una sentencia parametrizada
+        
+        Returns:
+            Un diccionario con el estado de la operación y `rowcounts`
+            (filas afectadas por sentencia), o `error` y `failed_index`.
+        """
+        batch = normalize_batch(sql, params)
+        problem = check_batch(batch)
+        if problem:
+            return {"error": problem}
+        
+        index = 0
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    conn.start_transaction()
+                    rowcounts = []
+                    for index, (statement, rows) in enumerate(batch):
+                        if rows is None:
+                            cursor.execute(statement)
+                        else:
+                            cursor.executemany(statement, rows)
+                        rowcounts.append(cursor.rowcount)
+                    conn.commit() # ¡MUY IMPORTANTE! Un solo commit para todo el lote
+                finally:
+                    cursor.close()
+        
         except mysql.connector.Error as e:
-            self.conn.rollback() # Revertir cambios si algo falla
-            return {"error": str(e)}    
+            # El pool revierte la transacción pendiente al recibir la conexión
+            return {"error": str(e), "failed_index": index}
+        
+        self.invalidate_schema()
+        # Los conteos (o la estructura) cambiaron
+        self._invalidate_results(";\n".join(statement for statement, _ in batch))
+        self._notify_write([statement for statement, _ in batch])
+        
+        return {"success": True, "message": write_summary(batch, rowcounts), "rowcounts": rowcounts}
     
+    def _invalidate_results(self, write_sql: str):
+        """Descarta los resultados cacheados que dependen de las tablas escritas"""
+        if not self.result_cache:
+            return
+        written = expand_dependencies(extract_tables(write_sql), self._view_deps)
+        removed = self.result_cache.invalidate_tables(written)
+        if removed:
+            print(f"🧹 {removed} resultado(s) cacheado(s) invalidado(s) por escritura en {sorted(written)}")
+
     def test_connection(self) -> bool:
         """Prueba la conexión a la base de datos"""
         try:
-            self.cursor.execute("SELECT 1")
+            with self._cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
             return True
         except mysql.connector.Error:
             return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas del pool de conexiones y de la caché de esquema"""
+        return {
+            "pool": self.pool.stats() if self.pool else None,
+            "schema_cache": self.schema_cache.stats(),
+            "result_cache": self.result_cache.stats() if self.result_cache else None,
+            "prepared_statements": self.prepared.stats() if self.prepared else None,
+            "cost_guard": self.cost_guard.stats() if self.cost_guard else None,
+        }
     
     def close(self):
-        """Cierra la conexión"""
-        if self.cursor:
-            self.cursor.close()
-        if self.conn:
-            self.conn.close()
+        """Cierra todas las conexiones del pool"""
+        if self.pool:
+            self.pool.close()
         print("🔌 Conexión MySQL cerrada")
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+Caché LRU de sentencias preparadas por conexión
+"""
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class PreparedStatementCache:
+    """
+    Para cada conexión guarda, por plantilla de SQL, el handle de la
+    sentencia preparada (en MySQL, un cursor `prepared=True`). Las
+    siguientes ejecuciones de la misma plantilla en esa conexión reutilizan
+    el handle y el servidor no vuelve a parsear ni planificar la consulta.
+
+    Las conexiones se guardan con referencias débiles: si el pool descarta
+    una conexión, sus sentencias se van con ella.
+
+    El tiempo de parseo ahorrado es un estimado: la diferencia entre la
+    primera ejecución de una plantilla (preparar + ejecutar) y cada
+    ejecución posterior que reutiliza el handle.
+    """
+
+    def __init__(self, max_per_connection: int = 64):
+        self.max_per_connection = max_per_connection
+        self._by_conn: "weakref.WeakKeyDictionary[Any, OrderedDict]" = weakref.WeakKeyDictionary()
+        # plantilla -> segundos de la primera ejecución (con preparación)
+        self._first_run: Dict[str, float] = {}
+        # Plantillas que fallaron como sentencia preparada: se ejecutan literales
+        self._rejected: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.fallbacks = 0
+        self.saved_seconds = 0.0
+
+    def handle(self, conn, template: str, prepare: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Devuelve (handle, hit) para `template` en `conn`, preparándolo si hace falta.
+
+        Una conexión la usa un solo hilo a la vez (la tiene prestada del
+        pool), así que su LRU no necesita lock; el mapa de conexiones sí.
+        """
+        with self._lock:
+            statements = self._by_conn.get(conn)
+            if statements is None:
+                statements = OrderedDict()
+                self._by_conn[conn] = statements
+
+        handle = statements.get(template)
+        if handle is not None:
+            statements.move_to_end(template)
+            return handle, True
+
+        handle = prepare()
+        statements[template] = handle
+        while len(statements) > self.max_per_connection:
+            _, old = statements.popitem(last=False)
+            self._close(old)
+            with self._lock:
+                self.evictions += 1
+        return handle, False
+
+    def record(self, template: str, elapsed: float, hit: bool):
+        """Registra una ejecución (para las métricas de aciertos y ahorro)"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+                first = self._first_run.get(template)
+                if first is not None:
+                    self.saved_seconds += max(0.0, first - elapsed)
+            else:
+                self.misses += 1
+                self._first_run.setdefault(template, elapsed)
+                if len(self._first_run) > 10 * self.max_per_connection:
+                    self._first_run.pop(next(iter(self._first_run)))
+
+    def discard(self, conn, template: str):
+        """
+        Olvida (y cierra) el handle de una plantilla que falló al prepararse
+        o ejecutarse; las próximas veces se ejecutará con los literales.
+        """
+        statements = self._by_conn.get(conn)
+        if statements is not None and template in statements:
+            self._close(statements.pop(template))
+        with self._lock:
+            self.fallbacks += 1
+            self._rejected[template] = None
+            if len(self._rejected) > 10 * self.max_per_connection:
+                self._rejected.popitem(last=False)
+
+    def forget(self, conn, template: Optional[str] = None):
+        """
+        Cierra el handle de `template` en `conn` (o todos los de `conn`) sin
+        rechazar la plantilla: la próxima ejecución la vuelve a preparar.
+        """
+        statements = self._by_conn.get(conn)
+        if not statements:
+            return
+        if template is None:
+            while statements:
+                self._close(statements.popitem()[1])
+        elif template in statements:
+            self._close(statements.pop(template))
+
+    def is_rejected(self, template: str) -> bool:
+        with self._lock:
+            return template in self._rejected
+
+    @staticmethod
+    def _close(handle: Any):
+        try:
+            handle.close()
+        except Exception:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "connections": len(self._by_conn),
+                "statements": sum(len(s) for s in self._by_conn.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "fallbacks": self.fallbacks,
+                "parse_ms_saved_est": round(self.saved_seconds * 1000, 1),
+            }
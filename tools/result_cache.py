@@ -0,0 +1,188 @@
+"""
+Caché de resultados de consultas SELECT
+"""
+import copy
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+_IDENT = r"(?:`[^`]+`|\w+)"
+_QUALIFIED = rf"{_IDENT}(?:\s*\.\s*{_IDENT})*"
+
+# Tabla después de FROM / JOIN / UPDATE / INTO (admite "FROM (`db`.`t` ..." de las vistas)
+_TABLE_REF = re.compile(rf"\b(?:FROM|JOIN|UPDATE|INTO)\s+\(*\s*({_QUALIFIED})", re.IGNORECASE)
+# Tablas adicionales en un FROM con comas: "FROM a x, b y"
+_COMMA_REF = re.compile(rf"\s*(?:(?:AS\s+)?{_IDENT})?\s*,\s*\(*\s*({_QUALIFIED})", re.IGNORECASE)
+_NOT_TABLES = {"select", "dual", "lateral", "json_table"}
+
+# Funciones que hacen que el resultado no sea reutilizable
+_NON_DETERMINISTIC = re.compile(r"\b(?:RAND|UUID|SLEEP|CONNECTION_ID|LAST_INSERT_ID)\s*\(", re.IGNORECASE)
+
+_QUOTED_OR_SPACE = re.compile(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`)|\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """Colapsa espacios y quita el ';' final sin tocar los literales"""
+    sql = sql.strip().rstrip(";").strip()
+    return _QUOTED_OR_SPACE.sub(lambda m: m.group(1) or " ", sql)
+
+
+def _clean_identifier(name: str) -> str:
+    # `legacy03`.`productos` -> productos
+    return name.split(".")[-1].strip().strip("`").lower()
+
+
+def extract_tables(sql: str) -> Set[str]:
+    """Nombres de tablas/vistas referenciadas por una sentencia SQL (en minúsculas)"""
+    tables = set()
+    for match in _TABLE_REF.finditer(sql):
+        tables.add(_clean_identifier(match.group(1)))
+        pos = match.end()
+        while True:
+            extra = _COMMA_REF.match(sql, pos)
+            if not extra:
+                break
+            tables.add(_clean_identifier(extra.group(1)))
+            pos = extra.end()
+    return tables - _NOT_TABLES
+
+
+def is_cacheable(sql: str) -> bool:
+    return not _NON_DETERMINISTIC.search(sql)
+
+
+def expand_dependencies(tables: Iterable[str], view_deps: Dict[str, Set[str]]) -> Set[str]:
+    """Agrega las tablas base de cada vista (recursivo, para vistas sobre vistas)"""
+    result: Set[str] = set()
+    pending = list(tables)
+    while pending:
+        table = pending.pop()
+        if table in result:
+            continue
+        result.add(table)
+        pending.extend(view_deps.get(table, ()))
+    return result
+
+
+class ResultCache:
+    """
+    Caché LRU de filas de SELECT con TTL por tabla y presupuesto de memoria.
+
+    Cada entrada recuerda de qué tablas depende (incluidas las tablas base
+    de las vistas), para invalidarla cuando una escritura toca alguna.
+    """
+
+    def __init__(
+        self,
+        default_ttl: float = 30.0,
+        table_ttls: Optional[Dict[str, float]] = None,
+        max_bytes: int = 32 * 1024 * 1024
+    ):
+        """
+        Args:
+            default_ttl: Segundos de vida de un resultado
+            table_ttls: TTL específico por tabla/vista; gana el menor de las dependencias
+            max_bytes: Presupuesto aproximado de memoria para todas las entradas
+        """
+        self.default_ttl = default_ttl
+        self.table_ttls = {k.lower(): v for k, v in (table_ttls or {}).items()}
+        self.max_bytes = max_bytes
+
+        # sql normalizado -> {"rows", "tables", "expires", "bytes"}
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def _ttl_for(self, tables: Set[str]) -> float:
+        return min([self.table_ttls.get(t, self.default_ttl) for t in tables] or [self.default_ttl])
+
+    @staticmethod
+    def _estimate_bytes(rows: List[Dict[str, Any]]) -> int:
+        if not rows:
+            return 64
+        # Aproximación: tamaño de la representación de una fila de muestra
+        # (de un QueryResult se miden las tuplas, que es lo que se guarda)
+        sample = getattr(rows, "rows", rows)[: min(len(rows), 20)]
+        per_row = sum(len(repr(r)) for r in sample) / len(sample)
+        return int(per_row * len(rows)) + 64
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["bytes"]
+
+    @staticmethod
+    def _key(sql: str, variant: str) -> str:
+        # El mismo SQL con otros topes de filas/bytes es otro resultado
+        return f"{normalize_sql(sql)}\n{variant}" if variant else normalize_sql(sql)
+
+    def get(self, sql: str, variant: str = "") -> Optional[List[Dict[str, Any]]]:
+        key = self._key(sql, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["expires"] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # Copia superficial: conserva el tipo (y el marcador de truncamiento)
+            return copy.copy(entry["rows"])
+
+    def put(self, sql: str, rows: List[Dict[str, Any]], tables: Set[str], variant: str = ""):
+        """Guarda el resultado de `sql` (con los topes `variant`), que depende de `tables`"""
+        if not is_cacheable(sql):
+            return
+        size = self._estimate_bytes(rows)
+        if size > self.max_bytes:
+            return
+
+        key = self._key(sql, variant)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = {
+                "rows": rows,
+                "tables": tables,
+                "expires": time.monotonic() + self._ttl_for(tables),
+                "bytes": size,
+            }
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_tables(self, tables: Set[str]) -> int:
+        """Elimina las entradas que dependen de cualquiera de `tables`"""
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if e["tables"] & tables]
+            for key in stale:
+                self._drop(key)
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,78 @@
+"""
+Caché del esquema de la base de datos
+"""
+import hashlib
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+def make_fingerprint(*parts: Any) -> str:
+    """Calcula una huella corta a partir de cualquier valor representable"""
+    raw = "|".join(repr(p) for p in parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class SchemaCache:
+    """
+    Guarda el esquema ya renderizado junto con su huella (fingerprint).
+
+    El esquema solo se reconstruye cuando la huella cambia, cuando
+    expira el TTL o cuando alguien llama a `invalidate()`.
+    """
+
+    def __init__(self, ttl: float = 300.0):
+        """
+        Args:
+            ttl: Segundos máximos que se reutiliza el esquema aunque la huella no cambie
+        """
+        self.ttl = ttl
+        self.text: Optional[str] = None
+        self.fingerprint: Optional[str] = None
+        self.loaded_at = 0.0
+        self.hits = 0
+        self.refreshes = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def get(self, fingerprint_fn: Callable[[], str], build_fn: Callable[[], str]) -> str:
+        """
+        Devuelve el esquema cacheado o lo reconstruye si está obsoleto
+
+        Args:
+            fingerprint_fn: Función barata que calcula la huella actual
+            build_fn: Función costosa que renderiza el esquema completo
+
+        Returns:
+            El texto del esquema
+        """
+        with self._lock:
+            fingerprint = fingerprint_fn()
+            expired = (time.monotonic() - self.loaded_at) > self.ttl
+
+            if self.text is not None and not expired and fingerprint == self.fingerprint:
+                self.hits += 1
+                return self.text
+
+            self.text = build_fn()
+            self.fingerprint = fingerprint
+            self.loaded_at = time.monotonic()
+            self.refreshes += 1
+            return self.text
+
+    def invalidate(self):
+        """Descarta el esquema cacheado (p. ej. después de una escritura)"""
+        with self._lock:
+            self.text = None
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de uso de la caché"""
+        return {
+            "fingerprint": self.fingerprint,
+            "age_seconds": round(time.monotonic() - self.loaded_at, 1) if self.text else None,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,94 @@
+"""
+Plantillas de SQL: los literales de una consulta generada se convierten en
+parámetros (`?`), para que consultas que solo difieren en un valor
+compartan la misma sentencia preparada.
+"""
+import re
+from typing import Any, List, Tuple
+
+_TOKEN = re.compile(
+    r"""
+      (?P<str>'(?:[^'\\]|''|\\.)*')
+    | (?P<ident>`[^`]*`|"(?:[^"\\]|\\.)*")
+    | (?P<comment>--[^\n]*|/\*.*?\*/)
+    | (?P<word>[A-Za-z_][\w$]*)
+    | (?P<num>\d+(?:\.\d+)?(?![\w.]))
+    | (?P<op><=|>=|<>|!=|=|<|>)
+    | (?P<space>\s+)
+    | (?P<other>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# Después de estas palabras un literal no puede ser parámetro (alias, etc.)
+_NO_PARAM_AFTER = {"AS", "COLLATE", "INTERVAL", "LIMIT", "OFFSET", "SEPARATOR", "CHARACTER", "CHARSET"}
+
+
+def _number(text: str) -> Any:
+    return float(text) if "." in text else int(text)
+
+
+def parameterize(sql: str) -> Tuple[str, Tuple[Any, ...]]:
+    """
+    Separa los literales de la consulta en parámetros.
+
+    Se extraen los strings entre comillas simples y los números que están
+    después de un operador de comparación, en un BETWEEN o dentro de una
+    lista IN (...). Los demás números (LIMIT, ORDER BY 1, INTERVAL 30 DAY)
+    quedan en el texto porque cambian el plan o no admiten parámetros.
+
+    Returns:
+        (plantilla con `?`, parámetros)
+
+    Ejemplo:
+        "SELECT * FROM p WHERE nombre LIKE '%Dolex%' AND stock < 10"
+        -> ("SELECT * FROM p WHERE nombre LIKE ? AND stock < ?", ("%Dolex%", 10))
+    """
+    parts: List[str] = []
+    params: List[Any] = []
+    prev = ""             # último token significativo (en mayúsculas)
+    between = False       # dentro de "BETWEEN x AND y"
+    in_list_depth = 0     # profundidad de paréntesis de un IN (...)
+    depth = 0
+    expect_in_list = False
+
+    for match in _TOKEN.finditer(sql):
+        kind = match.lastgroup
+        text = match.group(0)
+
+        if kind in ("space", "comment"):
+            parts.append(text)
+            continue
+
+        if kind == "str" and prev not in _NO_PARAM_AFTER and "\\" not in text:
+            parts.append("?")
+            params.append(text[1:-1].replace("''", "'"))
+        elif kind == "num" and (
+            prev in ("=", "<", ">", "<=", ">=", "<>", "!=", "BETWEEN")
+            or (prev == "AND" and between)
+            or (in_list_depth and depth == in_list_depth and prev in ("(", ","))
+        ):
+            parts.append("?")
+            params.append(_number(text))
+        else:
+            parts.append(text)
+
+        upper = text.upper()
+        if prev == "AND" and between:
+            between = False  # Ya pasó el segundo valor del BETWEEN
+        if kind == "word" and upper == "BETWEEN":
+            between = True
+
+        if text == "(":
+            depth += 1
+            if expect_in_list:
+                in_list_depth = depth
+        elif text == ")":
+            if depth == in_list_depth:
+                in_list_depth = 0
+            depth -= 1
+        expect_in_list = kind == "word" and upper == "IN"
+
+        prev = "'" if kind == "str" else upper
+
+    return "".join(parts), tuple(params)
@@ -0,0 +1,79 @@
+"""
+Lotes de escritura para `execute_write`: varias sentencias o una sentencia
+parametrizada con muchas filas, ejecutadas en una sola transacción
+"""
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+# (sql, filas de parámetros para executemany o None)
+Statement = Tuple[str, Optional[List[Sequence[Any]]]]
+BatchInput = Union[str, List[Union[str, Dict[str, Any]]]]
+
+_QUOTED_OR_SEMICOLON = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|;")
+
+ALLOWED_WRITES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def split_statements(sql: str) -> List[str]:
+    """Separa un texto en sentencias por ';' (sin cortar dentro de literales)"""
+    statements = []
+    start = 0
+    for match in _QUOTED_OR_SEMICOLON.finditer(sql):
+        if match.group(0) == ";":
+            statements.append(sql[start:match.start()])
+            start = match.end()
+    statements.append(sql[start:])
+    return [s.strip() for s in statements if s.strip()]
+
+
+def normalize_batch(sql: BatchInput, params: Optional[List[Sequence[Any]]] = None) -> List[Statement]:
+    """
+    Convierte cualquiera de las formas aceptadas en una lista de sentencias:
+
+    - "UPDATE ..."                        -> una sentencia
+    - "UPDATE ...; UPDATE ..."            -> varias sentencias
+    - "UPDATE ... %s ...", params=[...]   -> una sentencia, executemany
+    - ["UPDATE ...", {"sql": ..., "params": [...]}, ...]
+    """
+    if isinstance(sql, str):
+        if params is not None:
+            return [(sql.strip().rstrip(";").strip(), list(params))]
+        return [(statement, None) for statement in split_statements(sql)]
+
+    batch: List[Statement] = []
+    for item in sql:
+        if isinstance(item, str):
+            batch.extend((statement, None) for statement in split_statements(item))
+        else:
+            rows = item.get("params")
+            batch.append((item["sql"].strip().rstrip(";").strip(), list(rows) if rows is not None else None))
+    return batch
+
+
+def check_batch(batch: List[Statement]) -> Optional[str]:
+    """Mensaje de error si el lote no se puede ejecutar, o None"""
+    if not batch:
+        return "No hay sentencias para ejecutar."
+    for index, (statement, rows) in enumerate(batch):
+        if not statement.upper().startswith(ALLOWED_WRITES):
+            return f"Sentencia {index + 1}: esta función es solo para INSERT, UPDATE o DELETE."
+        if rows is not None and not rows:
+            return f"Sentencia {index + 1}: la lista de parámetros está vacía."
+    return None
+
+
+def write_summary(batch: List[Statement], rowcounts: List[int]) -> str:
+    """Mensaje para el usuario (el de siempre si fue una sola sentencia simple)"""
+    total = sum(max(n, 0) for n in rowcounts)
+    if len(batch) == 1 and batch[0][1] is None:
+        kind = batch[0][0].split(None, 1)[0].upper()
+        action = {
+            "INSERT": "Inserción",
+            "UPDATE": "Actualización",
+            "DELETE": "Eliminación",
+        }.get(kind, "Operación")
+        return f"{action} completada. {total} fila(s) afectada(s)."
+    return (
+        f"Lote completado en una sola transacción: {len(batch)} sentencia(s), "
+        f"{total} fila(s) afectada(s)."
+    )